@@ -4,3 +4,8 @@ from django.apps import AppConfig
 class AccountsConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'accounts'
+
+    def ready(self):
+        # Connects the signals invalidating cached users, and registers the
+        # check of the caches they need.
+        from accounts import auth  # noqa: F401
@@ -0,0 +1,102 @@
+import hashlib
+import time
+from django.conf import settings
+from django.core.cache import caches
+from django.db.models.signals import post_delete, post_save, pre_save
+from graphql_jwt.settings import jwt_settings
+from graphql_jwt.utils import jwt_decode
+from accounts.models import CustomUser, Organization
+from backend.lru import LRUCache
+from backend.metrics import record_cache_lookups
+from backend.shared_cache import is_shared
+
+# Payloads of verified tokens, keyed by the SHA-256 of the token, with the
+# time they expire at.
+token_cache = LRUCache(settings.AUTH_TOKEN_CACHE_SIZE)
+
+
+def decode_token(token, context=None):
+    """
+    JWT_DECODE_HANDLER verifying a token once, then serving its payload
+    from memory until the token expires.
+    """
+    key = hashlib.sha256(token.encode()).hexdigest()
+    cached = token_cache.get(key)
+    if cached is not None:
+        payload, expires = cached
+        if expires is None or time.time() < expires:
+            record_cache_lookups("jwt_token", hits=1)
+            return payload
+        token_cache.delete(key)
+    record_cache_lookups("jwt_token", misses=1)
+
+    payload = jwt_decode(token, context)
+    expires = payload.get("exp") if jwt_settings.JWT_VERIFY_EXPIRATION else None
+    token_cache.set(key, (payload, expires))
+    return payload
+
+
+def _user_key(username):
+    return f"accounts:user:{username}"
+
+
+def user_cache_enabled():
+    # Invalidation must reach every worker.
+    return settings.AUTH_USER_CACHE_TIMEOUT > 0 and is_shared(settings.AUTH_USER_CACHE)
+
+
+def get_user_by_natural_key(username):
+    """
+    JWT_GET_USER_BY_NATURAL_KEY_HANDLER returning the user with its
+    organization, cached for AUTH_USER_CACHE_TIMEOUT seconds.
+    """
+    user_cache = caches[settings.AUTH_USER_CACHE]
+    key = _user_key(username)
+    cached = user_cache_enabled()
+    if cached:
+        user = user_cache.get(key)
+        if user is not None:
+            record_cache_lookups("auth_user", hits=1)
+            return user
+        record_cache_lookups("auth_user", misses=1)
+
+    try:
+        user = CustomUser._default_manager.select_related("organization").get(
+            **{CustomUser.USERNAME_FIELD: username})
+    except CustomUser.DoesNotExist:
+        return None
+    if cached:
+        user_cache.set(key, user, settings.AUTH_USER_CACHE_TIMEOUT)
+    return user
+
+
+def invalidate_users(usernames):
+    caches[settings.AUTH_USER_CACHE].delete_many([_user_key(username) for username in usernames])
+
+
+def remember_username(sender, instance, **kwargs):
+    # The entry of the old username must go too when it changes.
+    if instance.pk is not None:
+        instance._cached_username = (
+            sender._default_manager.filter(pk=instance.pk)
+            .values_list(sender.USERNAME_FIELD, flat=True).first()
+        )
+
+
+def user_changed(sender, instance, **kwargs):
+    usernames = {instance.get_username(), getattr(instance, "_cached_username", None)}
+    invalidate_users(username for username in usernames if username)
+
+
+def organization_changed(sender, instance, **kwargs):
+    invalidate_users(
+        CustomUser._default_manager.filter(organization_id=instance.pk)
+        .values_list(CustomUser.USERNAME_FIELD, flat=True)
+    )
+
+
+pre_save.connect(remember_username, sender=CustomUser)
+post_save.connect(user_changed, sender=CustomUser)
+post_delete.connect(user_changed, sender=CustomUser)
+post_save.connect(organization_changed, sender=Organization)
+post_delete.connect(organization_changed, sender=Organization)
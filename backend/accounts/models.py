@@ -22,5 +22,11 @@ class CustomUser(AbstractUser):
     USERNAME_FIELD = "email"
     REQUIRED_FIELDS = ["username"]
 
+    class Meta(AbstractUser.Meta):
+        indexes = [
+            models.Index(fields=["organization", "email"],
+                         name="user_org_email_idx"),
+        ]
+
     def __str__(self):
         return self.email
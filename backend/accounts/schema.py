@@ -5,6 +5,9 @@ from django.contrib.auth import get_user_model, authenticate
 from graphql_jwt.shortcuts import get_token
 from graphql_jwt.shortcuts import create_refresh_token
 from accounts.models import Organization
+from project_management.loaders import get_loaders
+from backend.async_execution import async_capable, in_event_loop
+from backend.response_cache import user_scoped
 
 User = get_user_model()
 
@@ -20,6 +23,12 @@ class UserType(DjangoObjectType):
         model = User
         fields = ("id", "email", "username", "organization", "is_active")
 
+    @async_capable
+    def resolve_organization(self, info):
+        if User.organization.is_cached(self):
+            return self.organization
+        return get_loaders(info).organization.load(self.organization_id)
+
 
 class ObtainJSONWebTokenWithEmail(graphene.Mutation):
     class Arguments:
@@ -50,10 +59,17 @@ class ObtainJSONWebTokenWithEmail(graphene.Mutation):
 class AccountsQuery(graphene.ObjectType):
     me = graphene.Field(UserType)
 
+    @async_capable
+    @user_scoped
     def resolve_me(root, info):
         user = info.context.user
         if user.is_anonymous:
             return None
+        # Authentication loads the user with its organization.
+        if User.organization.is_cached(user):
+            return user
+        if in_event_loop():
+            return User.objects.select_related('organization').aget(pk=user.pk)
         return User.objects.select_related('organization').get(pk=user.pk)
 
 
@@ -1,3 +1,74 @@
-from django.test import TestCase
+import json
+from unittest import mock
+from django.core.cache import cache
+from django.test import TestCase, override_settings
+from graphql_jwt.shortcuts import get_token
+from graphql_jwt.utils import jwt_decode
+from accounts.auth import decode_token, token_cache
+from accounts.models import CustomUser, Organization
+from backend.shared_cache import check_shared_caches
 
-# Create your tests here.
+ME = "query { me { email organization { name } } }"
+
+
+class AuthCacheTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        token_cache.clear()
+        self.organization = Organization.objects.create(
+            name="Acme", slug="acme", contact_email="a@a.test")
+        self.user = CustomUser.objects.create_user(
+            username="alice", email="alice@acme.test", password="x", organization=self.organization)
+
+    def query(self, query, token=None):
+        response = self.client.post(
+            "/graphql/", json.dumps({"query": query}), content_type="application/json",
+            HTTP_AUTHORIZATION=f"Bearer {token or get_token(self.user)}")
+        return response.json()
+
+    def test_cached_request_runs_no_auth_queries(self):
+        token = get_token(self.user)
+        with self.assertNumQueries(1):  # the user with its organization
+            self.query(ME, token)
+        with self.assertNumQueries(0):
+            result = self.query(ME, token)
+        self.assertEqual(
+            result["data"], {"me": {"email": "alice@acme.test", "organization": {"name": "Acme"}}})
+
+    @override_settings(WEB_CONCURRENCY=2)
+    def test_per_process_cache_is_not_used_by_several_workers(self):
+        token = get_token(self.user)
+        self.query(ME, token)
+        with self.assertNumQueries(1):
+            self.query(ME, token)
+        self.assertEqual([warning.id for warning in check_shared_caches(None)], ["backend.W001"])
+
+        with override_settings(CACHES={"default": {
+                "BACKEND": "django.core.cache.backends.dummy.DummyCache"}}):
+            self.assertEqual(check_shared_caches(None), [])
+
+    def test_changes_to_the_user_and_organization_invalidate_the_cache(self):
+        self.query(ME)
+        self.organization.name = "Acme Inc"
+        self.organization.save()
+        self.assertEqual(self.query(ME)["data"]["me"]["organization"], {"name": "Acme Inc"})
+
+        token = get_token(self.user)
+        self.user.email = "alice@acme.example"
+        self.user.save()
+        # Tokens issued for the old email no longer authenticate.
+        self.assertIsNone(self.query(ME, token)["data"]["me"])
+
+        self.user.is_active = False
+        self.user.save()
+        self.assertEqual(self.query(ME)["errors"][0]["message"], "User is disabled")
+
+    def test_tokens_are_verified_again_once_expired(self):
+        token = get_token(self.user)
+        with mock.patch("accounts.auth.jwt_decode", wraps=jwt_decode) as verify:
+            decode_token(token)
+            payload = decode_token(token)
+            self.assertEqual(verify.call_count, 1)
+            with mock.patch("accounts.auth.time.time", return_value=payload["exp"] + 1):
+                decode_token(token)
+            self.assertEqual(verify.call_count, 2)
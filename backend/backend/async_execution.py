@@ -0,0 +1,69 @@
+import asyncio
+from functools import partial
+from asgiref.sync import sync_to_async
+from graphene.types.resolver import get_default_resolver
+
+
+def in_event_loop():
+    """
+    True when called from the event loop thread of the async view, where
+    the synchronous ORM must not be used.
+    """
+    try:
+        asyncio.get_running_loop()
+    except RuntimeError:
+        return False
+    return True
+
+
+def async_capable(resolver):
+    """
+    Mark a resolver that checks `in_event_loop()` and returns an awaitable
+    instead of touching the database synchronously.
+    """
+    resolver.async_capable = True
+    return resolver
+
+
+def is_default_resolver(field):
+    """
+    Whether a field is resolved by a plain attribute or key lookup.
+    """
+    resolve = field.resolve
+    return resolve is None or (
+        isinstance(resolve, partial) and resolve.func is get_default_resolver())
+
+
+def runs_inline(field):
+    """
+    Whether a field's resolver can run on the event loop as is: default
+    attribute resolvers, subscription fields and resolvers marked with
+    `async_capable`.
+    """
+    if field.subscribe is not None or getattr(field.resolve, "async_capable", False):
+        return True
+    return is_default_resolver(field)
+
+
+class SyncResolverMiddleware:
+    """
+    Graphene middleware used by the async view. Resolvers that may hit the
+    database synchronously are run in a worker thread through
+    `sync_to_async`; everything else stays on the event loop. Outside of the
+    event loop (mutations run in a worker thread) it does nothing.
+    """
+
+    def __init__(self):
+        self._inline = {}
+
+    def resolve(self, next, root, info, **kwargs):
+        key = (info.parent_type.name, info.field_name)
+        inline = self._inline.get(key)
+        if inline is None:
+            # Introspection fields such as __typename are not in `fields`.
+            field = info.parent_type.fields.get(info.field_name)
+            inline = field is None or runs_inline(field)
+            self._inline[key] = inline
+        if inline or not in_event_loop():
+            return next(root, info, **kwargs)
+        return sync_to_async(next)(root, info, **kwargs)
@@ -0,0 +1,159 @@
+import asyncio
+import json
+import logging
+import threading
+import time
+from django.conf import settings
+from django.db import connection
+
+logger = logging.getLogger(__name__)
+
+
+class Subscriber:
+    """
+    One subscription's queue of events, living on the event loop that
+    created it. Events may be delivered from any thread.
+
+    The queue holds at most GRAPHQL_SUBSCRIPTION_QUEUE_SIZE events. A
+    subscriber that falls further behind is overflowed: later events are
+    dropped and the subscription ends with an error, so the client knows
+    to fetch the current state again.
+    """
+
+    def __init__(self, organization_id):
+        self.organization_id = organization_id
+        self.loop = asyncio.get_running_loop()
+        self.queue = asyncio.Queue(maxsize=settings.GRAPHQL_SUBSCRIPTION_QUEUE_SIZE)
+        self.overflowed = False
+
+    def deliver(self, event):
+        if event.get("organization_id") == self.organization_id and not self.loop.is_closed():
+            self.loop.call_soon_threadsafe(self.put, event)
+
+    def put(self, event):
+        if self.overflowed:
+            return
+        try:
+            self.queue.put_nowait(event)
+        except asyncio.QueueFull:
+            self.overflowed = True
+            logger.warning(
+                "Subscriber of organization %s fell %s events behind, closing it",
+                self.organization_id, self.queue.maxsize)
+
+
+class MemoryBroker:
+    """
+    In-process broker: events published by a worker reach the subscribers
+    connected to that same worker.
+    """
+
+    def __init__(self):
+        self._subscribers = set()
+        self._lock = threading.Lock()
+
+    def publish(self, event):
+        self.deliver(event)
+
+    def deliver(self, event):
+        with self._lock:
+            subscribers = list(self._subscribers)
+        for subscriber in subscribers:
+            subscriber.deliver(event)
+
+    async def subscribe(self, organization_id):
+        """
+        Yield the events of one organization until the generator is closed,
+        or until the subscriber overflows.
+        """
+        subscriber = Subscriber(organization_id)
+        with self._lock:
+            self._subscribers.add(subscriber)
+        try:
+            while True:
+                event = await subscriber.queue.get()
+                if subscriber.overflowed:
+                    raise Exception(
+                        "Subscription closed: too many events were waiting to be delivered")
+                yield event
+        finally:
+            with self._lock:
+                self._subscribers.discard(subscriber)
+
+
+class PostgresBroker(MemoryBroker):
+    """
+    Broker for deployments running several workers. Events are sent with
+    NOTIFY and every worker delivers what it receives on a LISTEN
+    connection to its own subscribers.
+    """
+
+    CHANNEL = "graphql_events"
+
+    def __init__(self):
+        super().__init__()
+        self._listener = None
+
+    def publish(self, event):
+        with connection.cursor() as cursor:
+            cursor.execute("SELECT pg_notify(%s, %s)", [self.CHANNEL, json.dumps(event)])
+
+    def subscribe(self, organization_id):
+        self.start_listener()
+        return super().subscribe(organization_id)
+
+    def start_listener(self):
+        with self._lock:
+            if self._listener is None:
+                self._listener = threading.Thread(
+                    target=self.listen, name="graphql-events-listener", daemon=True)
+                self._listener.start()
+
+    def listen(self):
+        import psycopg
+
+        database = settings.DATABASES["default"]
+        while True:
+            try:
+                with psycopg.connect(
+                    dbname=database["NAME"], user=database["USER"],
+                    password=database["PASSWORD"], host=database["HOST"],
+                    port=database["PORT"] or None, autocommit=True,
+                ) as listen_connection:
+                    listen_connection.execute(f"LISTEN {self.CHANNEL}")
+                    for notify in listen_connection.notifies():
+                        self.deliver(json.loads(notify.payload))
+            except psycopg.Error:
+                logger.exception("Lost the %s LISTEN connection, reconnecting", self.CHANNEL)
+                time.sleep(1)
+
+
+class EventBroker:
+    """
+    Publishes change events to GraphQL subscriptions through the backend
+    selected by GRAPHQL_SUBSCRIPTION_BROKER ("memory" or "postgres").
+    """
+
+    def __init__(self):
+        self._backend = None
+
+    @property
+    def backend(self):
+        if self._backend is None:
+            name = settings.GRAPHQL_SUBSCRIPTION_BROKER
+            if name == "memory":
+                self._backend = MemoryBroker()
+            elif name == "postgres":
+                self._backend = PostgresBroker()
+            else:
+                raise Exception(f"Unknown subscription broker '{name}'")
+        return self._backend
+
+    def publish(self, event):
+        self.backend.publish(event)
+
+    def subscribe(self, organization_id):
+        return self.backend.subscribe(organization_id)
+
+
+broker = EventBroker()
@@ -0,0 +1,120 @@
+from django.conf import settings
+from graphql import (
+    FieldNode, FragmentSpreadNode, GraphQLError, InlineFragmentNode,
+    get_named_type, is_list_type, is_non_null_type, value_from_ast,
+)
+from project_management.pagination import DEFAULT_PAGE_SIZE, MAX_LIST_SIZE, MAX_PAGE_SIZE
+
+
+class QueryCostAnalysis:
+    """
+    Static depth and cost analysis of one operation, run before execution.
+
+    Every field returning an object costs 1. The cost of a field's
+    selections is multiplied by the number of items it can return: its
+    `first` argument for connections and paginated fields, and
+    MAX_LIST_SIZE, the most rows a plain list returns, for plain lists.
+    """
+
+    def __init__(self, schema, document, variables=None):
+        self.schema = schema
+        self.variables = variables or {}
+        self.fragments = {
+            definition.name.value: definition
+            for definition in document.definitions
+            if definition.kind == "fragment_definition"
+        }
+
+    def analyze(self, operation_ast):
+        """
+        Return `(depth, cost)` of the operation.
+        """
+        root_type = self.schema.get_root_type(operation_ast.operation)
+        return self.selection_set_cost(root_type, operation_ast.selection_set, in_connection=False)
+
+    def selection_set_cost(self, parent_type, selection_set, in_connection):
+        depth = cost = 0
+        for field_node, field_parent in self.collect_fields(parent_type, selection_set):
+            field_depth, field_cost = self.field_cost(field_parent, field_node, in_connection)
+            depth = max(depth, field_depth)
+            cost += field_cost
+        return depth, cost
+
+    def collect_fields(self, parent_type, selection_set, visited=None):
+        visited = visited if visited is not None else set()
+        for selection in selection_set.selections:
+            if isinstance(selection, FieldNode):
+                yield selection, parent_type
+            elif isinstance(selection, InlineFragmentNode):
+                fragment_type = parent_type
+                if selection.type_condition is not None:
+                    fragment_type = self.schema.get_type(selection.type_condition.name.value)
+                yield from self.collect_fields(fragment_type, selection.selection_set, visited)
+            elif isinstance(selection, FragmentSpreadNode):
+                name = selection.name.value
+                fragment = self.fragments.get(name)
+                if fragment is None or name in visited:
+                    continue
+                visited.add(name)
+                fragment_type = self.schema.get_type(fragment.type_condition.name.value)
+                yield from self.collect_fields(fragment_type, fragment.selection_set, visited)
+
+    def field_cost(self, parent_type, field_node, in_connection):
+        name = field_node.name.value
+        fields = getattr(parent_type, "fields", {})
+        if name.startswith("__") or name not in fields:
+            return 0, 0
+
+        field_def = fields[name]
+        if field_node.selection_set is None:
+            return 1, 0
+
+        return_type = field_def.type
+        if is_non_null_type(return_type):
+            return_type = return_type.of_type
+        named_type = get_named_type(return_type)
+        is_connection = named_type.name.endswith("Connection")
+
+        if is_connection or "first" in field_def.args:
+            multiplier = self.first_argument(field_def, field_node)
+        elif is_list_type(return_type):
+            # `edges` are already accounted for by their connection's `first`.
+            multiplier = 1 if in_connection else MAX_LIST_SIZE
+        else:
+            multiplier = 1
+
+        depth, children_cost = self.selection_set_cost(
+            named_type, field_node.selection_set, in_connection=is_connection)
+        return depth + 1, 1 + multiplier * children_cost
+
+    def first_argument(self, field_def, field_node):
+        for argument in field_node.arguments:
+            if argument.name.value == "first" and "first" in field_def.args:
+                value = value_from_ast(
+                    argument.value, field_def.args["first"].type, self.variables)
+                if isinstance(value, int) and value > 0:
+                    return min(value, MAX_PAGE_SIZE)
+        return DEFAULT_PAGE_SIZE
+
+
+def check_query_cost(schema, document, operation_ast, variables):
+    """
+    Analyze an operation and return `(extensions, error)`; `error` is a
+    GraphQLError when the operation exceeds the configured limits.
+    """
+    depth, cost = QueryCostAnalysis(schema, document, variables).analyze(operation_ast)
+    extensions = {
+        "cost": {
+            "requestedQueryCost": cost,
+            "maximumAvailable": settings.GRAPHQL_MAX_COST,
+            "depth": depth,
+            "maximumDepth": settings.GRAPHQL_MAX_DEPTH,
+        }
+    }
+    if depth > settings.GRAPHQL_MAX_DEPTH:
+        return extensions, GraphQLError(
+            f"Query depth {depth} exceeds the maximum of {settings.GRAPHQL_MAX_DEPTH}")
+    if cost > settings.GRAPHQL_MAX_COST:
+        return extensions, GraphQLError(
+            f"Query cost {cost} exceeds the maximum of {settings.GRAPHQL_MAX_COST}")
+    return extensions, None
@@ -0,0 +1,126 @@
+import contextvars
+import random
+from contextlib import contextmanager
+from django.conf import settings
+from django.core.cache import caches
+from django.db import DEFAULT_DB_ALIAS
+from graphql import OperationType
+from backend.shared_cache import is_shared
+
+# Routing state of the request being served, None outside of GraphQL requests
+_current_request = contextvars.ContextVar("db_routing_state", default=None)
+
+
+class RoutingState:
+    """
+    Where one request reads from. It starts on the primary; a query
+    operation moves its reads to a replica, and the first write or mutation
+    pins the rest of the request to the primary.
+    """
+
+    def __init__(self):
+        self.replica = None
+        self.pinned = False
+
+    @property
+    def read_alias(self):
+        if self.replica is None or self.pinned:
+            return DEFAULT_DB_ALIAS
+        return self.replica
+
+
+class ReplicaRouter:
+    """
+    Sends reads of GraphQL query operations to one of DATABASE_REPLICAS and
+    everything else (writes, mutations, and reads outside of a GraphQL
+    request) to the primary.
+    """
+
+    def db_for_read(self, model, **hints):
+        state = _current_request.get()
+        if state is None:
+            return DEFAULT_DB_ALIAS
+        return state.read_alias
+
+    def db_for_write(self, model, **hints):
+        state = _current_request.get()
+        if state is not None:
+            state.pinned = True
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # Replicas hold the same rows as the primary.
+        aliases = {DEFAULT_DB_ALIAS, *settings.DATABASE_REPLICAS}
+        if obj1._state.db in aliases and obj2._state.db in aliases:
+            return True
+        return None
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        if db in settings.DATABASE_REPLICAS:
+            return False
+        return None
+
+
+def sticky_key(user):
+    return f"db-router:primary:{user.pk}"
+
+
+def is_sticky(user):
+    """
+    Whether the user wrote within DB_REPLICA_STICKY_SECONDS, and must keep
+    reading from the primary to see their own writes.
+    """
+    return bool(caches[settings.DB_REPLICA_STICKY_CACHE].get(sticky_key(user)))
+
+
+def make_sticky(user):
+    caches[settings.DB_REPLICA_STICKY_CACHE].set(
+        sticky_key(user), True, settings.DB_REPLICA_STICKY_SECONDS)
+
+
+@contextmanager
+def routing_request(request):
+    """
+    Track the database routing of one GraphQL request. When it wrote or ran
+    a mutation, the authenticated user sticks to the primary for a while.
+    """
+    state = RoutingState()
+    token = _current_request.set(state)
+    try:
+        yield state
+    finally:
+        _current_request.reset(token)
+        user = getattr(request, "user", None)
+        if state.pinned and user is not None and user.is_authenticated:
+            make_sticky(user)
+
+
+def pin_to_primary():
+    """
+    Send the rest of the current request's queries to the primary, for
+    reads that must see rows the request is about to write.
+    """
+    state = _current_request.get()
+    if state is not None:
+        state.pinned = True
+
+
+def route_operation(operation_ast, user):
+    """
+    Send the reads of a query operation to a replica, unless the request
+    already wrote or the user wrote recently. Mutations pin the rest of the
+    request to the primary.
+
+    Reads stay on the primary when the sticky marks are not shared by the
+    workers: a write seen by one worker only would not keep the user off
+    lagging replicas on the others.
+    """
+    state = _current_request.get()
+    if state is None or state.pinned or operation_ast is None:
+        return
+    if operation_ast.operation != OperationType.QUERY:
+        state.pinned = True
+    elif (state.replica is None and settings.DATABASE_REPLICAS
+            and is_shared(settings.DB_REPLICA_STICKY_CACHE)
+            and not (user is not None and is_sticky(user))):
+        state.replica = random.choice(settings.DATABASE_REPLICAS)
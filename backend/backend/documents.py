@@ -0,0 +1,98 @@
+import hashlib
+import json
+from django.conf import settings
+from django.core.cache import cache
+from backend.lru import LRUCache
+
+# Parsed and validated documents, keyed by the SHA-256 of the query text.
+document_cache = LRUCache(settings.GRAPHQL_DOCUMENT_CACHE_SIZE)
+
+
+class PersistedQueryNotFound(Exception):
+    def __init__(self):
+        super().__init__("PersistedQueryNotFound")
+
+
+class PersistedQueryRejected(Exception):
+    pass
+
+
+def query_hash(query):
+    return hashlib.sha256(query.encode()).hexdigest()
+
+
+def _cache_key(sha256_hash):
+    return f"graphql:apq:{sha256_hash}"
+
+
+class PersistedQueryStore:
+    """
+    Storage for automatic persisted queries.
+
+    Queries from the manifest file (a JSON object of hash -> query text,
+    generated from the client's operations) are always available. Queries
+    registered by clients at runtime are kept in the Django cache so all
+    workers share them, unless GRAPHQL_PERSISTED_QUERIES_ONLY restricts the
+    endpoint to the manifest.
+    """
+
+    def __init__(self):
+        self._manifest = None
+
+    @property
+    def manifest(self):
+        if self._manifest is None:
+            path = settings.GRAPHQL_PERSISTED_QUERIES_MANIFEST
+            if path:
+                with open(path) as f:
+                    self._manifest = json.load(f)
+            else:
+                self._manifest = {}
+        return self._manifest
+
+    @property
+    def allow_list_only(self):
+        return settings.GRAPHQL_PERSISTED_QUERIES_ONLY
+
+    def get(self, sha256_hash):
+        query = self.manifest.get(sha256_hash)
+        if query is None and not self.allow_list_only:
+            query = cache.get(_cache_key(sha256_hash))
+        return query
+
+    def register(self, sha256_hash, query):
+        if query_hash(query) != sha256_hash:
+            raise PersistedQueryRejected("Provided sha256Hash does not match query")
+        if sha256_hash in self.manifest:
+            return
+        if self.allow_list_only:
+            raise PersistedQueryRejected("Query is not in the persisted query allow-list")
+        cache.set(_cache_key(sha256_hash), query, None)
+
+    def resolve(self, query, extensions):
+        """
+        Return the query text to execute for a request.
+
+        `extensions` is the request's `extensions` object; when it carries
+        a `persistedQuery` entry the query is looked up (or registered, if
+        the client sent the full text along with the hash).
+        """
+        persisted = (extensions or {}).get("persistedQuery")
+        if not persisted:
+            if query and self.allow_list_only and query_hash(query) not in self.manifest:
+                raise PersistedQueryRejected("Query is not in the persisted query allow-list")
+            return query
+
+        sha256_hash = persisted.get("sha256Hash")
+        if persisted.get("version") != 1 or not sha256_hash:
+            raise PersistedQueryRejected("Unsupported persisted query")
+        if query:
+            self.register(sha256_hash, query)
+            return query
+        query = self.get(sha256_hash)
+        if query is None:
+            raise PersistedQueryNotFound()
+        return query
+
+
+persisted_queries = PersistedQueryStore()
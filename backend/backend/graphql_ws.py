@@ -0,0 +1,231 @@
+import asyncio
+import inspect
+import json
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.contrib.auth.models import AnonymousUser
+from graphql import ExecutionResult, GraphQLError, OperationType, execute, get_operation_ast
+from graphql.execution import create_source_event_stream
+from graphql_jwt.exceptions import JSONWebTokenError
+from graphql_jwt.settings import jwt_settings
+from graphql_jwt.shortcuts import get_user_by_token
+from backend.cost import check_query_cost
+from backend.views import APIGraphQLView, sync_resolver_middleware
+
+# https://github.com/enisdenjo/graphql-ws/blob/master/PROTOCOL.md
+GRAPHQL_TRANSPORT_WS = "graphql-transport-ws"
+
+
+class WebSocketContext:
+    """
+    Context of the operations of one subscription, standing in for the
+    request resolvers get over HTTP.
+    """
+
+    def __init__(self, scope, user):
+        self.scope = scope
+        self.user = user
+        self.loaders = None
+
+
+class GraphQLWebSocket:
+    """
+    One WebSocket connection speaking the graphql-transport-ws protocol.
+
+    The client authenticates with its token in the `connection_init`
+    payload (`{"Authorization": "Bearer <token>"}`); each `subscribe`
+    message then starts a subscription that pushes a `next` message per
+    event until the client sends `complete` or disconnects. Queries and
+    mutations stay on the HTTP endpoint.
+    """
+
+    def __init__(self, scope, receive, send):
+        self.scope = scope
+        self.receive = receive
+        self.send = send
+        self.view = APIGraphQLView()
+        self.user = AnonymousUser()
+        self.initialized = False
+        self.closed = False
+        self.operations = {}
+
+    @property
+    def schema(self):
+        return self.view.schema.graphql_schema
+
+    async def run(self):
+        message = await self.receive()
+        if message["type"] != "websocket.connect":
+            return
+        if GRAPHQL_TRANSPORT_WS not in self.scope.get("subprotocols", []):
+            await self.send({"type": "websocket.close", "code": 4406})
+            return
+        await self.send({"type": "websocket.accept", "subprotocol": GRAPHQL_TRANSPORT_WS})
+
+        init_timeout = asyncio.create_task(self.close_unless_initialized())
+        try:
+            while not self.closed:
+                message = await self.receive()
+                if message["type"] == "websocket.disconnect":
+                    break
+                if message["type"] == "websocket.receive":
+                    await self.handle(message.get("text") or message.get("bytes"))
+        finally:
+            init_timeout.cancel()
+            for task in self.operations.values():
+                task.cancel()
+
+    async def close_unless_initialized(self):
+        await asyncio.sleep(settings.GRAPHQL_WS_CONNECTION_INIT_TIMEOUT)
+        if not self.initialized:
+            await self.close(4408, "Connection initialisation timeout")
+
+    async def close(self, code, reason):
+        if not self.closed:
+            self.closed = True
+            await self.send({"type": "websocket.close", "code": code, "reason": reason})
+
+    async def send_message(self, message):
+        if not self.closed:
+            await self.send({"type": "websocket.send", "text": json.dumps(message)})
+
+    async def handle(self, text):
+        try:
+            message = json.loads(text)
+            message_type = message["type"]
+        except (ValueError, KeyError, TypeError):
+            return await self.close(4400, "Invalid message received")
+
+        if message_type == "connection_init":
+            if self.initialized:
+                return await self.close(4429, "Too many initialisation requests")
+            try:
+                self.user = await self.authenticate(message.get("payload") or {})
+            except JSONWebTokenError:
+                return await self.close(4403, "Forbidden")
+            self.initialized = True
+            await self.send_message({"type": "connection_ack"})
+
+        elif message_type == "ping":
+            await self.send_message({"type": "pong"})
+
+        elif message_type == "pong":
+            pass
+
+        elif message_type == "subscribe":
+            if not self.initialized:
+                return await self.close(4401, "Unauthorized")
+            id, payload = message.get("id"), message.get("payload")
+            if not isinstance(id, str) or not isinstance(payload, dict):
+                return await self.close(4400, "Invalid message received")
+            if id in self.operations:
+                return await self.close(4409, f"Subscriber for {id} already exists")
+            self.operations[id] = asyncio.create_task(self.run_operation(id, payload))
+
+        elif message_type == "complete":
+            task = self.operations.pop(message.get("id"), None)
+            if task is not None:
+                task.cancel()
+
+        else:
+            await self.close(4400, f"Unknown message type '{message_type}'")
+
+    async def authenticate(self, payload):
+        token = payload.get("token")
+        authorization = payload.get("Authorization") or payload.get("authorization")
+        if token is None and authorization:
+            prefix, _, token = authorization.partition(" ")
+            if prefix != jwt_settings.JWT_AUTH_HEADER_PREFIX:
+                raise JSONWebTokenError("Invalid authorization prefix")
+        if not token:
+            return AnonymousUser()
+        return await sync_to_async(get_user_by_token)(token)
+
+    async def run_operation(self, id, payload):
+        try:
+            result = await self.subscribe(payload)
+            if isinstance(result, ExecutionResult):
+                await self.send_message({
+                    "id": id, "type": "error",
+                    "payload": [self.view.format_error(e) for e in result.errors],
+                })
+                return
+            async for execution_result in result:
+                await self.send_message(
+                    {"id": id, "type": "next", "payload": self.format_result(execution_result)})
+            await self.send_message({"id": id, "type": "complete"})
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            await self.send_message(
+                {"id": id, "type": "error", "payload": [self.view.format_error(e)]})
+        finally:
+            if self.operations.get(id) is asyncio.current_task():
+                del self.operations[id]
+
+    async def subscribe(self, payload):
+        """
+        Return the stream of execution results of a subscription, or an
+        ExecutionResult with the errors that prevented it from starting.
+        """
+        query = payload.get("query")
+        variables = payload.get("variables")
+        operation_name = payload.get("operationName")
+        if not query:
+            return ExecutionResult(errors=[GraphQLError("Must provide query string.")])
+
+        document, errors, _ = self.view.get_document(query)
+        if document is None or errors:
+            return ExecutionResult(errors=errors)
+
+        operation_ast = get_operation_ast(document, operation_name)
+        if operation_ast is None or operation_ast.operation != OperationType.SUBSCRIPTION:
+            return ExecutionResult(errors=[GraphQLError(
+                "Only subscriptions are served over WebSocket connections.")])
+
+        _, cost_error = check_query_cost(self.schema, document, operation_ast, variables)
+        if cost_error is not None:
+            return ExecutionResult(errors=[cost_error])
+
+        context = WebSocketContext(self.scope, self.user)
+        stream = await create_source_event_stream(
+            self.schema, document, context_value=context,
+            variable_values=variables, operation_name=operation_name)
+        if isinstance(stream, ExecutionResult):
+            return stream
+        return self.execute_events(stream, document, context, variables, operation_name)
+
+    async def execute_events(self, stream, document, context, variables, operation_name):
+        try:
+            async for event in stream:
+                # Rows change between events, so never reuse loaded ones.
+                context.loaders = None
+                result = execute(
+                    self.schema, document, root_value=event, context_value=context,
+                    variable_values=variables, operation_name=operation_name,
+                    middleware=[sync_resolver_middleware],
+                )
+                if inspect.isawaitable(result):
+                    result = await result
+                yield result
+        finally:
+            aclose = getattr(stream, "aclose", None)
+            if aclose is not None:
+                await aclose()
+
+    def format_result(self, result):
+        response = {"data": result.data}
+        if result.errors:
+            response["errors"] = [self.view.format_error(e) for e in result.errors]
+        return response
+
+
+async def graphql_ws_application(scope, receive, send):
+    """
+    ASGI application serving GraphQL subscriptions on /graphql/.
+    """
+    if scope["path"].rstrip("/") != "/graphql":
+        await receive()
+        await send({"type": "websocket.close"})
+        return
+    await GraphQLWebSocket(scope, receive, send).run()
@@ -0,0 +1,310 @@
+import bisect
+import contextvars
+import inspect
+import logging
+import threading
+import time
+from contextlib import contextmanager
+from django.conf import settings
+from django.db import connection
+from django.db.backends.signals import connection_created
+from graphql import OperationType, get_named_type
+from backend.async_execution import is_default_resolver
+from backend.metrics import record_operation
+
+logger = logging.getLogger(__name__)
+
+# Upper bounds of the histogram buckets, in milliseconds and in queries
+DURATION_BUCKETS = (5, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000, 10000)
+QUERY_COUNT_BUCKETS = (0, 1, 2, 5, 10, 20, 50, 100, 200, 500)
+
+# Metrics of the operation being executed, and of the field whose resolver is running
+_current_operation = contextvars.ContextVar("graphql_operation_metrics", default=None)
+_current_field = contextvars.ContextVar("graphql_field_metrics", default=None)
+
+# Operation names are chosen by clients; past this many distinct names per
+# worker, new ones are aggregated as "other".
+OTHER_OPERATIONS = "other"
+_operation_names = set()
+_operation_names_lock = threading.Lock()
+
+
+def operation_label(name):
+    if name in _operation_names:
+        return name
+    with _operation_names_lock:
+        if len(_operation_names) >= settings.GRAPHQL_METRICS_MAX_OPERATIONS:
+            return OTHER_OPERATIONS
+        _operation_names.add(name)
+    return name
+
+
+class FieldMetrics:
+    def __init__(self):
+        self.calls = 0
+        self.duration = 0.0
+        self.max_duration = 0.0
+        self.sql_queries = 0
+        self.sql_duration = 0.0
+
+    def add_call(self, duration):
+        self.calls += 1
+        self.duration += duration
+        self.max_duration = max(self.max_duration, duration)
+
+    def as_dict(self, name):
+        return {
+            "field": name,
+            "calls": self.calls,
+            "durationMs": round(self.duration * 1000, 3),
+            "maxMs": round(self.max_duration * 1000, 3),
+            "sqlQueries": self.sql_queries,
+            "sqlMs": round(self.sql_duration * 1000, 3),
+        }
+
+
+class OperationMetrics:
+    """
+    Timings collected while one GraphQL operation executes: total wall
+    time, SQL queries, and per-field resolver time. SQL queries run while a
+    resolver is on the stack are also counted against that field.
+    """
+
+    def __init__(self):
+        self.operation_name = "anonymous"
+        self.operation_type = "unknown"
+        self.started = time.perf_counter()
+        self.duration = None
+        self.sql_queries = 0
+        self.sql_duration = 0.0
+        self.fields = {}
+        # (mutation class, duration, failed) of each root mutation field
+        self.mutations = []
+        self.failed = False
+
+    def field(self, name):
+        metrics = self.fields.get(name)
+        if metrics is None:
+            metrics = self.fields[name] = FieldMetrics()
+        return metrics
+
+    def add_query(self, duration):
+        self.sql_queries += 1
+        self.sql_duration += duration
+        field = _current_field.get()
+        if field is not None:
+            field.sql_queries += 1
+            field.sql_duration += duration
+
+    def finish(self):
+        self.duration = time.perf_counter() - self.started
+
+    def slowest_fields(self, limit=None):
+        fields = sorted(self.fields.items(), key=lambda item: item[1].duration, reverse=True)
+        return [metrics.as_dict(name) for name, metrics in fields[:limit]]
+
+    def as_dict(self):
+        return {
+            "operation": self.operation_name,
+            "durationMs": round(self.duration * 1000, 3),
+            "sqlQueries": self.sql_queries,
+            "sqlMs": round(self.sql_duration * 1000, 3),
+            "resolvers": self.slowest_fields(),
+        }
+
+
+class Histogram:
+    def __init__(self, buckets):
+        self.buckets = buckets
+        # One count per bucket, plus the overflow bucket
+        self.counts = [0] * (len(buckets) + 1)
+        self.count = 0
+        self.sum = 0.0
+
+    def observe(self, value):
+        self.counts[bisect.bisect_left(self.buckets, value)] += 1
+        self.count += 1
+        self.sum += value
+
+    def quantile(self, q):
+        """
+        Upper bound of the bucket holding the q-quantile, None in the overflow bucket.
+        """
+        if not self.count:
+            return None
+        rank = q * self.count
+        seen = 0
+        for bound, count in zip(self.buckets, self.counts):
+            seen += count
+            if seen >= rank:
+                return bound
+        return None
+
+    def as_dict(self):
+        return {
+            "count": self.count,
+            "sum": round(self.sum, 3),
+            "buckets": {
+                **{str(bound): count for bound, count in zip(self.buckets, self.counts)},
+                "+Inf": self.counts[-1],
+            },
+            "p50": self.quantile(0.5),
+            "p95": self.quantile(0.95),
+            "p99": self.quantile(0.99),
+        }
+
+
+class OperationStats:
+    """
+    Histograms of duration and SQL query count per operation name, kept
+    since the worker started.
+    """
+
+    def __init__(self):
+        self._operations = {}
+        self._lock = threading.Lock()
+
+    def record(self, metrics):
+        with self._lock:
+            stats = self._operations.get(metrics.operation_name)
+            if stats is None:
+                stats = self._operations[metrics.operation_name] = {
+                    "duration_ms": Histogram(DURATION_BUCKETS),
+                    "sql_queries": Histogram(QUERY_COUNT_BUCKETS),
+                    "errors": 0,
+                }
+            stats["duration_ms"].observe(metrics.duration * 1000)
+            stats["sql_queries"].observe(metrics.sql_queries)
+            stats["errors"] += metrics.failed
+
+    def as_dict(self):
+        with self._lock:
+            return {
+                name: {
+                    "durationMs": stats["duration_ms"].as_dict(),
+                    "sqlQueries": stats["sql_queries"].as_dict(),
+                    "errors": stats["errors"],
+                }
+                for name, stats in sorted(self._operations.items())
+            }
+
+    def clear(self):
+        with self._lock:
+            self._operations.clear()
+
+
+operation_stats = OperationStats()
+
+
+def sql_timer(execute, sql, params, many, context):
+    metrics = _current_operation.get()
+    if metrics is None:
+        return execute(sql, params, many, context)
+    started = time.perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        metrics.add_query(time.perf_counter() - started)
+
+
+def install_sql_timer(connection, **kwargs):
+    if sql_timer not in connection.execute_wrappers:
+        connection.execute_wrappers.append(sql_timer)
+
+
+# Every new connection, including those of sync_to_async worker threads,
+# reports to the operation running in its context.
+connection_created.connect(install_sql_timer)
+
+
+def set_operation_name(operation_ast):
+    metrics = _current_operation.get()
+    if metrics is None or operation_ast is None:
+        return
+    metrics.operation_type = operation_ast.operation.value
+    if operation_ast.name is not None:
+        metrics.operation_name = operation_label(operation_ast.name.value)
+
+
+@contextmanager
+def instrument_operation():
+    """
+    Collect OperationMetrics for the operation executed in the block, then
+    record them in `operation_stats` and log the operation if it is slow.
+    """
+    install_sql_timer(connection)
+    metrics = OperationMetrics()
+    token = _current_operation.set(metrics)
+    try:
+        yield metrics
+    finally:
+        _current_operation.reset(token)
+        metrics.finish()
+        operation_stats.record(metrics)
+        record_operation(metrics)
+        duration_ms = metrics.duration * 1000
+        if duration_ms >= settings.GRAPHQL_SLOW_OPERATION_MS:
+            logger.warning(
+                "Slow GraphQL operation %s: %.0f ms, %d SQL queries (%.0f ms); slowest fields: %s",
+                metrics.operation_name, duration_ms, metrics.sql_queries,
+                metrics.sql_duration * 1000,
+                ", ".join(
+                    f"{field['field']} {field['durationMs']:.0f} ms/{field['sqlQueries']} queries"
+                    for field in metrics.slowest_fields(3)
+                ),
+            )
+
+
+class InstrumentationMiddleware:
+    """
+    Graphene middleware timing every resolver that is not a plain
+    attribute lookup, per "Type.field", for the operation being
+    instrumented. Outside of `instrument_operation` it does nothing.
+    """
+
+    def __init__(self):
+        self._timed = {}
+
+    def resolve(self, next, root, info, **kwargs):
+        metrics = _current_operation.get()
+        if metrics is None:
+            return next(root, info, **kwargs)
+
+        key = (info.parent_type.name, info.field_name)
+        timed = self._timed.get(key)
+        if timed is None:
+            # Introspection fields such as __typename are not in `fields`.
+            field_def = info.parent_type.fields.get(info.field_name)
+            timed = field_def is not None and not is_default_resolver(field_def)
+            self._timed[key] = timed
+        if not timed:
+            return next(root, info, **kwargs)
+
+        field = metrics.field(f"{info.parent_type.name}.{info.field_name}")
+        started = time.perf_counter()
+        token = _current_field.set(field)
+        try:
+            result = next(root, info, **kwargs)
+        except Exception:
+            self.record_mutation(metrics, info, started, failed=True)
+            raise
+        finally:
+            _current_field.reset(token)
+        self.record_mutation(metrics, info, started)
+        if inspect.isawaitable(result):
+            return self.timed_await(result, field, started)
+        field.add_call(time.perf_counter() - started)
+        return result
+
+    def record_mutation(self, metrics, info, started, failed=False):
+        if info.path.prev is None and info.operation.operation == OperationType.MUTATION:
+            metrics.mutations.append(
+                (get_named_type(info.return_type).name, time.perf_counter() - started, failed))
+
+    async def timed_await(self, result, field, started):
+        token = _current_field.set(field)
+        try:
+            return await result
+        finally:
+            _current_field.reset(token)
+            field.add_call(time.perf_counter() - started)
@@ -0,0 +1,137 @@
+import os
+from django.db import DatabaseError, connection
+from django.db.backends.signals import connection_created
+from prometheus_client import CollectorRegistry, Counter, Histogram, REGISTRY, generate_latest
+from prometheus_client.core import GaugeMetricFamily
+from prometheus_client.multiprocess import MultiProcessCollector
+
+# With PROMETHEUS_MULTIPROC_DIR set, every worker process writes its samples
+# to memory mapped files in that directory and /metrics merges them, so any
+# worker can answer a scrape. The directory must be emptied before the
+# workers start.
+MULTIPROCESS = bool(os.environ.get("PROMETHEUS_MULTIPROC_DIR"))
+
+DURATION_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+QUERY_COUNT_BUCKETS = (0, 1, 2, 5, 10, 20, 50, 100, 200, 500)
+
+OPERATION_LABELS = ("operation", "type")
+
+operations_total = Counter(
+    "graphql_operations_total", "GraphQL operations executed.", OPERATION_LABELS)
+operation_errors_total = Counter(
+    "graphql_operation_errors_total", "GraphQL operations that returned errors.", OPERATION_LABELS)
+operation_duration_seconds = Histogram(
+    "graphql_operation_duration_seconds", "Time spent executing GraphQL operations.",
+    OPERATION_LABELS, buckets=DURATION_BUCKETS)
+operation_sql_queries = Histogram(
+    "graphql_operation_sql_queries", "SQL queries run per GraphQL operation.",
+    OPERATION_LABELS, buckets=QUERY_COUNT_BUCKETS)
+
+mutations_total = Counter(
+    "graphql_mutations_total", "Mutations executed, per mutation class.", ("mutation",))
+mutation_errors_total = Counter(
+    "graphql_mutation_errors_total", "Mutations that raised an error.", ("mutation",))
+mutation_duration_seconds = Histogram(
+    "graphql_mutation_duration_seconds", "Time spent in mutation resolvers.",
+    ("mutation",), buckets=DURATION_BUCKETS)
+
+db_queries_total = Counter(
+    "db_queries_total", "SQL queries run by GraphQL operations.")
+db_query_seconds_total = Counter(
+    "db_query_seconds_total", "Time spent in SQL queries run by GraphQL operations.")
+db_connections_opened_total = Counter(
+    "db_connections_opened_total",
+    "Database connections opened, or taken from the pool, by the workers.")
+
+batch_operations = Histogram(
+    "graphql_batch_operations", "Operations per batched GraphQL request.",
+    buckets=(1, 2, 3, 5, 10, 20, 50))
+
+cache_requests_total = Counter(
+    "cache_requests_total", "Cache lookups per cache and result (hit or miss).",
+    ("cache", "result"))
+
+
+def record_operation(metrics):
+    """
+    Add a finished operation's OperationMetrics to the counters.
+    """
+    labels = (metrics.operation_name, metrics.operation_type)
+    operations_total.labels(*labels).inc()
+    if metrics.failed:
+        operation_errors_total.labels(*labels).inc()
+    operation_duration_seconds.labels(*labels).observe(metrics.duration)
+    operation_sql_queries.labels(*labels).observe(metrics.sql_queries)
+    if metrics.sql_queries:
+        db_queries_total.inc(metrics.sql_queries)
+        db_query_seconds_total.inc(metrics.sql_duration)
+    for mutation, duration, failed in metrics.mutations:
+        mutations_total.labels(mutation).inc()
+        mutation_duration_seconds.labels(mutation).observe(duration)
+        if failed:
+            mutation_errors_total.labels(mutation).inc()
+
+
+def record_batch(size):
+    batch_operations.observe(size)
+
+
+def record_cache_lookups(cache_name, hits=0, misses=0):
+    if hits:
+        cache_requests_total.labels(cache_name, "hit").inc(hits)
+    if misses:
+        cache_requests_total.labels(cache_name, "miss").inc(misses)
+
+
+def count_connection(**kwargs):
+    db_connections_opened_total.inc()
+
+
+connection_created.connect(count_connection)
+
+
+class DatabaseConnectionCollector:
+    """
+    Connections to the application's database by state, read from
+    pg_stat_activity when /metrics is scraped, so the numbers cover every
+    worker (and every other client) without bookkeeping in the hot path.
+    """
+
+    def collect(self):
+        if connection.vendor != "postgresql":
+            return
+        try:
+            with connection.cursor() as cursor:
+                cursor.execute(
+                    "SELECT coalesce(state, 'unknown'), count(*) FROM pg_stat_activity "
+                    "WHERE datname = current_database() GROUP BY 1")
+                by_state = cursor.fetchall()
+                cursor.execute("SELECT current_setting('max_connections')::int")
+                max_connections = cursor.fetchone()[0]
+        except DatabaseError:
+            return
+
+        connections = GaugeMetricFamily(
+            "db_connections", "Connections to the database by state.", labels=["state"])
+        for state, count in by_state:
+            connections.add_metric([state], count)
+        yield connections
+        yield GaugeMetricFamily(
+            "db_max_connections", "The server's max_connections.", value=max_connections)
+
+
+database_registry = CollectorRegistry(auto_describe=False)
+database_registry.register(DatabaseConnectionCollector())
+
+
+def render_metrics():
+    """
+    The exposition text of every metric: the workers' samples, merged in
+    multiprocess mode, followed by the database gauges.
+    """
+    if MULTIPROCESS:
+        registry = CollectorRegistry()
+        MultiProcessCollector(registry)
+    else:
+        registry = REGISTRY
+    return generate_latest(registry) + generate_latest(database_registry)
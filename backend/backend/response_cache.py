@@ -0,0 +1,174 @@
+import hashlib
+import json
+import threading
+import time
+from django.conf import settings
+from django.core.cache import DEFAULT_CACHE_ALIAS, cache, caches
+from graphene.utils.str_converters import to_camel_case
+from graphql import FieldNode
+from backend.lru import LRUCache
+from backend.metrics import record_cache_lookups
+from backend.shared_cache import is_shared
+
+# Root fields whose result depends on the user, not only the organization.
+# Filled by @user_scoped.
+USER_SCOPED_FIELDS = set()
+
+
+def user_scoped(resolver):
+    """
+    Mark the resolver of a root field whose result depends on the user, so
+    cached results of the field are keyed by user too.
+    """
+    USER_SCOPED_FIELDS.add(to_camel_case(resolver.__name__.removeprefix("resolve_")))
+    return resolver
+
+
+class MemoryBackend:
+    """
+    In-process LRU store. Entries are per worker; the version counters that
+    invalidate them live in the Django cache, so a shared cache there keeps
+    every worker's entries consistent.
+    """
+
+    def __init__(self, maxsize):
+        self._entries = LRUCache(maxsize)
+
+    def get(self, key):
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        expires_at, value = entry
+        if expires_at < time.monotonic():
+            self._entries.delete(key)
+            return None
+        return value
+
+    def set(self, key, value, timeout):
+        self._entries.set(key, (time.monotonic() + timeout, value))
+
+    def clear(self):
+        self._entries.clear()
+
+
+class DjangoCacheBackend:
+    """
+    Store backed by one of the aliases in `settings.CACHES`.
+    """
+
+    def __init__(self, alias):
+        self.alias = alias
+
+    @property
+    def cache(self):
+        return caches[self.alias]
+
+    def get(self, key):
+        return self.cache.get(key)
+
+    def set(self, key, value, timeout):
+        self.cache.set(key, value, timeout)
+
+    def clear(self):
+        self.cache.clear()
+
+
+class ResponseCache:
+    """
+    Cache of query results keyed by (organization, normalized query hash,
+    operation name, variables).
+
+    Every key embeds the organization's current version; mutations bump
+    that version, which makes all earlier entries of the organization
+    unreachable at once.
+    """
+
+    def __init__(self):
+        self._backend = None
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    @property
+    def enabled(self):
+        # Bumped versions must reach every worker.
+        return settings.GRAPHQL_RESPONSE_CACHE and is_shared(DEFAULT_CACHE_ALIAS)
+
+    @property
+    def backend(self):
+        if self._backend is None:
+            name = settings.GRAPHQL_RESPONSE_CACHE_BACKEND
+            if name == "memory":
+                self._backend = MemoryBackend(settings.GRAPHQL_RESPONSE_CACHE_SIZE)
+            else:
+                self._backend = DjangoCacheBackend(name)
+        return self._backend
+
+    # Organization versions
+    def _version_key(self, organization_id):
+        return f"graphql:response:version:{organization_id}"
+
+    def get_version(self, organization_id):
+        key = self._version_key(organization_id)
+        version = cache.get(key)
+        if version is None:
+            # Start from a timestamp so a version evicted from the cache
+            # never comes back with a value that older entries used.
+            cache.add(key, time.time_ns(), None)
+            version = cache.get(key)
+        return version
+
+    def invalidate_organization(self, organization_id):
+        key = self._version_key(organization_id)
+        try:
+            cache.incr(key)
+        except ValueError:
+            cache.set(key, time.time_ns(), None)
+
+    # Entries
+    def get_key(self, user, normalized_hash, operation_ast, variables, operation_name):
+        """
+        Return the cache key for a query, or None if it must not be cached.
+        """
+        organization_id = getattr(user, "organization_id", None)
+        if not self.enabled or organization_id is None:
+            return None
+
+        root_selections = operation_ast.selection_set.selections
+        user_scoped = any(
+            not isinstance(selection, FieldNode)
+            or selection.name.value in USER_SCOPED_FIELDS
+            for selection in root_selections
+        )
+        variables_hash = hashlib.sha256(
+            json.dumps(variables or {}, sort_keys=True, default=str).encode()
+        ).hexdigest()
+        return ":".join([
+            "graphql:response",
+            str(organization_id),
+            str(self.get_version(organization_id)),
+            str(user.pk) if user_scoped else "*",
+            normalized_hash,
+            operation_name or "",
+            variables_hash,
+        ])
+
+    def get(self, key):
+        data = self.backend.get(key)
+        with self._lock:
+            if data is None:
+                self.misses += 1
+            else:
+                self.hits += 1
+        record_cache_lookups("graphql_response", hits=int(data is not None), misses=int(data is None))
+        return data
+
+    def set(self, key, data):
+        self.backend.set(key, data, settings.GRAPHQL_RESPONSE_CACHE_TIMEOUT)
+
+    def stats(self):
+        with self._lock:
+            return {"hits": self.hits, "misses": self.misses}
+
+
+response_cache = ResponseCache()
@@ -1,6 +1,8 @@
 import graphene
 from accounts.schema import AccountsQuery, AccountsMutation
-from project_management.schema import Query as PMQuery, Mutation as PMMutation
+from project_management.schema import (
+    Query as PMQuery, Mutation as PMMutation, Subscription as PMSubscription,
+)
 
 
 class Query(AccountsQuery, PMQuery, graphene.ObjectType):
@@ -11,4 +13,8 @@ class Mutation(AccountsMutation, PMMutation, graphene.ObjectType):
     pass
 
 
-schema = graphene.Schema(query=Query, mutation=Mutation)
+class Subscription(PMSubscription, graphene.ObjectType):
+    pass
+
+
+schema = graphene.Schema(query=Query, mutation=Mutation, subscription=Subscription)
@@ -52,6 +52,7 @@ INSTALLED_APPS = [
     'django.contrib.sessions',
     'django.contrib.messages',
     'django.contrib.staticfiles',
+    'django.contrib.postgres',
     'corsheaders',
     'graphene_django',
     'graphql_jwt.refresh_token.apps.RefreshTokenConfig',
@@ -94,6 +95,24 @@ WSGI_APPLICATION = 'backend.wsgi.application'
 # Database
 # https://docs.djangoproject.com/en/5.2/ref/settings/#databases
 
+# Each worker process keeps a pool of DB_POOL_MIN_SIZE to DB_POOL_MAX_SIZE
+# connections; a request waits up to DB_POOL_TIMEOUT seconds for a free one.
+# Connections go back to the pool when the request finishes, which is what
+# makes the pool safe under ASGI, where requests run in short-lived threads.
+DB_POOL = config('DB_POOL', default=True, cast=bool)
+DB_POOL_MIN_SIZE = config('DB_POOL_MIN_SIZE', default=2, cast=int)
+DB_POOL_MAX_SIZE = config('DB_POOL_MAX_SIZE', default=10, cast=int)
+DB_POOL_TIMEOUT = config('DB_POOL_TIMEOUT', default=10, cast=float)
+
+# Without the pool, seconds a connection is kept open between requests (0
+# closes it after every request). Only use this with WSGI: under ASGI every
+# request opens its own connection, so persistent ones pile up.
+DB_CONN_MAX_AGE = config('DB_CONN_MAX_AGE', default=0, cast=int)
+
+# Check that a reused connection, pooled or persistent, still works before
+# handing it to a request
+DB_CONN_HEALTH_CHECKS = config('DB_CONN_HEALTH_CHECKS', default=True, cast=bool)
+
 DATABASES = {
     'default': {
         'ENGINE': 'django.db.backends.postgresql',
@@ -102,9 +121,68 @@ DATABASES = {
         'PASSWORD': config('DB_PASS'),
         'HOST': config('DB_HOST', default='localhost'),
         'PORT': config('DB_PORT', default='5432'),
+        # The pool manages connection lifetimes itself.
+        'CONN_MAX_AGE': 0 if DB_POOL else DB_CONN_MAX_AGE,
+        'CONN_HEALTH_CHECKS': DB_CONN_HEALTH_CHECKS,
+        'OPTIONS': {
+            'pool': {
+                'min_size': DB_POOL_MIN_SIZE,
+                'max_size': DB_POOL_MAX_SIZE,
+                'timeout': DB_POOL_TIMEOUT,
+            },
+        } if DB_POOL else {},
+    }
+}
+
+# Server worker processes; uvicorn reads the same variable for --workers.
+WEB_CONCURRENCY = config('WEB_CONCURRENCY', default=1, cast=int)
+
+# The default cache holds the authenticated users, the response cache's
+# organization versions and the replica sticky marks. Invalidating them
+# only reaches every worker when the cache is shared: the default, an
+# in-process LocMemCache, is only right with one worker. With more, set a
+# shared backend such as django.core.cache.backends.db.DatabaseCache
+# (CACHE_LOCATION is its table, created with `manage.py createcachetable`).
+# Otherwise the user and response caches and replica reads are turned off
+# (check backend.W001).
+CACHE_BACKEND = config(
+    'CACHE_BACKEND', default='django.core.cache.backends.locmem.LocMemCache')
+CACHE_LOCATION = config('CACHE_LOCATION', default='')
+
+CACHES = {
+    'default': {
+        'BACKEND': CACHE_BACKEND,
+        'LOCATION': CACHE_LOCATION,
     }
 }
 
+# Read replicas of the default database, as "host" or "host:port" (same
+# name and credentials). Reads of GraphQL query operations go to one of
+# them; writes, mutations and everything outside GraphQL use the primary.
+DB_REPLICA_HOSTS = config('DB_REPLICA_HOSTS', default='', cast=Csv())
+
+# Seconds a user keeps reading from the primary after a write, so they see
+# their own changes despite replication lag. The marks are kept in this
+# cache, which must be shared by the workers (see CACHE_BACKEND): with
+# several workers and a LocMemCache, reads stay on the primary.
+DB_REPLICA_STICKY_SECONDS = config('DB_REPLICA_STICKY_SECONDS', default=5, cast=int)
+DB_REPLICA_STICKY_CACHE = config('DB_REPLICA_STICKY_CACHE', default='default')
+
+DATABASE_REPLICAS = []
+for number, replica_host in enumerate(DB_REPLICA_HOSTS, start=1):
+    replica_host, _, replica_port = replica_host.partition(':')
+    DATABASE_REPLICAS.append(f'replica{number}')
+    DATABASES[f'replica{number}'] = {
+        **DATABASES['default'],
+        'HOST': replica_host,
+        'PORT': replica_port or DATABASES['default']['PORT'],
+        'OPTIONS': dict(DATABASES['default']['OPTIONS']),
+        # Tests read the rows they wrote through the replica aliases.
+        'TEST': {'MIRROR': 'default'},
+    }
+
+DATABASE_ROUTERS = ['backend.db_router.ReplicaRouter']
+
 
 # Password validation
 # https://docs.djangoproject.com/en/5.2/ref/settings/#auth-password-validators
@@ -162,10 +240,108 @@ CORS_ALLOWED_ORIGINS = config(
 GRAPHENE = {
     "SCHEMA": "backend.schema.schema",
     "MIDDLEWARE": [
+        "backend.instrumentation.InstrumentationMiddleware",
         "graphql_jwt.middleware.JSONWebTokenMiddleware",
     ],
 }
 
+# Serve /graphql/ with the async view, which executes queries on the event
+# loop when running under ASGI
+GRAPHQL_ASYNC = config('GRAPHQL_ASYNC', default=False, cast=bool)
+
+# Number of parsed and validated GraphQL documents kept in memory per worker
+GRAPHQL_DOCUMENT_CACHE_SIZE = config(
+    'GRAPHQL_DOCUMENT_CACHE_SIZE', default=512, cast=int)
+
+# Operations accepted in one batched request (a JSON array of operations
+# posted to /graphql/); 0 turns batching off
+GRAPHQL_MAX_BATCH_SIZE = config('GRAPHQL_MAX_BATCH_SIZE', default=10, cast=int)
+
+# Automatic persisted queries: an optional JSON manifest of sha256 -> query,
+# and whether to reject every query that is not in it
+GRAPHQL_PERSISTED_QUERIES_MANIFEST = config(
+    'GRAPHQL_PERSISTED_QUERIES_MANIFEST', default='')
+GRAPHQL_PERSISTED_QUERIES_ONLY = config(
+    'GRAPHQL_PERSISTED_QUERIES_ONLY', default=False, cast=bool)
+
+# Static limits checked before a GraphQL operation runs. Fields returning
+# objects cost 1, multiplied by `first` of every enclosing connection, or by
+# the list cap (pagination.MAX_LIST_SIZE) of every enclosing plain list. The
+# default cost admits two levels of plain lists, such as tasks with their
+# comments (about 500 * 500), but not three.
+GRAPHQL_MAX_DEPTH = config('GRAPHQL_MAX_DEPTH', default=12, cast=int)
+GRAPHQL_MAX_COST = config('GRAPHQL_MAX_COST', default=300000, cast=int)
+
+# Opt-in cache of GraphQL query results. The backend is either "memory"
+# (an in-process LRU) or the alias of a cache in CACHES. Its invalidation
+# goes through versions kept in the default cache, so with several workers
+# it is only enabled when that cache is shared (see CACHE_BACKEND).
+GRAPHQL_RESPONSE_CACHE = config(
+    'GRAPHQL_RESPONSE_CACHE', default=False, cast=bool)
+GRAPHQL_RESPONSE_CACHE_BACKEND = config(
+    'GRAPHQL_RESPONSE_CACHE_BACKEND', default='memory')
+GRAPHQL_RESPONSE_CACHE_SIZE = config(
+    'GRAPHQL_RESPONSE_CACHE_SIZE', default=1024, cast=int)
+GRAPHQL_RESPONSE_CACHE_TIMEOUT = config(
+    'GRAPHQL_RESPONSE_CACHE_TIMEOUT', default=300, cast=int)
+
+# GraphQL subscriptions: where mutations publish change events ("memory" for
+# a single process, "postgres" to fan out over LISTEN/NOTIFY to every
+# worker), how many undelivered events a subscription may hold before it is
+# closed with an error, and how long a WebSocket may stay open without
+# connection_init
+GRAPHQL_SUBSCRIPTION_BROKER = config(
+    'GRAPHQL_SUBSCRIPTION_BROKER', default='memory')
+GRAPHQL_SUBSCRIPTION_QUEUE_SIZE = config(
+    'GRAPHQL_SUBSCRIPTION_QUEUE_SIZE', default=100, cast=int)
+GRAPHQL_WS_CONNECTION_INIT_TIMEOUT = config(
+    'GRAPHQL_WS_CONNECTION_INIT_TIMEOUT', default=10, cast=int)
+
+# GraphQL operations taking at least this many milliseconds are logged with
+# their slowest resolvers
+GRAPHQL_SLOW_OPERATION_MS = config(
+    'GRAPHQL_SLOW_OPERATION_MS', default=500, cast=int)
+
+# Distinct operation names tracked per worker in metrics; further names are
+# reported as "other"
+GRAPHQL_METRICS_MAX_OPERATIONS = config(
+    'GRAPHQL_METRICS_MAX_OPERATIONS', default=200, cast=int)
+
+# Bearer token required to scrape /metrics (open when empty)
+METRICS_TOKEN = config('METRICS_TOKEN', default='')
+
+# Authentication caches: verified JWTs per worker (until they expire), and
+# the authenticated user with its organization for AUTH_USER_CACHE_TIMEOUT
+# seconds (0 disables it) in the AUTH_USER_CACHE cache. Saving or deleting a
+# user or organization drops its entries; changes made with queryset
+# update() show after the timeout. With several workers the user cache is
+# only enabled when AUTH_USER_CACHE is shared (see CACHE_BACKEND): a
+# LocMemCache would keep serving a changed user on the other workers.
+AUTH_TOKEN_CACHE_SIZE = config('AUTH_TOKEN_CACHE_SIZE', default=4096, cast=int)
+AUTH_USER_CACHE = config('AUTH_USER_CACHE', default='default')
+AUTH_USER_CACHE_TIMEOUT = config('AUTH_USER_CACHE_TIMEOUT', default=60, cast=int)
+
+# Rows fetched from the database and written to the response at a time by
+# the /export/ endpoints
+EXPORT_CHUNK_SIZE = config('EXPORT_CHUNK_SIZE', default=2000, cast=int)
+
+# Rows validated and copied into the staging tables at a time by imports
+IMPORT_CHUNK_SIZE = config('IMPORT_CHUNK_SIZE', default=5000, cast=int)
+
+# Monthly partitions of the comments table created ahead of time by
+# create_comment_partitions
+COMMENT_PARTITION_MONTHS_AHEAD = config(
+    'COMMENT_PARTITION_MONTHS_AHEAD', default=3, cast=int)
+
+# Days after its last update (or restore) that a COMPLETED project is moved
+# to archive storage by archive_projects
+ARCHIVE_COMPLETED_AFTER_DAYS = config(
+    'ARCHIVE_COMPLETED_AFTER_DAYS', default=180, cast=int)
+
+# Seconds a computed project statistics entry stays in the cache
+PROJECT_STATS_CACHE_TIMEOUT = config(
+    'PROJECT_STATS_CACHE_TIMEOUT', default=60, cast=int)
+
 
 AUTHENTICATION_BACKENDS = [
     "graphql_jwt.backends.JSONWebTokenBackend",
@@ -174,6 +350,8 @@ AUTHENTICATION_BACKENDS = [
 
 GRAPHQL_JWT = {
     "JWT_AUTH_HEADER_PREFIX": "Bearer",
+    "JWT_DECODE_HANDLER": "accounts.auth.decode_token",
+    "JWT_GET_USER_BY_NATURAL_KEY_HANDLER": "accounts.auth.get_user_by_natural_key",
     "JWT_VERIFY_EXPIRATION": True,
     "JWT_LONG_RUNNING_REFRESH_TOKEN": True,
     "JWT_EXPIRATION_DELTA": datetime.timedelta(
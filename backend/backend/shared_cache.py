@@ -0,0 +1,38 @@
+from django.conf import settings
+from django.core import checks
+from django.core.cache import DEFAULT_CACHE_ALIAS, caches
+from django.core.cache.backends.locmem import LocMemCache
+
+
+def is_shared(alias):
+    """
+    Whether every worker sees the entries of the cache `alias`: always with
+    a single worker (WEB_CONCURRENCY), otherwise unless the cache is an
+    in-process LocMemCache.
+    """
+    return settings.WEB_CONCURRENCY <= 1 or not isinstance(caches[alias], LocMemCache)
+
+
+@checks.register(checks.Tags.caches)
+def check_shared_caches(app_configs, **kwargs):
+    """
+    Warn about the features turned off because their cache entries would
+    only reach the worker that wrote them.
+    """
+    disabled = []
+    if settings.AUTH_USER_CACHE_TIMEOUT > 0 and not is_shared(settings.AUTH_USER_CACHE):
+        disabled.append(("authenticated user cache", settings.AUTH_USER_CACHE))
+    if settings.GRAPHQL_RESPONSE_CACHE and not is_shared(DEFAULT_CACHE_ALIAS):
+        disabled.append(("GraphQL response cache", DEFAULT_CACHE_ALIAS))
+    if settings.DATABASE_REPLICAS and not is_shared(settings.DB_REPLICA_STICKY_CACHE):
+        disabled.append(("routing of reads to replicas", settings.DB_REPLICA_STICKY_CACHE))
+    return [
+        checks.Warning(
+            f"The {name} is turned off: cache '{alias}' is a per-process LocMemCache "
+            f"and WEB_CONCURRENCY is {settings.WEB_CONCURRENCY}.",
+            hint="Set CACHE_BACKEND to a cache shared by the workers, such as "
+                 "django.core.cache.backends.db.DatabaseCache.",
+            id="backend.W001",
+        )
+        for name, alias in disabled
+    ]
@@ -0,0 +1,738 @@
+import asyncio
+import json
+from unittest import mock, skipUnless
+import graphql
+from asgiref.sync import async_to_sync, sync_to_async
+from django.conf import settings
+from django.core.cache import cache
+from django.db import connections
+from django.test import AsyncRequestFactory, TestCase, TransactionTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from graphql_jwt.shortcuts import get_token
+from accounts.models import CustomUser, Organization
+from backend.broker import broker
+from backend.db_router import ReplicaRouter, sticky_key
+from backend.documents import document_cache, persisted_queries, query_hash
+from backend.graphql_ws import GRAPHQL_TRANSPORT_WS, graphql_ws_application
+from backend.instrumentation import operation_stats
+from prometheus_client import REGISTRY
+from backend.response_cache import response_cache
+from backend.shared_cache import check_shared_caches
+from backend.views import AsyncAPIGraphQLView
+from project_management.events import TASK_CHANGED
+from project_management.models import Project, Task, TaskComment
+
+
+class GraphQLEndpointTestCase(TestCase):
+    def setUp(self):
+        cache.clear()
+        document_cache.clear()
+
+    def post(self, body, **headers):
+        return self.client.post(
+            "/graphql/", json.dumps(body), content_type="application/json", **headers)
+
+
+class PersistedQueryTests(GraphQLEndpointTestCase):
+    QUERY = "query Ping { __typename }"
+
+    def persisted(self, sha256_hash=None):
+        return {"persistedQuery": {"version": 1, "sha256Hash": sha256_hash or query_hash(self.QUERY)}}
+
+    def test_unknown_hash_asks_for_the_query(self):
+        response = self.post({"extensions": self.persisted()})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()["errors"][0]["message"], "PersistedQueryNotFound")
+
+    def test_registered_query_is_served_by_hash(self):
+        response = self.post({"query": self.QUERY, "extensions": self.persisted()})
+        self.assertEqual(response.json()["data"], {"__typename": "Query"})
+
+        response = self.post({"extensions": self.persisted()})
+        self.assertEqual(response.json()["data"], {"__typename": "Query"})
+
+        response = self.client.get("/graphql/", {
+            "extensions": json.dumps(self.persisted())}, HTTP_ACCEPT="application/json")
+        self.assertEqual(response.json()["data"], {"__typename": "Query"})
+
+    def test_hash_mismatch_is_rejected(self):
+        response = self.post({"query": self.QUERY, "extensions": self.persisted("0" * 64)})
+        self.assertEqual(response.status_code, 403)
+
+    @override_settings(GRAPHQL_PERSISTED_QUERIES_ONLY=True)
+    def test_allow_list_mode(self):
+        allowed = {query_hash(self.QUERY): self.QUERY}
+        with mock.patch.object(persisted_queries, "_manifest", allowed):
+            self.assertEqual(
+                self.post({"extensions": self.persisted()}).json()["data"],
+                {"__typename": "Query"})
+            self.assertEqual(self.post({"query": "{ __schema { queryType { name } } }"}).status_code, 403)
+            self.assertEqual(self.post({"query": self.QUERY}).status_code, 200)
+
+
+class DocumentCacheTests(GraphQLEndpointTestCase):
+    def test_documents_are_parsed_and_validated_once(self):
+        with mock.patch("backend.views.parse", wraps=graphql.parse) as parse, \
+                mock.patch("backend.views.validate", wraps=graphql.validate) as validate:
+            for _ in range(3):
+                response = self.post({"query": "{ __typename }"})
+                self.assertEqual(response.json()["data"], {"__typename": "Query"})
+        self.assertEqual(parse.call_count, 1)
+        self.assertEqual(validate.call_count, 1)
+
+    def test_invalid_documents_still_report_errors(self):
+        for _ in range(2):
+            response = self.post({"query": "{ doesNotExist }"})
+            self.assertEqual(response.status_code, 400)
+            self.assertIn("doesNotExist", response.json()["errors"][0]["message"])
+
+
+@override_settings(GRAPHQL_RESPONSE_CACHE=True)
+class ResponseCacheTests(GraphQLEndpointTestCase):
+    PROJECTS = "query { projects { name } }"
+
+    def setUp(self):
+        super().setUp()
+        response_cache.backend.clear()
+        self.acme = Organization.objects.create(name="Acme", slug="acme", contact_email="a@a.test")
+        self.globex = Organization.objects.create(name="Globex", slug="globex", contact_email="g@g.test")
+        self.alice = CustomUser.objects.create_user(
+            username="alice", email="alice@acme.test", password="x", organization=self.acme)
+        self.bob = CustomUser.objects.create_user(
+            username="bob", email="bob@acme.test", password="x", organization=self.acme)
+        self.gina = CustomUser.objects.create_user(
+            username="gina", email="gina@globex.test", password="x", organization=self.globex)
+        Project.objects.create(organization=self.acme, name="Acme project")
+        Project.objects.create(organization=self.globex, name="Globex project")
+
+    def query(self, user, query, variables=None):
+        response = self.post(
+            {"query": query, "variables": variables},
+            HTTP_AUTHORIZATION=f"Bearer {get_token(user)}")
+        return response.json()
+
+    def test_repeated_query_is_served_from_cache(self):
+        self.query(self.alice, self.PROJECTS)
+        before = response_cache.stats()
+        with self.assertNumQueries(0):  # the token's user is cached too
+            data = self.query(self.alice, self.PROJECTS)["data"]
+        self.assertEqual(data, {"projects": [{"name": "Acme project"}]})
+        self.assertEqual(response_cache.stats()["hits"], before["hits"] + 1)
+
+    def test_entries_are_isolated_per_organization_and_user(self):
+        self.query(self.alice, self.PROJECTS)
+        self.assertEqual(self.query(self.gina, self.PROJECTS)["data"],
+                         {"projects": [{"name": "Globex project"}]})
+
+        self.query(self.alice, "query { me { email } }")
+        self.assertEqual(self.query(self.bob, "query { me { email } }")["data"],
+                         {"me": {"email": "bob@acme.test"}})
+
+    def test_user_scoped_fields_are_cached_per_user(self):
+        project = Project.objects.get(name="Acme project")
+        Task.objects.create(project=project, title="Alice's", assignee=self.alice)
+        Task.objects.create(project=project, title="Bob's", assignee=self.bob)
+        query = "query { myTasks { edges { node { title } } } }"
+        for user, title in ((self.alice, "Alice's"), (self.bob, "Bob's"), (self.alice, "Alice's")):
+            self.assertEqual(self.query(user, query)["data"]["myTasks"]["edges"],
+                             [{"node": {"title": title}}])
+
+    @override_settings(WEB_CONCURRENCY=2)
+    def test_per_process_versions_are_not_used_by_several_workers(self):
+        self.assertFalse(response_cache.enabled)
+        before = response_cache.stats()
+        for _ in range(2):
+            self.assertEqual(self.query(self.alice, self.PROJECTS)["data"],
+                             {"projects": [{"name": "Acme project"}]})
+        self.assertEqual(response_cache.stats(), before)
+
+    def test_mutation_invalidates_the_organization(self):
+        self.query(self.alice, self.PROJECTS)
+        self.query(self.gina, self.PROJECTS)
+        self.query(self.bob, 'mutation { createProject(name: "Second") { project { id } } }')
+
+        self.assertEqual(len(self.query(self.alice, self.PROJECTS)["data"]["projects"]), 2)
+        hits = response_cache.stats()["hits"]
+        self.query(self.gina, self.PROJECTS)
+        self.assertEqual(response_cache.stats()["hits"], hits + 1)
+
+
+class QueryCostTests(GraphQLEndpointTestCase):
+    def test_cost_is_reported_in_extensions(self):
+        response = self.post({"query": """
+            query ($id: ID!) {
+                tasks(projectId: $id) { id assignee { email } comments { author { email } } }
+            }
+        """, "variables": {"id": 1}})
+        cost = response.json()["extensions"]["cost"]
+        # tasks: 1 + 500 * (assignee 1 + comments (1 + 500 * author 1))
+        self.assertEqual(cost["requestedQueryCost"], 1 + 500 * (1 + (1 + 500 * 1)))
+        self.assertEqual(cost["depth"], 4)
+
+    def test_connections_use_their_page_size(self):
+        response = self.post({"query": """
+            query ($first: Int) {
+                projectsConnection(first: $first) { edges { node { tasks { id } } } }
+            }
+        """, "variables": {"first": 5}})
+        cost = response.json()["extensions"]["cost"]
+        # connection: 1 + 5 * (edges: 1 + (node: 1 + tasks: 1))
+        self.assertEqual(cost["requestedQueryCost"], 1 + 5 * (1 + 1 + 1))
+
+    def test_deep_cyclic_query_is_rejected_before_execution(self):
+        nested = "id"
+        for _ in range(8):
+            nested = f"tasks {{ project {{ {nested} }} }}"
+        response = self.post({"query": f"query {{ projects {{ {nested} }} }}"})
+        self.assertEqual(response.status_code, 400)
+        self.assertIn("Query depth", response.json()["errors"][0]["message"])
+
+    def test_plain_lists_are_priced_at_their_cap(self):
+        response = self.post({"query": "query { projects { tasks { comments { author { id } } } } }"})
+        self.assertEqual(response.status_code, 400)
+        self.assertIn("Query cost", response.json()["errors"][0]["message"])
+        # projects: 1 + 500 * (tasks: 1 + 500 * (comments: 1 + 500 * author 1))
+        self.assertEqual(response.json()["extensions"]["cost"]["requestedQueryCost"],
+                         1 + 500 * (1 + 500 * (1 + 500)))
+
+    @override_settings(GRAPHQL_MAX_COST=100)
+    def test_expensive_query_is_rejected(self):
+        response = self.post({"query": "query { projects { tasks { comments { id } } } }"})
+        self.assertEqual(response.status_code, 400)
+        self.assertIn("Query cost", response.json()["errors"][0]["message"])
+
+
+def without_extensions(result):
+    return {key: value for key, value in result.items() if key != "extensions"}
+
+
+def count_user_queries(context):
+    return sum('"accounts_customuser"."password"' in query["sql"] for query in context.captured_queries)
+
+
+class BatchTests(GraphQLEndpointTestCase):
+    TASK_SCREEN = [
+        {"id": "task", "query": "query ($id: ID!) { task(id: $id) { title status } }"},
+        {"id": "comments", "query": "query ($id: ID!) { taskComments(taskId: $id) { content } }"},
+        {"id": "stats", "query": "query ($projectId: ID!) { projectStats(projectId: $projectId) { totalTasks } }"},
+    ]
+
+    @classmethod
+    def setUpTestData(cls):
+        organization = Organization.objects.create(
+            name="Acme", slug="acme", contact_email="a@a.test")
+        cls.user = CustomUser.objects.create_user(
+            username="alice", email="alice@acme.test", password="x", organization=organization)
+        cls.project = Project.objects.create(organization=organization, name="Project")
+        cls.task = Task.objects.create(project=cls.project, title="Task", assignee=cls.user)
+        TaskComment.objects.create(task=cls.task, content="Hello", author=cls.user)
+        cls.headers = {"HTTP_AUTHORIZATION": f"Bearer {get_token(cls.user)}"}
+
+    def task_screen(self):
+        variables = {"id": self.task.pk, "projectId": self.project.pk}
+        return [{**operation, "variables": variables} for operation in self.TASK_SCREEN]
+
+    @override_settings(AUTH_USER_CACHE_TIMEOUT=0)
+    def test_operations_share_one_request(self):
+        separate = CaptureQueriesContext(connections["default"])
+        with separate:
+            for operation in self.task_screen():
+                self.post(operation, **self.headers)
+
+        with CaptureQueriesContext(connections["default"]) as batched:
+            response = self.post(self.task_screen(), **self.headers)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual([without_extensions(result) for result in response.json()], [
+            {"data": {"task": {"title": "Task", "status": "TODO"}}, "id": "task", "status": 200},
+            {"data": {"taskComments": [{"content": "Hello"}]}, "id": "comments", "status": 200},
+            {"data": {"projectStats": {"totalTasks": 1}}, "id": "stats", "status": 200},
+        ])
+        # The user is loaded once for the whole batch.
+        self.assertEqual((count_user_queries(separate), count_user_queries(batched)), (3, 1))
+
+    def test_failed_operations_do_not_fail_the_batch(self):
+        response = self.post([
+            {"id": "unknown", "extensions": {"persistedQuery": {"version": 1, "sha256Hash": "0" * 64}}},
+            {"id": "invalid", "query": "{ doesNotExist }"},
+            "not an operation",
+            {"id": "ok", "query": "{ __typename }"},
+        ], **self.headers)
+        self.assertEqual(response.status_code, 200)
+        unknown, invalid, not_an_operation, ok = response.json()
+        self.assertEqual(unknown["errors"][0]["message"], "PersistedQueryNotFound")
+        self.assertEqual((invalid["id"], invalid["status"]), ("invalid", 400))
+        self.assertEqual(not_an_operation["status"], 400)
+        self.assertEqual(without_extensions(ok), {"data": {"__typename": "Query"}, "id": "ok", "status": 200})
+
+    def test_later_operations_see_earlier_mutations(self):
+        response = self.post([
+            self.task_screen()[0],
+            {"query": 'mutation ($id: ID!) { updateTask(id: $id, status: "DONE") { task { status } } }',
+             "variables": {"id": self.task.pk}},
+            self.task_screen()[0],
+        ], **self.headers)
+        statuses = [result["data"] for result in response.json()]
+        self.assertEqual(statuses[0]["task"]["status"], "TODO")
+        self.assertEqual(statuses[2]["task"]["status"], "DONE")
+
+    def test_batch_size_is_limited(self):
+        with self.settings(GRAPHQL_MAX_BATCH_SIZE=2):
+            response = self.post(self.task_screen(), **self.headers)
+            self.assertEqual(response.status_code, 400)
+            self.assertIn("limited to 2", response.json()["errors"][0]["message"])
+        with self.settings(GRAPHQL_MAX_BATCH_SIZE=0):
+            self.assertEqual(self.post(self.task_screen(), **self.headers).status_code, 400)
+        self.assertEqual(self.post([], **self.headers).status_code, 400)
+
+
+class InstrumentationTests(GraphQLEndpointTestCase):
+    QUERY = "query Board { projects { name tasks { title assignee { email } } } }"
+
+    def setUp(self):
+        super().setUp()
+        operation_stats.clear()
+        organization = Organization.objects.create(name="Acme", slug="acme", contact_email="a@a.test")
+        self.user = CustomUser.objects.create_user(
+            username="alice", email="alice@acme.test", password="x", organization=organization,
+            is_staff=True)
+        project = Project.objects.create(organization=organization, name="Board")
+        Task.objects.create(project=project, title="One", assignee=self.user)
+        self.headers = {"HTTP_AUTHORIZATION": f"Bearer {get_token(self.user)}"}
+
+    def test_debug_header_adds_per_field_metrics(self):
+        response = self.post({"query": self.QUERY}, HTTP_X_GRAPHQL_DEBUG="1", **self.headers)
+        metrics = response.json()["extensions"]["instrumentation"]
+        self.assertEqual(metrics["operation"], "Board")
+        self.assertEqual(metrics["sqlQueries"], 4)  # user, projects, tasks, assignees
+        fields = {field["field"]: field for field in metrics["resolvers"]}
+        self.assertEqual(fields["Query.projects"]["sqlQueries"], 1)
+        self.assertEqual(fields["ProjectType.tasks"]["calls"], 1)
+        self.assertNotIn("ProjectType.name", fields)
+
+        response = self.post({"query": self.QUERY}, **self.headers)
+        self.assertNotIn("instrumentation", response.json().get("extensions") or {})
+
+    def test_debug_metrics_are_limited_to_staff(self):
+        self.user.is_staff = False
+        self.user.save()
+        response = self.post({"query": self.QUERY}, HTTP_X_GRAPHQL_DEBUG="1", **self.headers)
+        self.assertNotIn("instrumentation", response.json().get("extensions") or {})
+
+    @override_settings(GRAPHQL_SLOW_OPERATION_MS=0)
+    def test_slow_operations_are_logged_and_aggregated(self):
+        with self.assertLogs("backend.instrumentation", "WARNING") as logs:
+            self.post({"query": self.QUERY}, **self.headers)
+            self.post({"query": "{ doesNotExist }"}, **self.headers)
+        self.assertIn("Slow GraphQL operation Board", logs.output[0])
+
+        self.client.force_login(self.user)
+        stats = self.client.get("/graphql/operations/").json()
+        self.assertEqual(stats["Board"]["durationMs"]["count"], 1)
+        self.assertEqual(stats["Board"]["sqlQueries"]["buckets"]["5"], 1)
+        self.assertEqual(stats["anonymous"]["errors"], 1)
+
+
+@override_settings(DATABASE_REPLICAS=["replica1"])
+class ReplicaRoutingTests(GraphQLEndpointTestCase):
+    PROJECTS = "query { projects { name } }"
+
+    def setUp(self):
+        super().setUp()
+        organization = Organization.objects.create(name="Acme", slug="acme", contact_email="a@a.test")
+        self.alice = CustomUser.objects.create_user(
+            username="alice", email="alice@acme.test", password="x", organization=organization)
+        self.bob = CustomUser.objects.create_user(
+            username="bob", email="bob@acme.test", password="x", organization=organization)
+
+    def read_aliases(self, user, query):
+        """
+        Aliases the router picked for each read; the reads themselves run on
+        the default database, as there is no replica in tests.
+        """
+        aliases = []
+        db_for_read = ReplicaRouter.db_for_read
+
+        def recording_db_for_read(router, model, **hints):
+            aliases.append(db_for_read(router, model, **hints))
+            return "default"
+
+        with mock.patch.object(ReplicaRouter, "db_for_read", recording_db_for_read):
+            response = self.post({"query": query}, HTTP_AUTHORIZATION=f"Bearer {get_token(user)}")
+        self.assertNotIn("errors", response.json())
+        return aliases
+
+    def test_reads_outside_graphql_use_the_primary(self):
+        self.assertEqual(Project.objects.all().db, "default")
+
+    def test_queries_read_from_a_replica(self):
+        # The token's user is looked up on the primary, before routing.
+        self.assertEqual(self.read_aliases(self.alice, self.PROJECTS)[-1], "replica1")
+
+    def test_writers_read_their_writes_from_the_primary(self):
+        aliases = self.read_aliases(
+            self.alice, 'mutation { createProject(name: "New") { project { name } } }')
+        self.assertEqual(set(aliases), {"default"})
+
+        self.assertEqual(set(self.read_aliases(self.alice, self.PROJECTS)), {"default"})
+        self.assertEqual(self.read_aliases(self.bob, self.PROJECTS)[-1], "replica1")
+
+        # Once the sticky window is over
+        cache.delete(sticky_key(self.alice))
+        self.assertEqual(self.read_aliases(self.alice, self.PROJECTS)[-1], "replica1")
+
+    @override_settings(WEB_CONCURRENCY=2)
+    def test_reads_stay_on_the_primary_without_a_shared_sticky_cache(self):
+        self.assertEqual(set(self.read_aliases(self.alice, self.PROJECTS)), {"default"})
+        self.assertIn("routing of reads to replicas is turned off",
+                      " ".join(warning.msg for warning in check_shared_caches(None)))
+
+
+@skipUnless(settings.DATABASE_REPLICAS, "DB_REPLICA_HOSTS is not set")
+class ReplicaDatabaseTests(TransactionTestCase):
+    # Mirrors read through their own connections, so the rows are committed.
+    databases = {"default", *settings.DATABASE_REPLICAS}
+
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        # Pooled connections of the mirrors would keep the test database open.
+        for alias in settings.DATABASE_REPLICAS:
+            connections[alias].close_pool()
+
+    def test_queries_run_on_the_replica(self):
+        organization = Organization.objects.create(name="Acme", slug="acme", contact_email="a@a.test")
+        user = CustomUser.objects.create_user(
+            username="alice", email="alice@acme.test", password="x", organization=organization)
+        Project.objects.create(organization=organization, name="Alpha")
+
+        with CaptureQueriesContext(connections[settings.DATABASE_REPLICAS[0]]) as replica:
+            response = self.client.post(
+                "/graphql/", json.dumps({"query": "query { projects { name } }"}),
+                content_type="application/json", HTTP_AUTHORIZATION=f"Bearer {get_token(user)}")
+        self.assertEqual(response.json()["data"], {"projects": [{"name": "Alpha"}]})
+        self.assertTrue(replica.captured_queries)
+
+
+class MetricsTests(GraphQLEndpointTestCase):
+    def setUp(self):
+        super().setUp()
+        organization = Organization.objects.create(name="Acme", slug="acme", contact_email="a@a.test")
+        self.user = CustomUser.objects.create_user(
+            username="alice", email="alice@acme.test", password="x", organization=organization)
+        self.headers = {"HTTP_AUTHORIZATION": f"Bearer {get_token(self.user)}"}
+
+    def sample(self, name, **labels):
+        return REGISTRY.get_sample_value(name, labels) or 0
+
+    def test_operations_and_mutations_are_counted(self):
+        labels = {"operation": "NewProject", "type": "mutation"}
+        operations = self.sample("graphql_operations_total", **labels)
+        mutations = self.sample("graphql_mutations_total", mutation="CreateProject")
+        errors = self.sample("graphql_mutation_errors_total", mutation="UpdateProject")
+
+        self.post({"query": 'mutation NewProject { createProject(name: "A") { project { id } } }'},
+                  **self.headers)
+        self.post({"query": 'mutation { updateProject(id: 0, name: "B") { project { id } } }'},
+                  **self.headers)
+
+        self.assertEqual(self.sample("graphql_operations_total", **labels), operations + 1)
+        self.assertEqual(
+            self.sample("graphql_operation_duration_seconds_count", **labels), operations + 1)
+        self.assertEqual(self.sample("graphql_mutations_total", mutation="CreateProject"), mutations + 1)
+        self.assertEqual(
+            self.sample("graphql_mutation_errors_total", mutation="UpdateProject"), errors + 1)
+
+    def test_cache_lookups_are_counted(self):
+        query = {"query": "query Ping { __typename }"}
+        hits = self.sample("cache_requests_total", cache="graphql_document", result="hit")
+        misses = self.sample("cache_requests_total", cache="graphql_document", result="miss")
+        self.post(query)
+        self.post(query)
+        self.assertEqual(
+            self.sample("cache_requests_total", cache="graphql_document", result="miss"), misses + 1)
+        self.assertEqual(
+            self.sample("cache_requests_total", cache="graphql_document", result="hit"), hits + 1)
+
+    @override_settings(GRAPHQL_METRICS_MAX_OPERATIONS=0)
+    def test_operation_names_are_capped(self):
+        other = self.sample("graphql_operations_total", operation="other", type="query")
+        self.post({"query": "query NeverSeenBefore { __typename }"})
+        self.assertEqual(self.sample("graphql_operations_total", operation="other", type="query"),
+                         other + 1)
+
+    def test_metrics_endpoint(self):
+        self.post({"query": "query Ping { __typename }"})
+        response = self.client.get("/metrics")
+        self.assertEqual(response.status_code, 200)
+        body = response.content.decode()
+        self.assertIn('graphql_operations_total{operation="Ping",type="query"}', body)
+        self.assertIn("db_connections{", body)
+
+        with self.settings(METRICS_TOKEN="secret"):
+            self.assertEqual(self.client.get("/metrics").status_code, 403)
+            response = self.client.get("/metrics", HTTP_AUTHORIZATION="Bearer secret")
+            self.assertEqual(response.status_code, 200)
+
+
+# Three levels of plain lists, which the default cost limit rejects
+@override_settings(GRAPHQL_MAX_COST=10 ** 9)
+class AsyncViewTests(GraphQLEndpointTestCase):
+    QUERY = """
+        query ($projectId: ID!) {
+            me { email organization { slug } }
+            projects {
+                name
+                tasks { title assignee { email } comments { content author { email } } }
+                tasksConnection(first: 2) { totalCount edges { node { title } } }
+            }
+            projectStats(projectId: $projectId) { totalTasks completedTasks }
+            tasksConnection(projectId: $projectId, first: 2) {
+                totalCount
+                edges { node { title project { name } } }
+            }
+        }
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        organization = Organization.objects.create(
+            name="Acme", slug="acme", contact_email="a@a.test")
+        cls.user = CustomUser.objects.create_user(
+            username="alice", email="alice@acme.test", password="x", organization=organization)
+        for p in range(3):
+            project = Project.objects.create(organization=organization, name=f"Project {p}")
+            for t in range(3):
+                task = Task.objects.create(
+                    project=project, title=f"Task {t}", assignee=cls.user,
+                    status="DONE" if t == 0 else "TODO")
+                TaskComment.objects.create(task=task, content=f"Comment {t}", author=cls.user)
+        cls.project = project
+        cls.token = get_token(cls.user)
+
+    async def apost(self, body):
+        request = AsyncRequestFactory().post(
+            "/graphql/", json.dumps(body), content_type="application/json",
+            headers={"Authorization": f"Bearer {self.token}"})
+        response = await AsyncAPIGraphQLView.as_view()(request)
+        return response.status_code, json.loads(response.content)
+
+    async def test_query_matches_the_sync_view(self):
+        body = {"query": self.QUERY, "variables": {"projectId": self.project.pk}}
+        status_code, result = await self.apost(body)
+        self.assertEqual(status_code, 200)
+        self.assertNotIn("errors", result)
+
+        expected = await sync_to_async(self.post)(
+            body, HTTP_AUTHORIZATION=f"Bearer {self.token}")
+        self.assertEqual(result["data"], expected.json()["data"])
+        self.assertEqual(result["data"]["projectStats"], {"totalTasks": 3, "completedTasks": 1})
+        self.assertEqual(len(result["data"]["projects"]), 3)
+
+    def test_nested_lists_are_batched(self):
+        query = """
+            query { projects { __typename tasks { assignee { email } comments { author { email } } } } }
+        """
+        with self.assertNumQueries(5):  # user, projects, tasks, comments, assignees/authors
+            status_code, result = async_to_sync(self.apost)({"query": query})
+        self.assertEqual(status_code, 200)
+        self.assertEqual(
+            sum(len(project["tasks"]) for project in result["data"]["projects"]), 9)
+
+    async def test_batches(self):
+        status_code, results = await self.apost([
+            {"id": "stats", "query": "query ($id: ID!) { projectStats(projectId: $id) { totalTasks } }",
+             "variables": {"id": self.project.pk}},
+            {"id": "bad", "query": "{ doesNotExist }"},
+        ])
+        self.assertEqual(status_code, 200)
+        self.assertEqual(without_extensions(results[0]), {"data": {"projectStats": {"totalTasks": 3}}, "id": "stats", "status": 200})
+        self.assertEqual(results[1]["status"], 400)
+
+    async def test_mutations_run_synchronously(self):
+        status_code, result = await self.apost(
+            {"query": 'mutation { createProject(name: "Async") { project { name } } }'})
+        self.assertEqual(result["data"]["createProject"]["project"]["name"], "Async")
+        self.assertTrue(await Project.objects.filter(name="Async").aexists())
+
+    async def test_errors_are_reported(self):
+        status_code, result = await self.apost({"query": "{ doesNotExist }"})
+        self.assertEqual(status_code, 400)
+        status_code, result = await self.apost(
+            {"query": "query { project(id: 0) { name } }"})
+        self.assertEqual(result["errors"][0]["message"], "Not found or unauthorized")
+
+    def test_resolvers_are_instrumented(self):
+        request = AsyncRequestFactory().post(
+            "/graphql/", json.dumps({"query": "query Mine { projects { tasks { title } } }"}),
+            content_type="application/json",
+            headers={"Authorization": f"Bearer {self.token}", "X-GraphQL-Debug": "1"})
+        with self.settings(DEBUG=True):
+            response = async_to_sync(AsyncAPIGraphQLView.as_view())(request)
+        metrics = json.loads(response.content)["extensions"]["instrumentation"]
+        fields = {field["field"]: field for field in metrics["resolvers"]}
+        self.assertEqual(metrics["sqlQueries"], 3)
+        self.assertEqual(fields["ProjectType.tasks"]["calls"], 3)
+        self.assertEqual(fields["ProjectType.tasks"]["sqlQueries"], 1)
+
+
+class WebSocketClient:
+    def __init__(self, path="/graphql/"):
+        self.inbox = asyncio.Queue()
+        self.outbox = asyncio.Queue()
+        scope = {"type": "websocket", "path": path, "subprotocols": [GRAPHQL_TRANSPORT_WS]}
+        self.task = asyncio.create_task(
+            graphql_ws_application(scope, self.inbox.get, self.outbox.put))
+
+    async def send(self, message):
+        await self.inbox.put({"type": "websocket.receive", "text": json.dumps(message)})
+
+    async def receive(self):
+        message = await asyncio.wait_for(self.outbox.get(), 5)
+        return json.loads(message["text"]) if "text" in message else message
+
+    async def connect(self, token=None):
+        await self.inbox.put({"type": "websocket.connect"})
+        self.accepted = await self.receive()
+        await self.send({"type": "connection_init", "payload": {
+            "Authorization": f"Bearer {token}"} if token else {}})
+        return await self.receive()
+
+    async def subscribe(self, id, query, variables=None):
+        subscribers = len(broker.backend._subscribers)
+        await self.send({"id": id, "type": "subscribe", "payload": {
+            "query": query, "variables": variables or {}}})
+        # Wait until the subscription listens to the broker.
+        for _ in range(200):
+            if len(broker.backend._subscribers) > subscribers:
+                return
+            await asyncio.sleep(0.01)
+
+    async def disconnect(self):
+        await self.inbox.put({"type": "websocket.disconnect", "code": 1000})
+        await self.task
+
+
+class SubscriptionTests(GraphQLEndpointTestCase):
+    TASK_CHANGED = """
+        subscription ($projectId: ID!) {
+            taskChanged(projectId: $projectId) { title status assignee { email } }
+        }
+    """
+    STATS_CHANGED = "subscription { projectStatsChanged { projectId totalTasks completedTasks } }"
+
+    @classmethod
+    def setUpTestData(cls):
+        acme = Organization.objects.create(name="Acme", slug="acme", contact_email="a@a.test")
+        globex = Organization.objects.create(
+            name="Globex", slug="globex", contact_email="g@g.test")
+        cls.alice = CustomUser.objects.create_user(
+            username="alice", email="alice@acme.test", password="x", organization=acme)
+        cls.gina = CustomUser.objects.create_user(
+            username="gina", email="gina@globex.test", password="x", organization=globex)
+        cls.project = Project.objects.create(organization=acme, name="Board")
+        cls.task = Task.objects.create(project=cls.project, title="Write docs", assignee=cls.alice)
+        cls.other_project = Project.objects.create(organization=globex, name="Other")
+
+    def mutate(self, user, query):
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.post({"query": query}, HTTP_AUTHORIZATION=f"Bearer {get_token(user)}")
+        self.assertNotIn("errors", response.json())
+
+    async def test_task_changes_are_pushed_to_the_organization(self):
+        client = WebSocketClient()
+        token = await sync_to_async(get_token)(self.alice)
+        self.assertEqual(await client.connect(token), {"type": "connection_ack"})
+        await client.subscribe("tasks", self.TASK_CHANGED, {"projectId": self.project.pk})
+        await client.subscribe("stats", self.STATS_CHANGED)
+
+        await sync_to_async(self.mutate)(
+            self.gina, f'mutation {{ createTask(projectId: {self.other_project.pk}, title: "Hidden") {{ task {{ id }} }} }}')
+        await sync_to_async(self.mutate)(
+            self.alice, f'mutation {{ updateTask(id: {self.task.pk}, status: "DONE") {{ task {{ id }} }} }}')
+
+        messages = {}
+        for _ in range(2):
+            message = await client.receive()
+            messages[message["id"]] = message
+        self.assertEqual(messages["tasks"]["payload"]["data"]["taskChanged"], {
+            "title": "Write docs", "status": "DONE", "assignee": {"email": "alice@acme.test"}})
+        self.assertEqual(messages["stats"]["payload"]["data"]["projectStatsChanged"], {
+            "projectId": str(self.project.pk), "totalTasks": 1, "completedTasks": 1})
+        self.assertTrue(client.outbox.empty())
+
+        await client.send({"id": "tasks", "type": "complete"})
+        await client.send({"id": "stats", "type": "complete"})
+        await client.disconnect()
+
+    async def test_comments_are_pushed(self):
+        client = WebSocketClient()
+        await client.connect(await sync_to_async(get_token)(self.alice))
+        await client.subscribe("comments", """
+            subscription ($taskId: ID!) { commentAdded(taskId: $taskId) { content author { email } } }
+        """, {"taskId": self.task.pk})
+
+        await sync_to_async(self.mutate)(
+            self.alice, f'mutation {{ addTaskComment(taskId: {self.task.pk}, content: "Done") {{ comment {{ id }} }} }}')
+
+        message = await client.receive()
+        self.assertEqual(message["payload"]["data"]["commentAdded"], {
+            "content": "Done", "author": {"email": "alice@acme.test"}})
+        await client.disconnect()
+
+    @override_settings(GRAPHQL_SUBSCRIPTION_QUEUE_SIZE=2)
+    async def test_subscriptions_that_fall_behind_are_closed(self):
+        client = WebSocketClient()
+        await client.connect(await sync_to_async(get_token)(self.alice))
+        await client.subscribe("tasks", self.TASK_CHANGED, {"projectId": self.project.pk})
+        subscriber, = broker.backend._subscribers
+
+        # Published faster than the subscription consumes them
+        for _ in range(5):
+            broker.publish({
+                "type": TASK_CHANGED, "organization_id": self.project.organization_id,
+                "project_id": self.project.pk, "task_ids": [self.task.pk],
+            })
+        # Deliveries are scheduled on the subscription's loop.
+        await asyncio.sleep(0)
+        self.assertTrue(subscriber.overflowed)
+        self.assertEqual(subscriber.queue.qsize(), 2)
+
+        message = await client.receive()
+        self.assertEqual(message["type"], "error")
+        self.assertEqual(message["payload"][0]["message"],
+                         "Subscription closed: too many events were waiting to be delivered")
+        self.assertEqual(broker.backend._subscribers, set())
+        await client.disconnect()
+
+    async def test_other_organizations_cannot_subscribe(self):
+        client = WebSocketClient()
+        await client.connect(await sync_to_async(get_token)(self.gina))
+        await client.send({"id": "1", "type": "subscribe", "payload": {
+            "query": self.TASK_CHANGED, "variables": {"projectId": self.project.pk}}})
+        message = await client.receive()
+        self.assertEqual(message["type"], "error")
+        self.assertEqual(message["payload"][0]["message"], "Not found or unauthorized")
+        await client.disconnect()
+
+    async def test_protocol_errors(self):
+        client = WebSocketClient()
+        self.assertEqual((await client.connect("not-a-token"))["code"], 4403)
+        await client.task
+
+        client = WebSocketClient()
+        await client.inbox.put({"type": "websocket.connect"})
+        await client.receive()
+        await client.send({"id": "1", "type": "subscribe", "payload": {"query": self.STATS_CHANGED}})
+        self.assertEqual((await client.receive())["code"], 4401)
+        await client.task
+
+        client = WebSocketClient()
+        await client.connect()
+        await client.send({"id": "1", "type": "subscribe", "payload": {"query": "{ me { id } }"}})
+        message = await client.receive()
+        self.assertEqual(message["type"], "error")
+        await client.send({"id": "2", "type": "subscribe", "payload": {"query": self.STATS_CHANGED}})
+        message = await client.receive()
+        self.assertEqual(message["payload"][0]["message"],
+                         "You do not have permission to perform this action")
+        await client.disconnect()
@@ -14,12 +14,20 @@ Including another URLconf
     1. Import the include() function: from django.urls import include, path
     2. Add a URL to urlpatterns:  path('blog/', include('blog.urls'))
 """
+from django.conf import settings
 from django.contrib import admin
 from django.urls import path
-from graphene_django.views import GraphQLView
 from django.views.decorators.csrf import csrf_exempt
+from backend.views import APIGraphQLView, AsyncAPIGraphQLView, metrics_view, operation_stats_view
+from project_management.views import export_view, import_view
+
+GraphQLView = AsyncAPIGraphQLView if settings.GRAPHQL_ASYNC else APIGraphQLView
 
 urlpatterns = [
     path('admin/', admin.site.urls),
     path("graphql/", csrf_exempt(GraphQLView.as_view(graphiql=True))),
+    path("graphql/operations/", operation_stats_view),
+    path("metrics", metrics_view),
+    path("export/<str:resource>/", export_view),
+    path("import/", import_view),
 ]
@@ -0,0 +1,489 @@
+import inspect
+import json
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.contrib.admin.views.decorators import staff_member_required
+from django.contrib.auth import authenticate
+from django.db import connection, transaction
+from django.http import (
+    HttpResponse, HttpResponseBadRequest, HttpResponseForbidden, HttpResponseNotAllowed, JsonResponse,
+)
+from django.utils.crypto import constant_time_compare
+from graphene_django.constants import MUTATION_ERRORS_FLAG
+from graphene_django.utils.utils import set_rollback
+from graphene_django.settings import graphene_settings
+from graphene_django.views import GraphQLView, HttpError
+from graphql import ExecutionResult, GraphQLError, OperationType, execute, get_operation_ast, parse, print_ast, validate_schema
+from graphql.validation import validate
+from graphql_jwt.exceptions import JSONWebTokenError
+from prometheus_client import CONTENT_TYPE_LATEST
+from backend.async_execution import SyncResolverMiddleware
+from backend.cost import check_query_cost
+from backend.db_router import route_operation, routing_request
+from backend.documents import (
+    PersistedQueryNotFound, PersistedQueryRejected, document_cache, persisted_queries, query_hash,
+)
+from backend.instrumentation import instrument_operation, operation_stats, set_operation_name
+from backend.metrics import record_batch, record_cache_lookups, render_metrics
+from backend.response_cache import response_cache
+
+
+class PreparedOperation:
+    """
+    A parsed, validated and cost-checked operation ready to be executed.
+    """
+
+    def __init__(self, document, operation_ast, execute_options, extensions, cache_key):
+        self.document = document
+        self.operation_ast = operation_ast
+        self.execute_options = execute_options
+        self.extensions = extensions
+        self.cache_key = cache_key
+
+    @property
+    def is_mutation(self):
+        return (
+            self.operation_ast is not None
+            and self.operation_ast.operation == OperationType.MUTATION
+        )
+
+
+# Requests carrying this header get their OperationMetrics in the response
+# extensions, when DEBUG is on or the user is staff.
+DEBUG_HEADER = "X-GraphQL-Debug"
+
+
+class APIGraphQLView(GraphQLView):
+    """
+    GraphQLView with automatic persisted queries, a cache of parsed and
+    validated documents, query cost limits, an opt-in cache of query
+    results and per-operation instrumentation.
+    """
+
+    def dispatch(self, request, *args, **kwargs):
+        with routing_request(request):
+            return super().dispatch(request, *args, **kwargs)
+
+    def parse_body(self, request):
+        """
+        Accept a JSON array of operations as a batch, up to
+        GRAPHQL_MAX_BATCH_SIZE of them, besides single operations.
+        """
+        if (
+            settings.GRAPHQL_MAX_BATCH_SIZE > 0
+            and self.get_content_type(request) == "application/json"
+            and request.body.lstrip()[:1] == b"["
+        ):
+            self.batch = True
+            data = super().parse_body(request)
+            if len(data) > settings.GRAPHQL_MAX_BATCH_SIZE:
+                raise HttpError(HttpResponseBadRequest(
+                    f"Batches are limited to {settings.GRAPHQL_MAX_BATCH_SIZE} operations."))
+            record_batch(len(data))
+            return data
+        return super().parse_body(request)
+
+    def can_display_graphiql(self, request, data):
+        return not self.batch and super().can_display_graphiql(request, data)
+
+    def get_response(self, request, data, show_graphiql=False):
+        if not self.batch:
+            return self.get_operation_response(request, data, show_graphiql)
+        # The HTTP status of a batch stays 200, each operation carrying its
+        # own, so that one failed operation does not fail the others.
+        try:
+            self.start_batch_operation(request, data)
+            result, _ = self.get_operation_response(request, data)
+        except HttpError as e:
+            result, _ = self.format_batch_error(request, data, e)
+        return result, 200
+
+    def start_batch_operation(self, request, data):
+        """
+        Check one operation of a batch and reset the state the previous one
+        left on the request. The user, loaders and connection are shared.
+        """
+        if not isinstance(data, dict):
+            raise HttpError(HttpResponseBadRequest(
+                "Each operation of a batch must be a JSON object."))
+        if hasattr(request, MUTATION_ERRORS_FLAG):
+            delattr(request, MUTATION_ERRORS_FLAG)
+
+    def format_batch_error(self, request, data, e):
+        """
+        Answer one operation of a batch that failed before execution, such as
+        a persisted query the server does not know yet.
+        """
+        status_code = e.response.status_code
+        response = {
+            "errors": [self.format_error(e)],
+            "id": data.get("id") if isinstance(data, dict) else None,
+            "status": status_code,
+        }
+        return self.json_encode(request, response), status_code
+
+    def get_operation_response(self, request, data, show_graphiql=False):
+        query, variables, operation_name, id = self.get_graphql_params(request, data)
+
+        with instrument_operation() as metrics:
+            execution_result = self.execute_graphql_request(
+                request, data, query, variables, operation_name, show_graphiql
+            )
+            metrics.failed = bool(execution_result and execution_result.errors)
+        self.add_instrumentation(request, execution_result, metrics)
+        return self.format_response(request, execution_result, id, show_graphiql)
+
+    def add_instrumentation(self, request, execution_result, metrics):
+        if execution_result is None or DEBUG_HEADER not in request.headers:
+            return
+        user = self.get_user(request)
+        if settings.DEBUG or getattr(user, "is_staff", False):
+            execution_result.extensions = {
+                **(execution_result.extensions or {}), "instrumentation": metrics.as_dict(),
+            }
+
+    def format_response(self, request, execution_result, id, show_graphiql=False):
+        if getattr(request, MUTATION_ERRORS_FLAG, False) is True:
+            set_rollback()
+
+        status_code = 200
+        if execution_result:
+            response = {}
+
+            if execution_result.errors:
+                set_rollback()
+                response["errors"] = [
+                    self.format_error(e) for e in execution_result.errors
+                ]
+
+            if execution_result.errors and any(
+                not getattr(e, "path", None) for e in execution_result.errors
+            ):
+                status_code = 400
+            else:
+                response["data"] = execution_result.data
+
+            if execution_result.extensions:
+                response["extensions"] = execution_result.extensions
+
+            if self.batch:
+                response["id"] = id
+                response["status"] = status_code
+
+            result = self.json_encode(request, response, pretty=show_graphiql)
+        else:
+            result = None
+
+        return result, status_code
+
+    def get_graphql_params(self, request, data):
+        query, variables, operation_name, id = super().get_graphql_params(request, data)
+
+        extensions = request.GET.get("extensions") or data.get("extensions")
+        if extensions and isinstance(extensions, str):
+            try:
+                extensions = json.loads(extensions)
+            except ValueError:
+                raise HttpError(HttpResponseBadRequest("Extensions are invalid JSON."))
+
+        try:
+            query = persisted_queries.resolve(query, extensions)
+        except PersistedQueryNotFound as e:
+            # Clients retry with the full query text on this error.
+            raise HttpError(HttpResponse(), str(e))
+        except PersistedQueryRejected as e:
+            raise HttpError(HttpResponseForbidden(), str(e))
+        return query, variables, operation_name, id
+
+    def get_document(self, query):
+        """
+        Return `(document, errors, normalized_hash)` for the query, parsing
+        and validating it only the first time it is seen.
+        """
+        key = query_hash(query)
+        cached = document_cache.get(key)
+        if cached is not None:
+            record_cache_lookups("graphql_document", hits=1)
+            return cached
+        record_cache_lookups("graphql_document", misses=1)
+
+        try:
+            document = parse(query)
+        except Exception as e:
+            return None, [e], None
+
+        errors = validate(
+            self.schema.graphql_schema,
+            document,
+            self.validation_rules,
+            graphene_settings.MAX_VALIDATION_ERRORS,
+        )
+        # Formatting differences between clients map to the same hash.
+        normalized_hash = query_hash(print_ast(document))
+        document_cache.set(key, (document, errors, normalized_hash))
+        return document, errors, normalized_hash
+
+    def get_user(self, request):
+        """
+        Authenticate the request's token up front, so the response cache can
+        be keyed by organization before execution starts.
+        """
+        user = getattr(request, "user", None)
+        if user is not None and user.is_authenticated:
+            return user
+        try:
+            authenticated = authenticate(request=request)
+        except JSONWebTokenError:
+            # Left for the JWT middleware to report during execution.
+            return None
+        if authenticated is not None:
+            request.user = authenticated
+        return authenticated
+
+    def prepare_execution(self, request, query, variables, operation_name, show_graphiql=False):
+        """
+        Parse, validate and cost-check an operation.
+
+        Returns a PreparedOperation, or the final ExecutionResult (None for
+        GraphiQL) when the request is answered without executing anything.
+        """
+        if not query:
+            if show_graphiql:
+                return None
+            raise HttpError(HttpResponseBadRequest("Must provide query string."))
+
+        schema = self.schema.graphql_schema
+
+        schema_validation_errors = validate_schema(schema)
+        if schema_validation_errors:
+            return ExecutionResult(data=None, errors=schema_validation_errors)
+
+        document, errors, normalized_hash = self.get_document(query)
+        if document is None:
+            return ExecutionResult(errors=errors)
+
+        operation_ast = get_operation_ast(document, operation_name)
+        set_operation_name(operation_ast)
+        route_operation(
+            operation_ast, self.get_user(request) if settings.DATABASE_REPLICAS else None)
+
+        if (
+            request.method.lower() == "get"
+            and operation_ast is not None
+            and operation_ast.operation != OperationType.QUERY
+        ):
+            if show_graphiql:
+                return None
+
+            raise HttpError(
+                HttpResponseNotAllowed(
+                    ["POST"],
+                    "Can only perform a {} operation from a POST request.".format(
+                        operation_ast.operation.value
+                    ),
+                )
+            )
+
+        if errors:
+            return ExecutionResult(data=None, errors=errors)
+
+        if operation_ast is not None and operation_ast.operation == OperationType.SUBSCRIPTION:
+            return ExecutionResult(errors=[GraphQLError(
+                "Subscriptions are only served over WebSocket connections.")])
+
+        extensions = {}
+        if operation_ast is not None:
+            extensions, cost_error = check_query_cost(
+                schema, document, operation_ast, variables)
+            if cost_error is not None:
+                return ExecutionResult(errors=[cost_error], extensions=extensions)
+
+        cache_key = None
+        if (
+            response_cache.enabled
+            and operation_ast is not None
+            and operation_ast.operation == OperationType.QUERY
+        ):
+            cache_key = response_cache.get_key(
+                self.get_user(request), normalized_hash, operation_ast,
+                variables, operation_name)
+            if cache_key is not None:
+                data = response_cache.get(cache_key)
+                if data is not None:
+                    return ExecutionResult(data=data, extensions=extensions)
+
+        execute_options = {
+            "root_value": self.get_root_value(request),
+            "context_value": self.get_context(request),
+            "variable_values": variables,
+            "operation_name": operation_name,
+            "middleware": self.get_middleware(request),
+        }
+        if self.execution_context_class:
+            execute_options["execution_context_class"] = self.execution_context_class
+
+        return PreparedOperation(document, operation_ast, execute_options, extensions, cache_key)
+
+    def execute_prepared(self, request, prepared):
+        schema = self.schema.graphql_schema
+        if prepared.is_mutation and (
+            graphene_settings.ATOMIC_MUTATIONS is True
+            or connection.settings_dict.get("ATOMIC_MUTATIONS", False) is True
+        ):
+            with transaction.atomic():
+                result = execute(schema, prepared.document, **prepared.execute_options)
+                if getattr(request, MUTATION_ERRORS_FLAG, False) is True:
+                    transaction.set_rollback(True)
+            return result
+        return execute(schema, prepared.document, **prepared.execute_options)
+
+    def finish_execution(self, request, prepared, result):
+        result.extensions = {**(result.extensions or {}), **prepared.extensions}
+        if prepared.cache_key is not None and not result.errors:
+            response_cache.set(prepared.cache_key, result.data)
+        if prepared.is_mutation:
+            # Later operations of a batch must not see rows loaded before.
+            prepared.execute_options["context_value"].loaders = None
+        if response_cache.enabled and prepared.is_mutation:
+            organization_id = getattr(request.user, "organization_id", None)
+            if organization_id is not None:
+                response_cache.invalidate_organization(organization_id)
+        return result
+
+    def execute_graphql_request(
+        self, request, data, query, variables, operation_name, show_graphiql=False
+    ):
+        prepared = self.prepare_execution(
+            request, query, variables, operation_name, show_graphiql)
+        if not isinstance(prepared, PreparedOperation):
+            return prepared
+
+        try:
+            result = self.execute_prepared(request, prepared)
+        except Exception as e:
+            return ExecutionResult(errors=[e], extensions=prepared.extensions)
+        return self.finish_execution(request, prepared, result)
+
+
+sync_resolver_middleware = SyncResolverMiddleware()
+
+
+class AsyncAPIGraphQLView(APIGraphQLView):
+    """
+    APIGraphQLView that executes queries on the event loop under ASGI.
+
+    Resolvers marked `async_capable` use the async ORM and loaders, so
+    independent root fields resolve concurrently; other resolvers are moved
+    to a worker thread by SyncResolverMiddleware. Parsing, validation and
+    mutations still run synchronously in a worker thread, mutations keeping
+    their transaction handling.
+    """
+
+    view_is_async = True
+
+    def get_middleware(self, request):
+        return [*(super().get_middleware(request) or []), sync_resolver_middleware]
+
+    def prepare_execution(self, request, query, variables, operation_name, show_graphiql=False):
+        # Resolve the user here, off the event loop, so resolvers never
+        # trigger the lazy session or token lookup from async code.
+        self.get_user(request)
+        return super().prepare_execution(
+            request, query, variables, operation_name, show_graphiql)
+
+    async def dispatch(self, request, *args, **kwargs):
+        with routing_request(request):
+            return await self.dispatch_async(request, *args, **kwargs)
+
+    async def dispatch_async(self, request, *args, **kwargs):
+        try:
+            if request.method.lower() not in ("get", "post"):
+                raise HttpError(
+                    HttpResponseNotAllowed(
+                        ["GET", "POST"], "GraphQL only supports GET and POST requests."
+                    )
+                )
+
+            data = self.parse_body(request)
+            if self.graphiql and self.can_display_graphiql(request, data):
+                return await sync_to_async(super().dispatch)(request, *args, **kwargs)
+
+            if self.batch:
+                responses = [await self.get_batch_response_async(request, entry) for entry in data]
+                result = "[{}]".format(",".join(response for response, _ in responses))
+                status_code = 200
+            else:
+                result, status_code = await self.get_response_async(request, data)
+            return HttpResponse(
+                status=status_code, content=result, content_type="application/json"
+            )
+
+        except HttpError as e:
+            response = e.response
+            response["Content-Type"] = "application/json"
+            response.content = self.json_encode(
+                request, {"errors": [self.format_error(e)]}
+            )
+            return response
+
+    async def get_response_async(self, request, data):
+        query, variables, operation_name, id = await sync_to_async(
+            self.get_graphql_params)(request, data)
+
+        with instrument_operation() as metrics:
+            execution_result = await self.execute_graphql_request_async(
+                request, query, variables, operation_name)
+            metrics.failed = bool(execution_result and execution_result.errors)
+        await sync_to_async(self.add_instrumentation)(request, execution_result, metrics)
+        return self.format_response(request, execution_result, id)
+
+    async def get_batch_response_async(self, request, data):
+        """
+        Like get_response() for one operation of a batch. Operations run one
+        after the other, as later ones may depend on earlier mutations.
+        """
+        try:
+            self.start_batch_operation(request, data)
+            result, _ = await self.get_response_async(request, data)
+        except HttpError as e:
+            result, _ = self.format_batch_error(request, data, e)
+        return result, 200
+
+    async def execute_graphql_request_async(self, request, query, variables, operation_name):
+        prepared = await sync_to_async(self.prepare_execution)(
+            request, query, variables, operation_name)
+        if not isinstance(prepared, PreparedOperation):
+            return prepared
+
+        try:
+            if prepared.is_mutation:
+                result = await sync_to_async(self.execute_prepared)(request, prepared)
+            else:
+                result = execute(
+                    self.schema.graphql_schema, prepared.document, **prepared.execute_options)
+                if inspect.isawaitable(result):
+                    result = await result
+        except Exception as e:
+            return ExecutionResult(errors=[e], extensions=prepared.extensions)
+        return await sync_to_async(self.finish_execution)(request, prepared, result)
+
+
+@staff_member_required
+def operation_stats_view(request):
+    """
+    Duration and SQL query count histograms per GraphQL operation name,
+    for this worker process.
+    """
+    return JsonResponse(operation_stats.as_dict())
+
+
+def metrics_view(request):
+    """
+    Prometheus metrics of every worker process. When METRICS_TOKEN is set,
+    scrapers must send it as a bearer token.
+    """
+    token = settings.METRICS_TOKEN
+    if token and not constant_time_compare(
+            request.headers.get("Authorization", ""), f"Bearer {token}"):
+        return HttpResponseForbidden()
+    return HttpResponse(render_metrics(), content_type=CONTENT_TYPE_LATEST)
@@ -0,0 +1,161 @@
+import json
+import zlib
+from datetime import date, datetime, timedelta
+from django.conf import settings
+from django.db import connection, models, transaction
+from django.db.models import Q
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+from backend.db_router import pin_to_primary
+from backend.response_cache import response_cache
+from project_management.models import Project, ProjectArchive, Task, TaskComment
+from project_management.stats import compute_project_stats
+
+ARCHIVE_VERSION = 1
+
+# What an archive holds, by key of its JSON document
+ARCHIVED_MODELS = {"tasks": Task, "comments": TaskComment}
+
+
+def _fields(model):
+    return [field for field in model._meta.concrete_fields if not field.generated]
+
+
+def _json_default(value):
+    # Full precision, unlike DjangoJSONEncoder, so restored rows are identical.
+    if isinstance(value, (date, datetime)):
+        return value.isoformat()
+    raise TypeError(f"Cannot archive {type(value).__name__} values")
+
+
+def archivable_projects(older_than_days=None):
+    """
+    COMPLETED projects that were neither updated nor restored within
+    `older_than_days` (ARCHIVE_COMPLETED_AFTER_DAYS by default).
+    """
+    if older_than_days is None:
+        older_than_days = settings.ARCHIVE_COMPLETED_AFTER_DAYS
+    cutoff = timezone.now() - timedelta(days=older_than_days)
+    return Project.objects.filter(
+        Q(restored_at__isnull=True) | Q(restored_at__lt=cutoff),
+        status="COMPLETED", archived_at__isnull=True, updated_at__lt=cutoff,
+    )
+
+
+def _invalidate(organization_id):
+    if response_cache.enabled:
+        transaction.on_commit(lambda: response_cache.invalidate_organization(organization_id))
+
+
+def archive_project(project_id):
+    """
+    Move the tasks and comments of a COMPLETED project into its
+    ProjectArchive. Returns the archive, or None when the project was
+    archived or reopened meanwhile.
+    """
+    with transaction.atomic():
+        project = (
+            Project.objects.select_for_update()
+            .filter(pk=project_id, status="COMPLETED", archived_at__isnull=True).first()
+        )
+        if project is None:
+            return None
+        querysets = {
+            "tasks": Task.objects.filter(project_id=project_id),
+            "comments": TaskComment.objects.filter(task__project_id=project_id),
+        }
+        document = {"version": ARCHIVE_VERSION}
+        for key, queryset in querysets.items():
+            fields = _fields(queryset.model)
+            document[key] = {
+                "columns": [field.column for field in fields],
+                "rows": list(queryset.order_by("id").values_list(
+                    *(field.attname for field in fields))),
+            }
+        archive = ProjectArchive.objects.create(
+            project=project,
+            data=zlib.compress(json.dumps(document, default=_json_default).encode()),
+            task_ids=[row[0] for row in document["tasks"]["rows"]],
+            comment_ids=[row[0] for row in document["comments"]["rows"]],
+            stats=compute_project_stats([project_id])[project_id],
+        )
+        querysets["comments"].delete()
+        querysets["tasks"].delete()
+        # update() leaves updated_at alone: archiving is not an edit.
+        Project.objects.filter(pk=project_id).update(archived_at=timezone.now())
+        _invalidate(project.organization_id)
+    return archive
+
+
+def restore_project(project):
+    """
+    Move an archived project's tasks and comments back into the hot tables,
+    with their ids and timestamps. Updates `project` in place.
+    """
+    # The rows are read back right away, so they must come from the primary.
+    pin_to_primary()
+    with transaction.atomic():
+        locked = (
+            Project.objects.select_for_update()
+            .filter(pk=project.pk, archived_at__isnull=False).first()
+        )
+        if locked is not None:
+            archive = ProjectArchive.objects.get(project_id=project.pk)
+            document = json.loads(zlib.decompress(archive.data))
+            with connection.cursor() as cursor:
+                for key, model in ARCHIVED_MODELS.items():
+                    columns = document[key]["columns"]
+                    with cursor.copy(
+                        f"COPY {model._meta.db_table} ({', '.join(columns)}) FROM STDIN"
+                    ) as copy:
+                        for row in document[key]["rows"]:
+                            copy.write_row(row)
+            archive.delete()
+            Project.objects.filter(pk=project.pk).update(
+                archived_at=None, restored_at=timezone.now())
+            _invalidate(project.organization_id)
+    project.refresh_from_db(fields=["archived_at", "restored_at"])
+    return project
+
+
+def archived_rows(organization_id, key):
+    """
+    Yield `(project_id, rows)` for each archive of the organization, with
+    the "tasks" or "comments" rows of its document as dicts by column and
+    their datetimes parsed back. One archive is decoded at a time.
+    """
+    datetime_columns = [
+        field.column for field in _fields(ARCHIVED_MODELS[key])
+        if isinstance(field, models.DateTimeField)
+    ]
+    archives = (
+        ProjectArchive.objects.filter(project__organization_id=organization_id)
+        .order_by("project_id").values_list("project_id", "data")
+    )
+    for project_id, data in archives.iterator(chunk_size=1):
+        table = json.loads(zlib.decompress(data))[key]
+        rows = [dict(zip(table["columns"], row)) for row in table["rows"]]
+        for row in rows:
+            for column in datetime_columns:
+                if row[column] is not None:
+                    row[column] = parse_datetime(row[column])
+        yield project_id, rows
+
+
+def restore_archived_object(organization_id, model, object_id):
+    """
+    Restore the archived project of the organization holding the Task or
+    TaskComment `object_id`. Returns whether there was one.
+    """
+    try:
+        object_id = int(object_id)
+    except (TypeError, ValueError):
+        return False
+    field = {Task: "task_ids", TaskComment: "comment_ids"}[model]
+    project = Project.objects.filter(
+        organization_id=organization_id, **{f"archive__{field}__contains": [object_id]},
+    ).first()
+    if project is None:
+        return False
+    restore_project(project)
+    return True
@@ -0,0 +1,144 @@
+# The GraphQL operations of the frontend, as run by the run_benchmarks
+# command. Keep the documents in sync with frontend/app.
+from django.db.models import Count
+from accounts.models import CustomUser
+from project_management.models import Project, Task, TaskComment
+
+
+class Operation:
+    def __init__(self, name, query, variables, mutation=False):
+        self.name = name
+        self.query = query
+        self.variables = variables
+        self.mutation = mutation
+
+
+class Fixtures:
+    """
+    Rows of one organization the operations are run against: its largest
+    project, the task of that project with the most comments, and the user
+    with the most assigned tasks.
+    """
+
+    def __init__(self, organization):
+        self.organization = organization
+        self.project = (
+            Project.objects.filter(organization=organization)
+            .annotate(task_count=Count("tasks")).order_by("-task_count", "id").first()
+        )
+        self.task = (
+            Task.objects.filter(project=self.project)
+            .annotate(comment_count=Count("comments")).order_by("-comment_count", "id").first()
+        )
+        self.user = (
+            CustomUser.objects.filter(organization=organization)
+            .annotate(task_count=Count("tasks")).order_by("-task_count", "id").first()
+        )
+        self.comment = TaskComment.objects.filter(task=self.task).order_by("id").first()
+        self.task_ids = list(
+            Task.objects.filter(project=self.project).order_by("id").values_list("id", flat=True)[:50])
+
+    @property
+    def complete(self):
+        return None not in (self.project, self.task, self.user, self.comment)
+
+
+PROJECT_FIELDS = "id name description status dueDate createdAt"
+TASK_FIELDS = "id title description status dueDate assignee { id email isActive }"
+COMMENT_FIELDS = "id content createdAt author { id email }"
+
+OPERATIONS = [
+    Operation("projectList", f"""
+        query GET_PROJECTS {{ projects {{ {PROJECT_FIELDS} }} }}
+    """, lambda f: {}),
+    Operation("projectDashboard", f"""
+        query GET_PROJECT($id: ID!) {{
+            project(id: $id) {{
+                {PROJECT_FIELDS}
+                tasks {{ id title status dueDate createdAt assignee {{ id email isActive }} }}
+            }}
+        }}
+    """, lambda f: {"id": f.project.pk}),
+    Operation("projectStats", """
+        query GET_PROJECT_STATS($projectId: ID!) {
+            projectStats(projectId: $projectId) { totalTasks completedTasks completionRate }
+        }
+    """, lambda f: {"projectId": f.project.pk}),
+    Operation("taskBoard", f"""
+        query GET_TASKS($projectId: ID!) {{
+            tasks(projectId: $projectId) {{
+                {TASK_FIELDS} createdAt
+                comments {{ {COMMENT_FIELDS} }}
+            }}
+        }}
+    """, lambda f: {"projectId": f.project.pk}),
+    Operation("taskDetail", f"""
+        query GET_TASK($id: ID!) {{
+            task(id: $id) {{
+                {TASK_FIELDS} createdAt
+                project {{ id name }}
+                comments {{ {COMMENT_FIELDS} }}
+            }}
+        }}
+    """, lambda f: {"id": f.task.pk}),
+    Operation("taskComments", f"""
+        query GET_TASK_COMMENTS($taskId: ID!) {{ taskComments(taskId: $taskId) {{ {COMMENT_FIELDS} }} }}
+    """, lambda f: {"taskId": f.task.pk}),
+    Operation("createProject", f"""
+        mutation CreateProject($name: String!, $description: String) {{
+            createProject(name: $name, description: $description, status: "ACTIVE") {{
+                project {{ {PROJECT_FIELDS} }}
+            }}
+        }}
+    """, lambda f: {"name": "Benchmark project", "description": "Created by run_benchmarks"},
+        mutation=True),
+    Operation("updateProject", f"""
+        mutation UpdateProject($id: ID!, $name: String, $status: String) {{
+            updateProject(id: $id, name: $name, status: $status) {{ project {{ {PROJECT_FIELDS} }} }}
+        }}
+    """, lambda f: {"id": f.project.pk, "name": "Renamed", "status": "ON_HOLD"}, mutation=True),
+    Operation("createTask", f"""
+        mutation CREATE_TASK($projectId: ID!, $title: String!, $assigneeEmail: String) {{
+            createTask(projectId: $projectId, title: $title, assigneeEmail: $assigneeEmail) {{
+                task {{ {TASK_FIELDS} }}
+            }}
+        }}
+    """, lambda f: {"projectId": f.project.pk, "title": "Benchmark task",
+                    "assigneeEmail": f.user.email}, mutation=True),
+    Operation("updateTask", f"""
+        mutation UPDATE_TASK($id: ID!, $status: String, $assigneeEmail: String) {{
+            updateTask(id: $id, status: $status, assigneeEmail: $assigneeEmail) {{
+                task {{ {TASK_FIELDS} }}
+            }}
+        }}
+    """, lambda f: {"id": f.task.pk, "status": "IN_PROGRESS", "assigneeEmail": f.user.email},
+        mutation=True),
+    Operation("addTaskComment", f"""
+        mutation ADD_TASK_COMMENT($taskId: ID!, $content: String!) {{
+            addTaskComment(taskId: $taskId, content: $content) {{ comment {{ {COMMENT_FIELDS} }} }}
+        }}
+    """, lambda f: {"taskId": f.task.pk, "content": "Benchmark comment"}, mutation=True),
+    Operation("updateTaskComment", f"""
+        mutation UPDATE_TASK_COMMENT($id: ID!, $content: String!) {{
+            updateTaskComment(id: $id, content: $content) {{ comment {{ {COMMENT_FIELDS} }} }}
+        }}
+    """, lambda f: {"id": f.comment.pk, "content": "Edited"}, mutation=True),
+    Operation("bulkCreateTasks", """
+        mutation BulkCreate($tasks: [BulkTaskInput!]!) {
+            bulkCreateTasks(tasks: $tasks) { tasks { id } errors { index message } }
+        }
+    """, lambda f: {"tasks": [
+        {"projectId": f.project.pk, "title": f"Bulk {number}", "assigneeEmail": f.user.email}
+        for number in range(50)
+    ]}, mutation=True),
+    Operation("bulkUpdateTaskStatus", """
+        mutation BulkStatus($ids: [ID!]!) {
+            bulkUpdateTaskStatus(ids: $ids, status: "DONE") { tasks { id status } errors { index } }
+        }
+    """, lambda f: {"ids": f.task_ids}, mutation=True),
+    Operation("bulkAssignTasks", """
+        mutation BulkAssign($ids: [ID!]!, $email: String) {
+            bulkAssignTasks(ids: $ids, assigneeEmail: $email) { tasks { id } errors { index } }
+        }
+    """, lambda f: {"ids": f.task_ids, "email": f.user.email}, mutation=True),
+]
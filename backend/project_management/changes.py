@@ -0,0 +1,112 @@
+import base64
+from django.db import transaction
+from accounts.models import Organization
+from project_management.models import Change, Project, Task, TaskComment
+
+# Upper bound on the number of log entries one changesSince call reads
+MAX_CHANGES = 1000
+
+ENTITY_QUERYSETS = {
+    Change.PROJECT: lambda organization_id: Project.objects.filter(
+        organization_id=organization_id),
+    Change.TASK: lambda organization_id: Task.objects.filter(
+        project__organization_id=organization_id),
+    Change.COMMENT: lambda organization_id: TaskComment.objects.filter(
+        task__project__organization_id=organization_id),
+}
+
+
+def encode_change_cursor(change_id):
+    return base64.urlsafe_b64encode(f"change|{change_id}".encode()).decode()
+
+
+def decode_change_cursor(cursor):
+    try:
+        prefix, change_id = base64.urlsafe_b64decode(cursor.encode()).decode().split("|")
+        if prefix != "change":
+            raise ValueError(prefix)
+        return int(change_id)
+    except (ValueError, UnicodeDecodeError):
+        raise Exception("Invalid cursor")
+
+
+def lock_change_log(organization_id):
+    """
+    Make writers of one organization's change log take turns until they
+    commit, so entries become visible in id order and a cursor never skips
+    one. Call it in the transaction that appends the entries.
+    """
+    list(Organization.objects.select_for_update()
+         .filter(pk=organization_id).values_list("pk", flat=True))
+
+
+def record_changes(organization_id, entity, ids, operation=Change.UPSERT):
+    """
+    Append entries for the given rows to the organization's change log.
+    Call it in the transaction that changes the rows.
+    """
+    ids = list(ids)
+    if not ids:
+        return
+    with transaction.atomic(savepoint=False):
+        lock_change_log(organization_id)
+        Change.objects.bulk_create(
+            Change(organization_id=organization_id, entity=entity,
+                   object_id=object_id, operation=operation)
+            for object_id in ids
+        )
+
+
+def latest_change_id(organization_id):
+    return (
+        Change.objects.filter(organization_id=organization_id)
+        .order_by("-id").values_list("id", flat=True).first()
+    ) or 0
+
+
+def get_changes(organization_id, cursor=None):
+    """
+    Return the rows changed in an organization after `cursor`.
+
+    Without a cursor nothing is returned, only the cursor of the current
+    state. Upserted rows are loaded in one query per entity; rows whose
+    last entry is a delete, or that no longer exist, are reported as
+    deleted `(entity, id)` pairs.
+    """
+    if cursor is None:
+        return {
+            "cursor": encode_change_cursor(latest_change_id(organization_id)),
+            "has_more": False, "upserted": {}, "deleted": [],
+        }
+
+    after_id = decode_change_cursor(cursor)
+    entries = list(
+        Change.objects.filter(organization_id=organization_id, id__gt=after_id)
+        .order_by("id").values_list("id", "entity", "object_id", "operation")
+        [:MAX_CHANGES + 1]
+    )
+    has_more = len(entries) > MAX_CHANGES
+    entries = entries[:MAX_CHANGES]
+
+    # Only the last entry of each row matters.
+    operations = {}
+    for _, entity, object_id, operation in entries:
+        operations[entity, object_id] = operation
+
+    upserted = {}
+    deleted = []
+    for entity, get_queryset in ENTITY_QUERYSETS.items():
+        ids = {object_id for (kind, object_id), operation in operations.items()
+               if kind == entity and operation == Change.UPSERT}
+        rows = list(get_queryset(organization_id).filter(pk__in=ids).order_by("id")) if ids else []
+        upserted[entity] = rows
+        deleted.extend((entity, object_id) for object_id in sorted(ids - {row.pk for row in rows}))
+        deleted.extend(sorted(
+            (kind, object_id) for (kind, object_id), operation in operations.items()
+            if kind == entity and operation == Change.DELETE
+        ))
+
+    return {
+        "cursor": encode_change_cursor(entries[-1][0] if entries else after_id),
+        "has_more": has_more, "upserted": upserted, "deleted": deleted,
+    }
@@ -0,0 +1,42 @@
+from collections import defaultdict
+from django.db import transaction
+from backend.broker import broker
+
+# Event types published to GraphQL subscriptions
+TASK_CHANGED = "task"
+COMMENT_CHANGED = "comment"
+
+# Keeps bulk events well below PostgreSQL's 8000 byte NOTIFY payload limit
+MAX_EVENT_IDS = 200
+
+
+def publish(event):
+    # Subscribers load the rows named in the event, so only send it once
+    # the change is visible to other connections.
+    transaction.on_commit(lambda: broker.publish(event))
+
+
+def publish_tasks_changed(organization_id, tasks):
+    """
+    Publish events listing the ids of the changed tasks, per project.
+    """
+    task_ids = defaultdict(list)
+    for task in tasks:
+        task_ids[task.project_id].append(task.pk)
+    for project_id, ids in task_ids.items():
+        for start in range(0, len(ids), MAX_EVENT_IDS):
+            publish({
+                "type": TASK_CHANGED,
+                "organization_id": organization_id,
+                "project_id": project_id,
+                "task_ids": ids[start:start + MAX_EVENT_IDS],
+            })
+
+
+def publish_comment_changed(organization_id, comment):
+    publish({
+        "type": COMMENT_CHANGED,
+        "organization_id": organization_id,
+        "task_id": comment.task_id,
+        "comment_id": comment.pk,
+    })
@@ -0,0 +1,88 @@
+from django.db.models import F, Q
+from django.utils import timezone
+from project_management.models import Project, Task
+
+TASK_STATUSES = {value for value, _ in Task.TASK_STATUS_CHOICES}
+PROJECT_STATUSES = {value for value, _ in Project.STATUS_CHOICES}
+
+# Orderings selectable through the sort enums. Each ends with the primary
+# key so that rows with equal values keep a stable order.
+TASK_ORDERINGS = {
+    "CREATED_AT": ("created_at", "id"),
+    "CREATED_AT_DESC": ("-created_at", "-id"),
+    "UPDATED_AT_DESC": ("-updated_at", "-id"),
+    "DUE_DATE": (F("due_date").asc(nulls_last=True), "id"),
+    "DUE_DATE_DESC": (F("due_date").desc(nulls_last=True), "-id"),
+    "TITLE": ("title", "id"),
+    "STATUS": ("status", "id"),
+}
+PROJECT_ORDERINGS = {
+    "CREATED_AT": ("created_at", "id"),
+    "CREATED_AT_DESC": ("-created_at", "-id"),
+    "UPDATED_AT_DESC": ("-updated_at", "-id"),
+    "DUE_DATE": (F("due_date").asc(nulls_last=True), "id"),
+    "DUE_DATE_DESC": (F("due_date").desc(nulls_last=True), "-id"),
+    "NAME": ("name", "id"),
+}
+
+
+def check_statuses(statuses, allowed):
+    invalid = set(statuses) - allowed
+    if invalid:
+        raise Exception(f"Invalid status: {', '.join(sorted(invalid))}")
+
+
+def date_range(prefix, after, before):
+    conditions = {}
+    if after is not None:
+        conditions[f"{prefix}__gte"] = after
+    if before is not None:
+        conditions[f"{prefix}__lt"] = before
+    return Q(**conditions)
+
+
+def task_conditions(filter):
+    """
+    Translate a TaskFilterInput into a Q object on Task.
+
+    The overdue condition is written like the predicate of the partial
+    due date indexes, so PostgreSQL can use them.
+    """
+    if not filter:
+        return Q()
+    conditions = Q()
+    if filter.get("status_in") is not None:
+        check_statuses(filter["status_in"], TASK_STATUSES)
+        conditions &= Q(status__in=filter["status_in"])
+    if filter.get("assignee_in") is not None:
+        conditions &= Q(assignee_id__in=filter["assignee_in"])
+    if filter.get("unassigned") is not None:
+        conditions &= Q(assignee__isnull=filter["unassigned"])
+    conditions &= date_range("due_date", filter.get("due_after"), filter.get("due_before"))
+    conditions &= date_range("created_at", filter.get("created_after"), filter.get("created_before"))
+    overdue = Q(due_date__lt=timezone.now()) & ~Q(status="DONE")
+    if filter.get("overdue") is True:
+        conditions &= overdue
+    elif filter.get("overdue") is False:
+        conditions &= ~overdue
+    return conditions
+
+
+def project_conditions(filter):
+    """
+    Translate a ProjectFilterInput into a Q object on Project.
+    """
+    if not filter:
+        return Q()
+    conditions = Q()
+    if filter.get("status_in") is not None:
+        check_statuses(filter["status_in"], PROJECT_STATUSES)
+        conditions &= Q(status__in=filter["status_in"])
+    conditions &= date_range("due_date", filter.get("due_after"), filter.get("due_before"))
+    conditions &= date_range("created_at", filter.get("created_after"), filter.get("created_before"))
+    overdue = Q(due_date__lt=timezone.localdate()) & ~Q(status="COMPLETED")
+    if filter.get("overdue") is True:
+        conditions &= overdue
+    elif filter.get("overdue") is False:
+        conditions &= ~overdue
+    return conditions
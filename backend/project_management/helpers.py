@@ -1,23 +1,72 @@
+from asgiref.sync import sync_to_async
 from django.core.exceptions import ObjectDoesNotExist
-from project_management.models import Project, Task
+from project_management.archive import restore_archived_object, restore_project
+from project_management.models import Project, Task, TaskComment
 
 
 def get_project_for_user(user, project_id):
     """
-    Fetch a project scoped to the user's organization.
-    Raises a safe error if not found or unauthorized.
+    Fetch a project scoped to the user's organization, restoring it if it
+    is archived. Raises a safe error if not found or unauthorized.
     """
     try:
-        return Project.objects.get(pk=project_id, organization=user.organization)
+        project = Project.objects.get(pk=project_id, organization_id=user.organization_id)
     except ObjectDoesNotExist:
         raise Exception("Not found or unauthorized")
+    if project.archived_at is not None:
+        restore_project(project)
+    return project
 
 
 def get_task_for_user(user, task_id):
+    """
+    Fetch a task scoped to the user's organization.
+    The tenant check is part of the query, so it costs a single round trip.
+    A task of an archived project restores the project.
+    """
     try:
-        task = Task.objects.get(pk=task_id)
-    except Task.DoesNotExist:
-        raise Exception("Task not found")
-    if task.project.organization != user.organization:
-        raise Exception("Unauthorized")
-    return task
+        return Task.objects.get(
+            pk=task_id, project__organization_id=user.organization_id)
+    except ObjectDoesNotExist:
+        if restore_archived_object(user.organization_id, Task, task_id):
+            return get_task_for_user(user, task_id)
+        raise Exception("Not found or unauthorized")
+
+
+def get_comment_for_user(user, comment_id):
+    """
+    Fetch a task comment scoped to the user's organization.
+    """
+    try:
+        return TaskComment.objects.get(
+            pk=comment_id, task__project__organization_id=user.organization_id)
+    except ObjectDoesNotExist:
+        if restore_archived_object(user.organization_id, TaskComment, comment_id):
+            return get_comment_for_user(user, comment_id)
+        raise Exception("Not found or unauthorized")
+
+
+async def aget_project_for_user(user, project_id):
+    """
+    Async variant of `get_project_for_user`.
+    """
+    try:
+        project = await Project.objects.aget(pk=project_id, organization_id=user.organization_id)
+    except ObjectDoesNotExist:
+        raise Exception("Not found or unauthorized")
+    if project.archived_at is not None:
+        await sync_to_async(restore_project)(project)
+    return project
+
+
+async def aget_task_for_user(user, task_id):
+    """
+    Async variant of `get_task_for_user`.
+    """
+    try:
+        return await Task.objects.aget(
+            pk=task_id, project__organization_id=user.organization_id)
+    except ObjectDoesNotExist:
+        if await sync_to_async(restore_archived_object)(user.organization_id, Task, task_id):
+            return await aget_task_for_user(user, task_id)
+        raise Exception("Not found or unauthorized")
@@ -0,0 +1,340 @@
+import csv
+import io
+import json
+from datetime import datetime, time
+from django.conf import settings
+from django.db import connection, transaction
+from django.utils import timezone
+from django.utils.dateparse import parse_date, parse_datetime
+from accounts.models import CustomUser
+from backend.response_cache import response_cache
+from project_management.changes import lock_change_log
+from project_management.filters import TASK_STATUSES
+from project_management.models import Change, Project, Task, TaskComment
+from project_management.stats import invalidate_project_stats
+
+FORMATS = ("csv", "ndjson")
+
+# Errors kept in memory for the summary; the error file gets all of them
+MAX_REPORTED_ERRORS = 1000
+
+TITLE_MAX_LENGTH = Task._meta.get_field("title").max_length
+
+# Staging tables, dropped when the import's transaction ends
+STAGING_TABLES = """
+CREATE TEMPORARY TABLE import_task (
+    line integer NOT NULL,
+    ref text,
+    id bigint,
+    project_id bigint NOT NULL,
+    title text NOT NULL,
+    description text NOT NULL,
+    status text NOT NULL,
+    assignee_id bigint,
+    due_date timestamptz,
+    created_at timestamptz
+) ON COMMIT DROP;
+CREATE TEMPORARY TABLE import_comment (
+    line integer NOT NULL,
+    task_id bigint,
+    task_ref text,
+    author_id bigint,
+    content text NOT NULL,
+    created_at timestamptz
+) ON COMMIT DROP;
+"""
+TASK_COLUMNS = ("line", "ref", "project_id", "title", "description", "status",
+                "assignee_id", "due_date", "created_at")
+COMMENT_COLUMNS = ("line", "task_id", "task_ref", "author_id", "content", "created_at")
+
+
+class RowError(Exception):
+    pass
+
+
+def detect_format(filename):
+    """
+    The format of a file from its extension, None when unknown.
+    """
+    extension = filename.rsplit(".", 1)[-1].lower()
+    if extension == "csv":
+        return "csv"
+    if extension in ("ndjson", "jsonl"):
+        return "ndjson"
+    return None
+
+
+def read_rows(file, format):
+    """
+    Yield `(line, row)` for each record of a binary file: CSV with a header
+    row, or NDJSON with one object per line. `row` is None when the line is
+    not a JSON object. The caller closes `file`.
+    """
+    text = io.TextIOWrapper(file, encoding="utf-8-sig", newline="")
+    try:
+        if format == "csv":
+            reader = csv.DictReader(text)
+            for row in reader:
+                yield reader.line_num, row
+            return
+        for line, content in enumerate(text, start=1):
+            if not content.strip():
+                continue
+            try:
+                row = json.loads(content)
+            except ValueError:
+                row = None
+            yield line, row if isinstance(row, dict) else None
+    finally:
+        # Leave `file` open for its owner instead of closing it with the wrapper.
+        text.detach()
+
+
+def _text(row, name):
+    value = row.get(name)
+    return "" if value is None else str(value).strip()
+
+
+def _id(row, name):
+    value = _text(row, name)
+    if not value:
+        return None
+    try:
+        return int(value)
+    except ValueError:
+        raise RowError(f"Invalid {name} '{value}'")
+
+
+def _datetime(row, name):
+    value = _text(row, name)
+    if not value:
+        return None
+    parsed = parse_datetime(value)
+    if parsed is None:
+        date = parse_date(value)
+        if date is None:
+            raise RowError(f"Invalid {name} '{value}', use an ISO 8601 date or date and time")
+        parsed = datetime.combine(date, time())
+    if timezone.is_naive(parsed):
+        parsed = timezone.make_aware(parsed)
+    return parsed
+
+
+class Import:
+    """
+    Load tasks and comments into one organization.
+
+    Rows are validated in chunks and streamed with COPY into staging
+    tables, which are checked and merged into the real tables in one
+    transaction. Tasks may carry a `ref` that comments of the same import
+    point at with `task_ref`; comments on existing tasks use `task_id`.
+    Invalid rows are skipped and reported, or abort the import when
+    `strict`.
+    """
+
+    def __init__(self, organization, chunk_size=None, error_file=None, progress=None):
+        self.organization = organization
+        self.chunk_size = chunk_size or settings.IMPORT_CHUNK_SIZE
+        self.error_writer = csv.writer(error_file) if error_file is not None else None
+        if self.error_writer is not None:
+            self.error_writer.writerow(["source", "line", "message"])
+        self.progress = progress
+        self.errors = []
+        self.error_count = 0
+        self.imported = {"tasks": 0, "comments": 0}
+        # One lookup per organization instead of one per row
+        self.user_ids = {
+            email.lower(): pk for email, pk in
+            CustomUser.objects.filter(organization=organization).values_list("email", "pk")
+        }
+        self.project_ids = set(
+            Project.objects.filter(organization=organization).values_list("pk", flat=True))
+
+    def add_error(self, source, line, message):
+        self.error_count += 1
+        if len(self.errors) < MAX_REPORTED_ERRORS:
+            self.errors.append({"source": source, "line": line, "message": message})
+        if self.error_writer is not None:
+            self.error_writer.writerow([source, line, message])
+
+    def user_id(self, row, name):
+        email = _text(row, name)
+        if not email:
+            return None
+        user_id = self.user_ids.get(email.lower())
+        if user_id is None:
+            raise RowError(f"{name} '{email}' is not a user of your organization")
+        return user_id
+
+    def task_row(self, line, row):
+        project_id = _id(row, "project_id")
+        if project_id not in self.project_ids:
+            raise RowError("project_id is not a project of your organization")
+        title = _text(row, "title")
+        if not title:
+            raise RowError("title is required")
+        if len(title) > TITLE_MAX_LENGTH:
+            raise RowError(f"title is longer than {TITLE_MAX_LENGTH} characters")
+        status = _text(row, "status") or "TODO"
+        if status not in TASK_STATUSES:
+            raise RowError(f"Invalid status '{status}'")
+        return (line, _text(row, "ref") or None, project_id, title, _text(row, "description"),
+                status, self.user_id(row, "assignee_email"), _datetime(row, "due_date"),
+                _datetime(row, "created_at"))
+
+    def comment_row(self, line, row):
+        task_id = _id(row, "task_id")
+        task_ref = _text(row, "task_ref") or None
+        if (task_id is None) == (task_ref is None):
+            raise RowError("Give either task_id or task_ref")
+        content = _text(row, "content")
+        if not content:
+            raise RowError("content is required")
+        return (line, task_id, task_ref, self.user_id(row, "author_email"), content,
+                _datetime(row, "created_at"))
+
+    def stage(self, cursor, source, rows, table, columns, validate):
+        """
+        Validate `rows` a chunk at a time and COPY the valid ones into the
+        staging table.
+        """
+        read = reported = 0
+        with cursor.copy(f"COPY {table} ({', '.join(columns)}) FROM STDIN") as copy:
+            chunk = []
+            for line, row in rows:
+                read += 1
+                try:
+                    if row is None:
+                        raise RowError("Not a JSON object")
+                    chunk.append(validate(line, row))
+                except RowError as e:
+                    self.add_error(source, line, str(e))
+                if len(chunk) >= self.chunk_size:
+                    for values in chunk:
+                        copy.write_row(values)
+                    chunk = []
+                    self.report(source, read)
+                    reported = read
+            for values in chunk:
+                copy.write_row(values)
+        if read != reported or not read:
+            self.report(source, read)
+
+    def report(self, source, read):
+        if self.progress is not None:
+            self.progress(source, read, self.error_count)
+
+    def reject(self, cursor, source, sql, params=(), message=None):
+        """
+        Delete the staged rows matched by a `DELETE ... RETURNING line[, message]`
+        statement and report them.
+        """
+        cursor.execute(sql, params)
+        for line, *detail in cursor.fetchall():
+            self.add_error(source, line, detail[0] if detail else message)
+
+    def check_staged_rows(self, cursor):
+        self.reject(cursor, "tasks", """
+            DELETE FROM import_task WHERE line IN (
+                SELECT line FROM (
+                    SELECT line, row_number() OVER (PARTITION BY ref ORDER BY line) AS number
+                    FROM import_task WHERE ref IS NOT NULL
+                ) AS refs WHERE number > 1
+            ) RETURNING line
+        """, message="Duplicate ref")
+        cursor.execute("CREATE INDEX ON import_task (ref)")
+        self.reject(cursor, "comments", f"""
+            DELETE FROM import_comment AS comment WHERE CASE
+                WHEN comment.task_ref IS NOT NULL THEN NOT EXISTS (
+                    SELECT 1 FROM import_task WHERE ref = comment.task_ref)
+                ELSE NOT EXISTS (
+                    SELECT 1 FROM {Task._meta.db_table} AS task
+                    JOIN {Project._meta.db_table} AS project ON project.id = task.project_id
+                    WHERE task.id = comment.task_id AND project.organization_id = %s)
+            END
+            RETURNING line, CASE WHEN task_ref IS NOT NULL
+                THEN 'task_ref is not the ref of a task in this import'
+                ELSE 'task_id is not a task of your organization' END
+        """, [self.organization.pk])
+
+    def merge(self, cursor):
+        """
+        Insert the staged rows and their change log entries.
+        """
+        cursor.execute("ANALYZE import_task")
+        cursor.execute("ANALYZE import_comment")
+        lock_change_log(self.organization.pk)
+        # Ids are drawn up front so comments can find the tasks they refer to.
+        cursor.execute(
+            "UPDATE import_task SET id = nextval(pg_get_serial_sequence(%s, 'id'))",
+            [Task._meta.db_table])
+        self.imported["tasks"] = self.insert_with_changes(cursor, Change.TASK, f"""
+            INSERT INTO {Task._meta.db_table}
+                (id, project_id, title, description, status, assignee_id, due_date,
+                 created_at, updated_at)
+            SELECT id, project_id, title, description, status, assignee_id, due_date,
+                   coalesce(created_at, now()), now()
+            FROM import_task ORDER BY line
+            RETURNING id
+        """)
+        self.imported["comments"] = self.insert_with_changes(cursor, Change.COMMENT, f"""
+            INSERT INTO {TaskComment._meta.db_table}
+                (task_id, content, author_id, created_at, updated_at)
+            SELECT coalesce(task.id, comment.task_id), comment.content, comment.author_id,
+                   coalesce(comment.created_at, now()), now()
+            FROM import_comment AS comment
+            LEFT JOIN import_task AS task ON task.ref = comment.task_ref
+            ORDER BY comment.line
+            RETURNING id
+        """)
+
+    def insert_with_changes(self, cursor, entity, insert_sql):
+        cursor.execute(f"""
+            WITH inserted AS ({insert_sql})
+            INSERT INTO {Change._meta.db_table}
+                (organization_id, entity, object_id, operation, created_at)
+            SELECT %s, %s, id, %s, now() FROM inserted ORDER BY id
+        """, [self.organization.pk, entity, Change.UPSERT])
+        return cursor.rowcount
+
+    def run(self, tasks=None, comments=None, strict=False):
+        """
+        Import `tasks` and `comments`, each None or an iterable of
+        `(line, row)` as yielded by read_rows(). Returns whether rows were
+        imported: False when `strict` rejected the import or no row was
+        valid, in which case nothing changes.
+        """
+        with transaction.atomic(), connection.cursor() as cursor:
+            cursor.execute(STAGING_TABLES)
+            if tasks is not None:
+                self.stage(cursor, "tasks", tasks, "import_task", TASK_COLUMNS, self.task_row)
+            if comments is not None:
+                self.stage(cursor, "comments", comments, "import_comment", COMMENT_COLUMNS,
+                           self.comment_row)
+            self.check_staged_rows(cursor)
+            cursor.execute(
+                "SELECT EXISTS (SELECT 1 FROM import_task) OR EXISTS (SELECT 1 FROM import_comment)")
+            valid_rows, = cursor.fetchone()
+            if not valid_rows or (strict and self.error_count):
+                transaction.set_rollback(True)
+                return False
+
+            cursor.execute("SELECT DISTINCT project_id FROM import_task")
+            project_ids = [project_id for project_id, in cursor.fetchall()]
+            self.merge(cursor)
+            # Within an outer transaction, ON COMMIT comes too late for the next import.
+            cursor.execute("DROP TABLE import_task, import_comment")
+            transaction.on_commit(lambda: self.invalidate(project_ids))
+        return True
+
+    def invalidate(self, project_ids):
+        invalidate_project_stats(project_ids)
+        if response_cache.enabled:
+            response_cache.invalidate_organization(self.organization.pk)
+
+    def summary(self):
+        return {
+            "imported": self.imported,
+            "errorCount": self.error_count,
+            "errors": self.errors,
+        }
@@ -0,0 +1,270 @@
+import json
+from collections import defaultdict
+from functools import partial
+from asgiref.sync import sync_to_async
+from django.db.models import Count, F, Q, Window
+from django.db.models.functions import RowNumber
+from accounts.models import CustomUser, Organization
+from project_management.filters import TASK_ORDERINGS, task_conditions
+from project_management.models import Project, Task, TaskComment
+from project_management.pagination import MAX_LIST_SIZE, ORDERING, after_cursor, page_size
+from backend.async_execution import in_event_loop
+
+
+def order_expression(field):
+    if not isinstance(field, str):
+        return field
+    if field.startswith("-"):
+        return F(field[1:]).desc()
+    return F(field).asc()
+
+
+def capped_per_parent(queryset, parent_field, ordering=ORDERING, limit=None):
+    """
+    Keep at most `limit` (MAX_LIST_SIZE by default) rows per parent, in
+    `ordering` order ((created_at, id) by default).
+    """
+    return queryset.annotate(
+        row_number=Window(
+            RowNumber(),
+            partition_by=F(parent_field),
+            order_by=[order_expression(field) for field in ordering],
+        )
+    ).filter(row_number__lte=limit or MAX_LIST_SIZE).order_by(*ordering)
+
+
+def grouped_by(rows, parent_field):
+    grouped = defaultdict(list)
+    for row in rows:
+        grouped[getattr(row, parent_field)].append(row)
+    return grouped
+
+
+class BatchLoader:
+    """
+    Per-request loader that resolves keys in batches.
+
+    Keys are queued with `prime()` as parent rows are fetched; the first
+    `load()` of a key that is not cached yet fetches every queued key with
+    a single call to `batch_load_fn`, so each nesting level of a query
+    costs one `IN (...)` lookup instead of one query per row.
+
+    On the event loop of the async view, `load()` returns an awaitable for
+    keys that still need a query; cached keys are returned directly.
+    """
+
+    def __init__(self, batch_load_fn, default=None):
+        self.batch_load_fn = batch_load_fn
+        self.default = default
+        self._cache = {}
+        self._pending = set()
+
+    def prime(self, keys):
+        self._pending.update(
+            key for key in keys if key is not None and key not in self._cache
+        )
+
+    def prime_values(self, values):
+        for key, value in values.items():
+            self._cache[key] = value
+            self._pending.discard(key)
+
+    def load(self, key):
+        if key is None:
+            return self.default
+        if key not in self._cache:
+            self._pending.add(key)
+            if in_event_loop():
+                return self.aload(key)
+            self.dispatch()
+        return self._cache[key]
+
+    async def aload(self, key):
+        if key not in self._cache:
+            self._pending.add(key)
+            # Pass the key along: it may be taken off the pending set by a
+            # dispatch that is still running in the worker thread.
+            await sync_to_async(self.dispatch)(key)
+        return self._cache[key]
+
+    def keys(self):
+        return self._cache.keys() | self._pending
+
+    def dispatch(self, *keys):
+        pending, self._pending = self._pending, set()
+        keys = (pending | set(keys)) - self._cache.keys()
+        if not keys:
+            return
+        results = self.batch_load_fn(keys)
+        for key in keys:
+            self._cache[key] = results.get(key, self.default)
+
+
+class Loaders:
+    """
+    The set of batch loaders shared by all resolvers of one request.
+
+    Every fetched row is registered so that the keys of the next nesting
+    level (tasks of a project, comments of a task, assignees, authors) are
+    queued before any of them is requested.
+    """
+
+    def __init__(self):
+        self.organization = BatchLoader(self._load_organizations)
+        self.user = BatchLoader(self._load_users)
+        self.project = BatchLoader(self._load_projects)
+        self.task = BatchLoader(self._load_tasks)
+        self.tasks_by_project = BatchLoader(self._load_tasks_by_project, default=())
+        self.comments_by_task = BatchLoader(self._load_comments_by_task, default=())
+        # Loaders keyed by project or task id that depend on field
+        # arguments, by arguments
+        self._by_project = {}
+        self._by_task = {}
+
+    def _argument_loader(self, loaders, parents, arguments, batch_load_fn, default):
+        key = json.dumps(arguments, sort_keys=True, default=str)
+        loader = loaders.get(key)
+        if loader is None:
+            loader = BatchLoader(batch_load_fn, default=default)
+            loader.prime(parents.keys())
+            loaders[key] = loader
+        return loader
+
+    def tasks_by_project_matching(self, filter=None, sort=None):
+        """
+        Loader of the tasks of each project that match a TaskFilterInput,
+        in the order of a TaskSort value. Each distinct filter and sort
+        gets its own loader, primed with every project seen so far.
+        """
+        if not filter and sort is None:
+            return self.tasks_by_project
+        return self._argument_loader(
+            self._by_project, self.tasks_by_project, ["tasks", filter or {}, sort],
+            partial(
+                self._load_tasks_by_project,
+                conditions=task_conditions(filter),
+                ordering=TASK_ORDERINGS[sort or "CREATED_AT"],
+            ), default=())
+
+    def task_page_by_project(self, filter=None, first=None, after=None):
+        """
+        Loader of one page of the tasks of each project matching a
+        TaskFilterInput: the `first` + 1 tasks following the `after` cursor,
+        for every project in one query.
+        """
+        size = page_size(first)
+        conditions = task_conditions(filter) & (after_cursor(after) if after else Q())
+        return self._argument_loader(
+            self._by_project, self.tasks_by_project, ["task page", filter or {}, size, after],
+            partial(self._load_pages, queryset=Task.objects.filter(conditions),
+                    parent_field="project_id", size=size, register=self.register_tasks),
+            default=())
+
+    def task_count_by_project(self, filter=None):
+        return self._argument_loader(
+            self._by_project, self.tasks_by_project, ["task count", filter or {}],
+            partial(self._load_counts, queryset=Task.objects.filter(task_conditions(filter)),
+                    parent_field="project_id"),
+            default=0)
+
+    def comment_page_by_task(self, first=None, after=None):
+        """
+        Loader of one page of the comments of each task, like
+        `task_page_by_project`.
+        """
+        size = page_size(first)
+        return self._argument_loader(
+            self._by_task, self.comments_by_task, ["comment page", size, after],
+            partial(self._load_pages,
+                    queryset=TaskComment.objects.filter(after_cursor(after) if after else Q()),
+                    parent_field="task_id", size=size, register=self.register_comments),
+            default=())
+
+    def comment_count_by_task(self):
+        return self._argument_loader(
+            self._by_task, self.comments_by_task, ["comment count"],
+            partial(self._load_counts, queryset=TaskComment.objects.all(),
+                    parent_field="task_id"),
+            default=0)
+
+    # Registration
+    def register_users(self, users):
+        self.user.prime_values({user.pk: user for user in users})
+        self.organization.prime(user.organization_id for user in users)
+
+    def register_projects(self, projects):
+        self.project.prime_values({project.pk: project for project in projects})
+        project_ids = [project.pk for project in projects]
+        self.tasks_by_project.prime(project_ids)
+        for loader in self._by_project.values():
+            loader.prime(project_ids)
+
+    def register_tasks(self, tasks):
+        self.task.prime_values({task.pk: task for task in tasks})
+        self.project.prime(task.project_id for task in tasks)
+        self.user.prime(task.assignee_id for task in tasks)
+        task_ids = [task.pk for task in tasks]
+        self.comments_by_task.prime(task_ids)
+        for loader in self._by_task.values():
+            loader.prime(task_ids)
+
+    def register_comments(self, comments):
+        self.task.prime(comment.task_id for comment in comments)
+        self.user.prime(comment.author_id for comment in comments)
+
+    # Batch functions
+    def _load_organizations(self, ids):
+        return Organization.objects.in_bulk(ids)
+
+    def _load_users(self, ids):
+        users = CustomUser.objects.in_bulk(ids)
+        self.register_users(users.values())
+        return users
+
+    def _load_projects(self, ids):
+        projects = Project.objects.in_bulk(ids)
+        self.register_projects(projects.values())
+        return projects
+
+    def _load_tasks(self, ids):
+        tasks = Task.objects.in_bulk(ids)
+        self.register_tasks(tasks.values())
+        return tasks
+
+    def _load_tasks_by_project(self, project_ids, conditions=Q(), ordering=ORDERING):
+        tasks = list(capped_per_parent(
+            Task.objects.filter(conditions, project_id__in=project_ids),
+            "project_id", ordering))
+        self.register_tasks(tasks)
+        return grouped_by(tasks, "project_id")
+
+    def _load_comments_by_task(self, task_ids):
+        comments = list(capped_per_parent(
+            TaskComment.objects.filter(task_id__in=task_ids), "task_id"))
+        self.register_comments(comments)
+        return grouped_by(comments, "task_id")
+
+    def _load_pages(self, parent_ids, queryset, parent_field, size, register):
+        rows = list(capped_per_parent(
+            queryset.filter(**{f"{parent_field}__in": parent_ids}), parent_field,
+            limit=size + 1))
+        register(rows)
+        return grouped_by(rows, parent_field)
+
+    def _load_counts(self, parent_ids, queryset, parent_field):
+        return dict(
+            queryset.filter(**{f"{parent_field}__in": parent_ids})
+            .values_list(parent_field).annotate(count=Count("pk")).order_by()
+        )
+
+
+def get_loaders(info):
+    """
+    Return the loaders bound to the current request, creating them on first use.
+    """
+    context = info.context
+    loaders = getattr(context, "loaders", None)
+    if loaders is None:
+        loaders = Loaders()
+        context.loaders = loaders
+    return loaders
@@ -0,0 +1,40 @@
+import time
+from django.core.management.base import BaseCommand
+from project_management.archive import archivable_projects, archive_project
+
+
+class Command(BaseCommand):
+    help = (
+        "Move the tasks and comments of projects COMPLETED for longer than "
+        "ARCHIVE_COMPLETED_AFTER_DAYS into compressed archives. Archived projects are "
+        "restored when their tasks are accessed."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--older-than-days", type=int,
+                            help="Overrides ARCHIVE_COMPLETED_AFTER_DAYS.")
+        parser.add_argument("--limit", type=int, help="Archive at most this many projects.")
+        parser.add_argument("--dry-run", action="store_true",
+                            help="List the projects that would be archived.")
+
+    def handle(self, *args, **options):
+        projects = archivable_projects(options["older_than_days"]).order_by("updated_at")
+        project_ids = list(projects.values_list("pk", flat=True)[:options["limit"]])
+        if options["dry_run"]:
+            for project in projects.filter(pk__in=project_ids):
+                self.stdout.write(f"  {project.pk}: {project}")
+            self.stdout.write(f"{len(project_ids)} projects would be archived")
+            return
+
+        started = time.perf_counter()
+        archived = 0
+        for project_id in project_ids:
+            archive = archive_project(project_id)
+            if archive is None:
+                continue
+            archived += 1
+            self.stdout.write(
+                f"  {project_id}: {len(archive.task_ids)} tasks, {len(archive.comment_ids)} "
+                f"comments, {len(archive.data) / 1024:.0f} KiB")
+        self.stdout.write(self.style.SUCCESS(
+            f"Archived {archived} projects in {time.perf_counter() - started:.1f}s"))
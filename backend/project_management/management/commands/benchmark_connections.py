@@ -0,0 +1,179 @@
+import asyncio
+import io
+import json
+import os
+import statistics
+import subprocess
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+from django.core.handlers.asgi import ASGIHandler
+from django.core.handlers.wsgi import WSGIHandler
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from graphql_jwt.shortcuts import get_token
+from accounts.models import CustomUser
+
+DEFAULT_QUERY = "query { me { email } projects { id name status } }"
+
+# Environment of the worker process for each connection mode
+MODES = {
+    "none": {"DB_POOL": "False", "DB_CONN_MAX_AGE": "0"},
+    "persistent": {"DB_POOL": "False", "DB_CONN_MAX_AGE": "600"},
+    "pool": {"DB_POOL": "True"},
+}
+
+
+class Command(BaseCommand):
+    help = (
+        "Compare requests per second of /graphql/ with a new database connection per "
+        "request, persistent connections and the connection pool. Each mode runs in "
+        "its own process, through Django's ASGI or WSGI handler so that connections "
+        "are opened and released as in production."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--email", required=True, help="User the requests are made as.")
+        parser.add_argument("--requests", type=int, default=500, help="Requests per mode.")
+        parser.add_argument("--concurrency", type=int, default=10, help="Concurrent clients.")
+        parser.add_argument("--handler", choices=("asgi", "wsgi"), default="asgi")
+        parser.add_argument("--mode", action="append", choices=tuple(MODES),
+                            help="Only run this mode (repeatable).")
+        parser.add_argument("--pool-size", type=int, help="DB_POOL_MAX_SIZE of the pool mode.")
+        parser.add_argument("--query", help="Query to send (defaults to a short projects query).")
+        parser.add_argument("--worker", action="store_true", help="Run one mode and print JSON (internal).")
+
+    def handle(self, *args, **options):
+        if options["worker"]:
+            result = self.run_worker(options)
+            self.stdout.write(json.dumps(result))
+            return
+
+        self.stdout.write(
+            f"{'mode':<12}{'req/s':>10}{'p50 ms':>10}{'p95 ms':>10}{'errors':>8}{'db conns':>10}")
+        for mode in options["mode"] or MODES:
+            result = self.spawn(mode, options)
+            self.stdout.write(
+                f"{mode:<12}{result['requests_per_second']:>10.1f}{result['p50_ms']:>10.1f}"
+                f"{result['p95_ms']:>10.1f}{result['errors']:>8}{result['connections']:>10}")
+
+    def spawn(self, mode, options):
+        environment = {**os.environ, **MODES[mode]}
+        if options["pool_size"]:
+            environment["DB_POOL_MAX_SIZE"] = str(options["pool_size"])
+        command = [
+            sys.executable, sys.argv[0], "benchmark_connections", "--worker",
+            "--email", options["email"], "--requests", str(options["requests"]),
+            "--concurrency", str(options["concurrency"]), "--handler", options["handler"],
+        ]
+        if options["query"]:
+            command += ["--query", options["query"]]
+        process = subprocess.run(command, env=environment, capture_output=True, text=True)
+        if process.returncode:
+            raise CommandError(f"The {mode} run failed:\n{process.stderr}")
+        return json.loads(process.stdout.strip().splitlines()[-1])
+
+    def run_worker(self, options):
+        try:
+            user = CustomUser.objects.get(email=options["email"])
+        except CustomUser.DoesNotExist:
+            raise CommandError(f"User '{options['email']}' does not exist")
+        body = json.dumps({"query": options["query"] or DEFAULT_QUERY}).encode()
+        authorization = f"Bearer {get_token(user)}"
+        connections_before = self.server_connections()
+        connection.close()
+
+        requests, concurrency = options["requests"], options["concurrency"]
+        started = time.perf_counter()
+        if options["handler"] == "asgi":
+            outcomes = asyncio.run(self.run_asgi(body, authorization, requests, concurrency))
+        else:
+            outcomes = self.run_wsgi(body, authorization, requests, concurrency)
+        elapsed = time.perf_counter() - started
+
+        latencies = sorted(latency for latency, _ in outcomes)
+        return {
+            "requests_per_second": round(requests / elapsed, 1),
+            "p50_ms": round(statistics.median(latencies) * 1000, 2),
+            "p95_ms": round(latencies[max(int(len(latencies) * 0.95) - 1, 0)] * 1000, 2),
+            "errors": sum(failed for _, failed in outcomes),
+            # Connections this process left open on the server
+            "connections": self.server_connections() - connections_before,
+        }
+
+    def server_connections(self):
+        with connection.cursor() as cursor:
+            cursor.execute(
+                "SELECT count(*) FROM pg_stat_activity WHERE datname = current_database()")
+            return cursor.fetchone()[0]
+
+    async def run_asgi(self, body, authorization, requests, concurrency):
+        handler = ASGIHandler()
+        semaphore = asyncio.Semaphore(concurrency)
+        scope = {
+            "type": "http", "asgi": {"version": "3.0"}, "http_version": "1.1",
+            "method": "POST", "scheme": "http", "path": "/graphql/", "root_path": "",
+            "query_string": b"", "server": ("localhost", 8000), "client": ("127.0.0.1", 0),
+            "headers": [
+                (b"host", b"localhost"),
+                (b"content-type", b"application/json"),
+                (b"content-length", str(len(body)).encode()),
+                (b"authorization", authorization.encode()),
+            ],
+        }
+
+        async def send_request():
+            messages = [{"type": "http.request", "body": body, "more_body": False}]
+            disconnected = asyncio.Event()
+            response = {"status": None, "body": b""}
+
+            async def receive():
+                if messages:
+                    return messages.pop()
+                # The client stays connected until the response is sent.
+                await disconnected.wait()
+                return {"type": "http.disconnect"}
+
+            async def send(message):
+                if message["type"] == "http.response.start":
+                    response["status"] = message["status"]
+                elif message["type"] == "http.response.body":
+                    response["body"] += message.get("body", b"")
+
+            async with semaphore:
+                started = time.perf_counter()
+                await handler(dict(scope), receive, send)
+                latency = time.perf_counter() - started
+            disconnected.set()
+            return latency, self.failed(response["status"], response["body"])
+
+        return await asyncio.gather(*(send_request() for _ in range(requests)))
+
+    def run_wsgi(self, body, authorization, requests, concurrency):
+        handler = WSGIHandler()
+
+        def send_request(_):
+            environ = {
+                "REQUEST_METHOD": "POST", "PATH_INFO": "/graphql/", "SCRIPT_NAME": "",
+                "QUERY_STRING": "", "SERVER_NAME": "localhost", "SERVER_PORT": "8000",
+                "SERVER_PROTOCOL": "HTTP/1.1", "REMOTE_ADDR": "127.0.0.1",
+                "HTTP_HOST": "localhost", "CONTENT_TYPE": "application/json",
+                "CONTENT_LENGTH": str(len(body)), "HTTP_AUTHORIZATION": authorization,
+                "wsgi.input": io.BytesIO(body), "wsgi.url_scheme": "http",
+                "wsgi.errors": sys.stderr, "wsgi.multithread": True,
+                "wsgi.multiprocess": False, "wsgi.run_once": False,
+            }
+            status = []
+            started = time.perf_counter()
+            response = handler(environ, lambda code, headers, *args: status.append(code))
+            content = b"".join(response)
+            # Closing the response sends request_finished, which releases the connection.
+            response.close()
+            latency = time.perf_counter() - started
+            return latency, self.failed(int(status[0].split()[0]), content)
+
+        with ThreadPoolExecutor(max_workers=concurrency) as executor:
+            return list(executor.map(send_request, range(requests)))
+
+    def failed(self, status, content):
+        return status != 200 or "errors" in json.loads(content)
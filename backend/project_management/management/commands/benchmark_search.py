@@ -0,0 +1,107 @@
+import statistics
+import time
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+from accounts.models import Organization
+from project_management.models import Project, Task
+from project_management.search import load_hits, parse_query, search_queryset
+
+BENCHMARK_SLUG = "search-benchmark"
+
+# Task text is built from these words, so every term has a known share of
+# matching rows: common words match many tasks, rare ones only a few.
+WORDS = [
+    "invoice", "login", "deploy", "report", "design", "database", "review", "customer",
+    "payment", "export", "import", "mobile", "search", "billing", "migration", "email",
+    "onboarding", "dashboard", "security", "performance", "refactor", "release", "audit",
+    "backup", "notification", "calendar", "upload", "permissions", "analytics", "webhook",
+]
+DEFAULT_QUERIES = ["invoice", "login review", "database migration", "\"payment export\"", "audit -backup"]
+
+
+class Command(BaseCommand):
+    help = (
+        "Seed an organization with N generated tasks and time the search query "
+        "against it, showing the plan of the matching query."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--tasks", type=int, default=1_000_000, help="Tasks to seed.")
+        parser.add_argument("--projects", type=int, default=100, help="Projects to spread them over.")
+        parser.add_argument("--runs", type=int, default=20, help="Timed runs per query.")
+        parser.add_argument("--first", type=int, default=20, help="Page size.")
+        parser.add_argument("--query", action="append", help="Query to time (repeatable).")
+        parser.add_argument("--reseed", action="store_true", help="Drop and recreate the seeded tasks.")
+
+    def handle(self, *args, **options):
+        if connection.vendor != "postgresql":
+            raise CommandError("Search needs PostgreSQL.")
+
+        organization = self.seed(options["tasks"], options["projects"], options["reseed"])
+        queries = options["query"] or DEFAULT_QUERIES
+
+        self.stdout.write(f"{'query':<24}{'matches':>10}{'p50 ms':>10}{'p95 ms':>10}")
+        for text in queries:
+            query = parse_query(text)
+            queryset = search_queryset(organization.pk, query)
+            latencies = []
+            for _ in range(options["runs"]):
+                started = time.perf_counter()
+                load_hits(list(queryset[:options["first"]]), query)
+                latencies.append(time.perf_counter() - started)
+            latencies.sort()
+            p95 = latencies[int(len(latencies) * 0.95) - 1]
+            self.stdout.write(
+                f"{text:<24}{queryset.count():>10}"
+                f"{statistics.median(latencies) * 1000:>10.1f}{p95 * 1000:>10.1f}"
+            )
+
+        query = parse_query(queries[0])
+        self.stdout.write(f"\nPlan of {queries[0]!r}:")
+        self.stdout.write(search_queryset(organization.pk, query)[:options["first"]].explain(analyze=True))
+
+    def seed(self, tasks, projects, reseed):
+        organization, _ = Organization.objects.get_or_create(
+            slug=BENCHMARK_SLUG,
+            defaults={"name": "Search benchmark", "contact_email": "benchmark@example.com"})
+        existing = Task.objects.filter(project__organization=organization)
+        if reseed:
+            with transaction.atomic():
+                Task.objects.filter(project__organization=organization).delete()
+                Project.objects.filter(organization=organization).delete()
+        elif existing.count() >= tasks:
+            return organization
+
+        missing = tasks - existing.count()
+        self.stdout.write(f"Seeding {missing} tasks…")
+        started = time.perf_counter()
+        with transaction.atomic():
+            if not Project.objects.filter(organization=organization).exists():
+                Project.objects.bulk_create(
+                    Project(organization=organization, name=f"Benchmark {number}")
+                    for number in range(projects)
+                )
+            project_ids = list(Project.objects.filter(
+                organization=organization).values_list("id", flat=True))
+            # Generated in the database: Postgres fills the search vectors
+            # and the GIN index as the rows are inserted.
+            with connection.cursor() as cursor:
+                cursor.execute(
+                    f"""
+                    INSERT INTO {Task._meta.db_table}
+                        (project_id, title, description, status, created_at, updated_at)
+                    SELECT
+                        (%(projects)s::bigint[])[1 + n %% cardinality(%(projects)s::bigint[])],
+                        initcap(w[1 + n %% 30]) || ' ' || w[1 + (n / 30) %% 30],
+                        w[1 + (n / 7) %% 30] || ' ' || w[1 + (n / 11) %% 30] || ' '
+                            || w[1 + (n / 13) %% 30] || ' #' || n,
+                        (ARRAY['TODO', 'IN_PROGRESS', 'DONE'])[1 + n %% 3],
+                        now(), now()
+                    FROM generate_series(1, %(tasks)s) AS n, (SELECT %(words)s::text[] AS w) AS words
+                    """,
+                    {"projects": project_ids, "tasks": missing, "words": WORDS},
+                )
+        with connection.cursor() as cursor:
+            cursor.execute(f"VACUUM ANALYZE {Task._meta.db_table}")
+        self.stdout.write(f"Seeded in {time.perf_counter() - started:.1f}s")
+        return organization
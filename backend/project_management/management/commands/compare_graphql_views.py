@@ -0,0 +1,101 @@
+import asyncio
+import json
+import statistics
+import time
+from concurrent.futures import ThreadPoolExecutor
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connections
+from django.test import AsyncRequestFactory, RequestFactory
+from graphql_jwt.shortcuts import get_token
+from accounts.models import CustomUser
+from backend.views import APIGraphQLView, AsyncAPIGraphQLView
+
+DEFAULT_QUERY = """
+query {
+    me { email }
+    projects {
+        name
+        tasks { title assignee { email } comments { content author { email } } }
+    }
+    organizationStats { totalTasks completionRate }
+}
+"""
+
+
+class Command(BaseCommand):
+    help = (
+        "Send the same GraphQL query through the sync and the async view with N "
+        "concurrent clients and compare throughput and latency."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--email", required=True, help="User the requests are made as.")
+        parser.add_argument("--requests", type=int, default=200, help="Requests per view.")
+        parser.add_argument("--concurrency", type=int, default=20, help="Concurrent clients.")
+        parser.add_argument("--query", help="Query to send (defaults to a nested projects query).")
+
+    def handle(self, *args, **options):
+        try:
+            user = CustomUser.objects.get(email=options["email"])
+        except CustomUser.DoesNotExist:
+            raise CommandError(f"User '{options['email']}' does not exist")
+
+        body = json.dumps({"query": options["query"] or DEFAULT_QUERY})
+        headers = {"Authorization": f"Bearer {get_token(user)}"}
+        requests, concurrency = options["requests"], options["concurrency"]
+
+        results = {
+            "sync": self.run_sync(body, headers, requests, concurrency),
+            "async": asyncio.run(self.run_async(body, headers, requests, concurrency)),
+        }
+        self.stdout.write(f"{'view':<8}{'req/s':>10}{'p50 ms':>10}{'p95 ms':>10}{'errors':>8}")
+        for name, (elapsed, latencies, errors) in results.items():
+            latencies.sort()
+            p95 = latencies[int(len(latencies) * 0.95) - 1] if latencies else 0
+            self.stdout.write(
+                f"{name:<8}{requests / elapsed:>10.1f}"
+                f"{statistics.median(latencies) * 1000:>10.1f}"
+                f"{p95 * 1000:>10.1f}{errors:>8}"
+            )
+
+    def run_sync(self, body, headers, requests, concurrency):
+        view = APIGraphQLView.as_view()
+        factory = RequestFactory()
+
+        def send(_):
+            started = time.perf_counter()
+            response = view(factory.post(
+                "/graphql/", body, content_type="application/json", headers=headers))
+            latency = time.perf_counter() - started
+            connections.close_all()
+            return latency, self.failed(response)
+
+        started = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=concurrency) as executor:
+            outcomes = list(executor.map(send, range(requests)))
+        return self.summarize(started, outcomes)
+
+    async def run_async(self, body, headers, requests, concurrency):
+        view = AsyncAPIGraphQLView.as_view()
+        factory = AsyncRequestFactory()
+        semaphore = asyncio.Semaphore(concurrency)
+
+        async def send():
+            async with semaphore:
+                started = time.perf_counter()
+                response = await view(factory.post(
+                    "/graphql/", body, content_type="application/json", headers=headers))
+                return time.perf_counter() - started, self.failed(response)
+
+        started = time.perf_counter()
+        outcomes = await asyncio.gather(*(send() for _ in range(requests)))
+        return self.summarize(started, outcomes)
+
+    def failed(self, response):
+        return response.status_code != 200 or "errors" in json.loads(response.content)
+
+    def summarize(self, started, outcomes):
+        elapsed = time.perf_counter() - started
+        latencies = [latency for latency, _ in outcomes]
+        errors = sum(failed for _, failed in outcomes)
+        return elapsed, latencies, errors
@@ -0,0 +1,19 @@
+from django.core.management.base import BaseCommand
+from project_management.partitions import ensure_comment_partitions
+
+
+class Command(BaseCommand):
+    help = (
+        "Create the monthly partitions of the comments table for the coming months and "
+        "for months with rows in the default partition. Run it at least monthly."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--months-ahead", type=int,
+                            help="Overrides COMMENT_PARTITION_MONTHS_AHEAD.")
+
+    def handle(self, *args, **options):
+        created = ensure_comment_partitions(options["months_ahead"])
+        for name, moved in created.items():
+            self.stdout.write(f"  {name}: {moved} rows moved from the default partition")
+        self.stdout.write(self.style.SUCCESS(f"Created {len(created)} partitions"))
@@ -0,0 +1,108 @@
+import re
+from django.core.management.base import BaseCommand, CommandError
+from django.db import DatabaseError, connections
+from django.db.models import Count
+from django.utils import timezone
+from accounts.models import CustomUser, Organization
+from project_management.loaders import capped_per_parent
+from project_management.models import Project, Task, TaskComment
+from project_management.pagination import ORDERING
+from project_management.schema.queries import task_list
+from project_management.stats import stats_queryset
+
+# Index references in PostgreSQL and SQLite plans.
+INDEX_PATTERN = re.compile(
+    r"(?:Index Scan|Index Only Scan|Bitmap Index Scan) (?:Backward )?(?:using|on) (\w+)"
+    r"|USING (?:COVERING )?INDEX (\w+)"
+    r"|USING INTEGER PRIMARY KEY"
+)
+
+
+class Command(BaseCommand):
+    help = "Run EXPLAIN on the query behind each resolver and report the indexes it uses."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--organization", help="Slug of the organization to sample (defaults to the largest one).")
+        parser.add_argument(
+            "--analyze", action="store_true", help="Use EXPLAIN ANALYZE (PostgreSQL only).")
+        parser.add_argument(
+            "--verbose-plans", action="store_true", help="Print the full plan for every query.")
+
+    def handle(self, *args, **options):
+        organization = self.get_organization(options["organization"])
+        project = Project.objects.filter(organization=organization).order_by("-id").first()
+        task = Task.objects.filter(project__organization=organization).order_by("-id").first()
+        user = CustomUser.objects.filter(organization=organization).first()
+        if project is None or task is None or user is None:
+            raise CommandError(
+                f"Organization '{organization.slug}' needs at least one project, task and user.")
+
+        queries = {
+            "projects": Project.objects.filter(
+                organization=organization).order_by(*ORDERING),
+            "project": Project.objects.filter(pk=project.pk, organization=organization),
+            "tasks": capped_per_parent(
+                Task.objects.filter(project_id__in=[project.pk]), "project_id"),
+            "task": Task.objects.filter(pk=task.pk),
+            "taskComments": capped_per_parent(
+                TaskComment.objects.filter(task_id__in=[task.pk]), "task_id"),
+            "projectStats": stats_queryset([project.pk]),
+            "overdueTasks": Task.objects.filter(
+                project=project, due_date__lt=timezone.now()).exclude(status="DONE"),
+            "myOverdueTasks": task_list(
+                user, filter={"assignee_in": [user.pk], "overdue": True}, sort="DUE_DATE"),
+            "assigneeLookup": CustomUser.objects.filter(
+                email=user.email, organization=organization),
+        }
+
+        explain_options = {"analyze": True} if options["analyze"] else {}
+        for name, queryset in queries.items():
+            try:
+                plan = self.explain(queryset, explain_options)
+            except DatabaseError as e:
+                self.stdout.write(f"{name:<16} {self.style.ERROR(f'EXPLAIN failed: {e}')}")
+                continue
+            indexes = self.indexes_used(plan)
+            summary = ", ".join(indexes) if indexes else "no index (sequential scan)"
+            style = self.style.SUCCESS if indexes else self.style.WARNING
+            self.stdout.write(f"{name:<16} {style(summary)}")
+            if options["verbose_plans"]:
+                self.stdout.write(plan + "\n")
+
+    def explain(self, queryset, options):
+        """
+        The plan of the SQL `queryset` runs. QuerySet.explain() cannot be
+        used: it wraps the window queries of capped_per_parent() in a
+        subquery and puts EXPLAIN inside it.
+        """
+        connection = connections[queryset.db]
+        sql, params = queryset.query.sql_with_params()
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f"{connection.ops.explain_query_prefix(**options)} {sql}", params)
+            return "\n".join(
+                " ".join(str(column) for column in row) for row in cursor.fetchall())
+
+    def get_organization(self, slug):
+        if slug:
+            try:
+                return Organization.objects.get(slug=slug)
+            except Organization.DoesNotExist:
+                raise CommandError(f"Organization '{slug}' does not exist")
+        # Without a slug, sample the organization with the most projects.
+        organization = (
+            Organization.objects.annotate(project_count=Count("projects"))
+            .order_by("-project_count").first()
+        )
+        if organization is None:
+            raise CommandError("No organizations found; seed some data first")
+        return organization
+
+    def indexes_used(self, plan):
+        indexes = []
+        for match in INDEX_PATTERN.finditer(plan):
+            name = next((group for group in match.groups() if group), "primary key")
+            if name not in indexes:
+                indexes.append(name)
+        return indexes
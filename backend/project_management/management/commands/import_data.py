@@ -0,0 +1,67 @@
+import time
+from contextlib import ExitStack
+from django.core.management.base import BaseCommand, CommandError
+from accounts.models import Organization
+from project_management.importer import FORMATS, Import, detect_format, read_rows
+
+
+class Command(BaseCommand):
+    help = (
+        "Import tasks and comments from CSV or NDJSON files into an organization. "
+        "Rows are loaded with COPY through staging tables and merged in one transaction; "
+        "rejected rows are written to an error file."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--organization", required=True, help="Slug of the organization.")
+        parser.add_argument("--tasks", help="File of tasks: ref, project_id, title, description, "
+                                            "status, assignee_email, due_date, created_at.")
+        parser.add_argument("--comments", help="File of comments: task_id or task_ref, content, "
+                                               "author_email, created_at.")
+        parser.add_argument("--format", choices=FORMATS,
+                            help="Format of the files (defaults to their extension).")
+        parser.add_argument("--errors", default="import-errors.csv",
+                            help="CSV file the rejected rows are reported in.")
+        parser.add_argument("--chunk-size", type=int, help="Rows validated and copied at a time.")
+        parser.add_argument("--strict", action="store_true",
+                            help="Import nothing if any row is rejected.")
+
+    def handle(self, *args, **options):
+        if not options["tasks"] and not options["comments"]:
+            raise CommandError("Give --tasks, --comments or both")
+        try:
+            organization = Organization.objects.get(slug=options["organization"])
+        except Organization.DoesNotExist:
+            raise CommandError(f"Organization '{options['organization']}' does not exist")
+
+        files = {}
+        with ExitStack() as stack:
+            for source in ("tasks", "comments"):
+                path = options[source]
+                if path:
+                    format = options["format"] or detect_format(path)
+                    if format is None:
+                        raise CommandError(f"Cannot tell the format of {path}; use --format")
+                    files[source] = read_rows(stack.enter_context(open(path, "rb")), format)
+
+            started = time.perf_counter()
+            error_file = stack.enter_context(open(options["errors"], "w", newline=""))
+            importer = Import(organization, chunk_size=options["chunk_size"],
+                              error_file=error_file, progress=self.progress)
+            imported = importer.run(files.get("tasks"), files.get("comments"),
+                                    strict=options["strict"])
+
+        elapsed = time.perf_counter() - started
+        if importer.error_count:
+            self.stdout.write(self.style.WARNING(
+                f"{importer.error_count} rows rejected, see {options['errors']}"))
+        if not imported:
+            raise CommandError(
+                "Nothing was imported: rows were rejected (--strict)" if options["strict"]
+                else "Nothing was imported: no row was valid")
+        self.stdout.write(self.style.SUCCESS(
+            f"Imported {importer.imported['tasks']} tasks and {importer.imported['comments']} "
+            f"comments in {elapsed:.1f}s"))
+
+    def progress(self, source, rows, errors):
+        self.stdout.write(f"  {source}: {rows} rows read, {errors} rejected so far")
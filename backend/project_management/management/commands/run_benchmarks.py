@@ -0,0 +1,192 @@
+import json
+import statistics
+import time
+import tracemalloc
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+from django.db.models import Count
+from django.test import RequestFactory
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from accounts.models import Organization
+from backend.schema import schema
+from project_management.benchmarks import OPERATIONS, Fixtures
+
+# Traced runs per operation for its peak memory
+MEMORY_RUNS = 3
+
+
+class Command(BaseCommand):
+    help = (
+        "Run the frontend's GraphQL operations through the schema against an "
+        "organization (see seed_benchmark_data) and report latency, SQL query "
+        "counts and memory. Results can be saved as a JSON baseline and compared "
+        "with one, failing on regressions."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--organization", help="Slug of the organization (defaults to the largest one).")
+        parser.add_argument("--runs", type=int, default=30, help="Timed runs per operation.")
+        parser.add_argument("--warmup", type=int, default=3, help="Untimed runs per operation.")
+        parser.add_argument("--operation", action="append", help="Only run this operation (repeatable).")
+        parser.add_argument("--save", help="Write the results to this JSON file.")
+        parser.add_argument("--compare", help="Baseline JSON file to compare the results with.")
+        parser.add_argument("--tolerance", type=float, default=0.2,
+                            help="Allowed relative increase of p95 latency and memory.")
+        parser.add_argument("--min-delta-ms", type=float, default=2.0,
+                            help="Latency increases below this many milliseconds are ignored.")
+        parser.add_argument("--min-runs", type=int, default=20,
+                            help="Latencies are only compared when both results have this many runs.")
+
+    def handle(self, *args, **options):
+        organization = self.get_organization(options["organization"])
+        fixtures = Fixtures(organization)
+        if not fixtures.complete:
+            raise CommandError(
+                f"Organization '{organization.slug}' needs a project with a commented task and a user.")
+
+        operations = [
+            operation for operation in OPERATIONS
+            if not options["operation"] or operation.name in options["operation"]
+        ]
+        if not operations:
+            raise CommandError("No operation matches --operation")
+
+        self.stdout.write(
+            f"{'operation':<22}{'p50 ms':>10}{'p95 ms':>10}{'queries':>9}{'peak KiB':>10}")
+        results = {}
+        for operation in operations:
+            result = self.benchmark(operation, fixtures, options["runs"], options["warmup"])
+            results[operation.name] = result
+            self.stdout.write(
+                f"{operation.name:<22}{result['p50_ms']:>10.2f}{result['p95_ms']:>10.2f}"
+                f"{result['queries']:>9}{result['peak_kib']:>10.0f}")
+
+        report = {
+            "meta": {
+                "organization": organization.slug,
+                "database": connection.vendor,
+                "runs": options["runs"],
+                "created_at": timezone.now().isoformat(),
+            },
+            "operations": results,
+        }
+        if options["save"]:
+            with open(options["save"], "w") as f:
+                json.dump(report, f, indent=2, sort_keys=True)
+            self.stdout.write(f"Saved results to {options['save']}")
+        if options["compare"]:
+            self.compare(results, options["runs"], options["compare"], options["tolerance"],
+                         options["min_delta_ms"], options["min_runs"])
+
+    def get_organization(self, slug):
+        if slug:
+            try:
+                return Organization.objects.get(slug=slug)
+            except Organization.DoesNotExist:
+                raise CommandError(f"Organization '{slug}' does not exist")
+        organization = (
+            Organization.objects.annotate(task_count=Count("projects__tasks"))
+            .order_by("-task_count").first()
+        )
+        if organization is None:
+            raise CommandError("No organizations found; run seed_benchmark_data first")
+        return organization
+
+    def run_operation(self, operation, fixtures):
+        request = RequestFactory().post("/graphql/")
+        request.user = fixtures.user
+        if not operation.mutation:
+            return schema.execute(
+                operation.query, variables=operation.variables(fixtures), context_value=request)
+        # Mutations are rolled back so that every run sees the same data.
+        with transaction.atomic():
+            result = schema.execute(
+                operation.query, variables=operation.variables(fixtures), context_value=request)
+            transaction.set_rollback(True)
+        return result
+
+    def benchmark(self, operation, fixtures, runs, warmup):
+        for _ in range(warmup):
+            result = self.run_operation(operation, fixtures)
+            if result.errors:
+                raise CommandError(f"{operation.name} failed: {result.errors[0]}")
+
+        latencies = []
+        for _ in range(runs):
+            started = time.perf_counter()
+            self.run_operation(operation, fixtures)
+            latencies.append((time.perf_counter() - started) * 1000)
+
+        # Queries and memory are measured on separate runs, as both slow
+        # execution down.
+        with CaptureQueriesContext(connection) as queries:
+            self.run_operation(operation, fixtures)
+        # The lowest of a few peaks, as the first runs still allocate caches.
+        peaks = []
+        for _ in range(MEMORY_RUNS):
+            tracemalloc.start()
+            try:
+                self.run_operation(operation, fixtures)
+                peaks.append(tracemalloc.get_traced_memory()[1])
+            finally:
+                tracemalloc.stop()
+        peak = min(peaks)
+
+        latencies.sort()
+        quartiles = statistics.quantiles(latencies, n=4) if len(latencies) > 1 else [0, 0, 0]
+        return {
+            "p50_ms": round(statistics.median(latencies), 3),
+            "p95_ms": round(latencies[max(int(len(latencies) * 0.95) - 1, 0)], 3),
+            # Spread of the runs, the noise a latency change must exceed
+            "iqr_ms": round(quartiles[2] - quartiles[0], 3),
+            # Savepoint statements of the rollback wrapper are not the operation's.
+            "queries": sum(
+                not query["sql"].startswith(("SAVEPOINT", "RELEASE SAVEPOINT", "ROLLBACK"))
+                for query in queries.captured_queries),
+            "peak_kib": round(peak / 1024, 1),
+        }
+
+    def compare(self, results, runs, path, tolerance, min_delta_ms, min_runs):
+        """
+        Fail on operations that run more queries, use more memory or got
+        slower than in the baseline. A p95 from a few runs is mostly noise,
+        so latencies are only compared when both sides have `min_runs` runs,
+        and an increase must also exceed twice the interquartile range of
+        either side's runs.
+        """
+        try:
+            with open(path) as f:
+                report = json.load(f)
+            baseline = report["operations"]
+        except (OSError, ValueError, KeyError) as e:
+            raise CommandError(f"Cannot read baseline {path}: {e}")
+        baseline_runs = report.get("meta", {}).get("runs", 0)
+        compare_latency = min(runs, baseline_runs) >= min_runs
+        if not compare_latency:
+            self.stdout.write(self.style.WARNING(
+                f"Latencies not compared: {min(runs, baseline_runs)} runs, "
+                f"--min-runs is {min_runs}"))
+
+        regressions = []
+        for name, result in results.items():
+            before = baseline.get(name)
+            if before is None:
+                continue
+            if result["queries"] > before["queries"]:
+                regressions.append(f"{name}: {before['queries']} -> {result['queries']} queries")
+            noise = 2 * max(result["iqr_ms"], before.get("iqr_ms", 0))
+            increase = result["p95_ms"] - before["p95_ms"]
+            if (compare_latency and result["p95_ms"] > before["p95_ms"] * (1 + tolerance)
+                    and increase >= min_delta_ms and increase > noise):
+                regressions.append(
+                    f"{name}: p95 {before['p95_ms']:.2f} -> {result['p95_ms']:.2f} ms")
+            if result["peak_kib"] > before["peak_kib"] * (1 + tolerance):
+                regressions.append(
+                    f"{name}: peak memory {before['peak_kib']:.0f} -> {result['peak_kib']:.0f} KiB")
+
+        if regressions:
+            for regression in regressions:
+                self.stdout.write(self.style.ERROR(regression))
+            raise CommandError(f"{len(regressions)} regression(s) against {path}")
+        self.stdout.write(self.style.SUCCESS(f"No regressions against {path}"))
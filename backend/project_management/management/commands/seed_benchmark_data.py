@@ -0,0 +1,190 @@
+import random
+import time
+from datetime import timedelta
+from django.contrib.auth.hashers import make_password
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from django.utils import timezone
+from accounts.models import CustomUser, Organization
+from project_management.models import Change, Project, ProjectArchive, Task, TaskComment
+
+WORDS = (
+    "invoice login deploy report design database review customer payment export import "
+    "mobile search billing migration email onboarding dashboard security performance "
+    "refactor release audit backup notification calendar upload permissions analytics webhook"
+).split()
+PROJECT_STATUSES = (("ACTIVE", 70), ("ON_HOLD", 10), ("COMPLETED", 20))
+TASK_STATUSES = (("TODO", 40), ("IN_PROGRESS", 25), ("DONE", 35))
+
+
+def skewed_counts(total, buckets, rng, alpha=1.2):
+    """
+    Split `total` over `buckets` following a Pareto distribution, so a few
+    buckets get most of the rows, like a few large tenants or projects.
+    """
+    if buckets == 0:
+        return []
+    weights = [rng.paretovariate(alpha) for _ in range(buckets)]
+    scale = total / sum(weights)
+    counts = [int(weight * scale) for weight in weights]
+    for index in rng.sample(range(buckets), min(buckets, total - sum(counts))):
+        counts[index] += 1
+    return counts
+
+
+def weighted_choice(choices, rng):
+    values, weights = zip(*choices)
+    return rng.choices(values, weights)[0]
+
+
+def sentence(rng, words):
+    return " ".join(rng.choice(WORDS) for _ in range(words)).capitalize()
+
+
+class Command(BaseCommand):
+    help = (
+        "Generate organizations, users, projects, tasks and comments with a "
+        "realistic skew for benchmarks. Rows are written with bulk_create in batches."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--organizations", type=int, default=10)
+        parser.add_argument("--users", type=int, default=200, help="Users over all organizations.")
+        parser.add_argument("--projects", type=int, default=200, help="Projects over all organizations.")
+        parser.add_argument("--tasks", type=int, default=50_000, help="Tasks over all projects.")
+        parser.add_argument("--comments", type=int, default=150_000, help="Comments over all tasks.")
+        parser.add_argument("--batch-size", type=int, default=5000)
+        parser.add_argument("--seed", type=int, default=0, help="Random seed, for repeatable data.")
+        parser.add_argument("--prefix", default="bench", help="Slug prefix of the generated organizations.")
+        parser.add_argument("--reset", action="store_true",
+                            help="Delete organizations generated earlier with the same prefix first.")
+
+    def handle(self, *args, **options):
+        self.rng = random.Random(options["seed"])
+        self.batch_size = options["batch_size"]
+        prefix = options["prefix"]
+
+        existing = Organization.objects.filter(slug__startswith=f"{prefix}-")
+        if existing.exists():
+            if not options["reset"]:
+                raise CommandError(
+                    f"Organizations with the '{prefix}-' prefix exist; use --reset to replace them")
+            self.delete(existing)
+
+        started = time.perf_counter()
+        organizations = Organization.objects.bulk_create(
+            Organization(name=f"{prefix.title()} {number}", slug=f"{prefix}-{number}",
+                         contact_email=f"ops@{prefix}-{number}.test")
+            for number in range(options["organizations"])
+        )
+        users = self.create_users(organizations, options["users"])
+        projects = self.create_projects(organizations, options["projects"])
+        self.create_tasks_and_comments(projects, users, options["tasks"], options["comments"])
+
+        self.stdout.write(self.style.SUCCESS(
+            f"Seeded {len(organizations)} organizations, {len(users)} users, {len(projects)} "
+            f"projects, {options['tasks']} tasks and about {options['comments']} comments "
+            f"in {time.perf_counter() - started:.1f}s. Users log in with password 'benchmark'."
+        ))
+
+    def delete(self, organizations):
+        with transaction.atomic():
+            tasks = Task.objects.filter(project__organization__in=organizations)
+            TaskComment.objects.filter(task__in=tasks).delete()
+            tasks.delete()
+            # Archives of projects archived by archive_projects
+            ProjectArchive.objects.filter(project__organization__in=organizations).delete()
+            Project.objects.filter(organization__in=organizations).delete()
+            Change.objects.filter(organization__in=organizations).delete()
+            CustomUser.objects.filter(organization__in=organizations).delete()
+            organizations.delete()
+
+    def bulk_create(self, model, rows):
+        created = []
+        batch = []
+        for row in rows:
+            batch.append(row)
+            if len(batch) >= self.batch_size:
+                created.extend(model.objects.bulk_create(batch))
+                batch = []
+        if batch:
+            created.extend(model.objects.bulk_create(batch))
+        return created
+
+    def create_users(self, organizations, total):
+        # Hashing is slow; every generated user shares one password hash.
+        password = make_password("benchmark")
+        users = []
+        for organization, count in zip(organizations, skewed_counts(total, len(organizations), self.rng)):
+            users.extend(
+                CustomUser(username=f"{organization.slug}-user{number}",
+                           email=f"user{number}@{organization.slug}.test",
+                           password=password, organization=organization)
+                for number in range(max(count, 1))
+            )
+        return self.bulk_create(CustomUser, users)
+
+    def create_projects(self, organizations, total):
+        today = timezone.localdate()
+        projects = []
+        for organization, count in zip(organizations, skewed_counts(total, len(organizations), self.rng)):
+            projects.extend(
+                Project(
+                    organization=organization,
+                    name=f"{sentence(self.rng, 2)} {number}",
+                    description=sentence(self.rng, 12),
+                    status=weighted_choice(PROJECT_STATUSES, self.rng),
+                    due_date=(today + timedelta(days=self.rng.randint(-60, 180))
+                              if self.rng.random() < 0.7 else None),
+                )
+                for number in range(count)
+            )
+        return self.bulk_create(Project, projects)
+
+    def create_tasks_and_comments(self, projects, users, total_tasks, total_comments):
+        users_by_organization = {}
+        for user in users:
+            users_by_organization.setdefault(user.organization_id, []).append(user)
+        comments_per_task = total_comments / max(total_tasks, 1)
+        now = timezone.now()
+
+        # Tasks are written a batch of projects at a time, each batch
+        # followed by its comments, so memory stays flat at any size.
+        batch = []
+        for project, count in zip(projects, skewed_counts(total_tasks, len(projects), self.rng)):
+            members = users_by_organization[project.organization_id]
+            # A few members get most of the assignments.
+            weights = [1 / (rank + 1) for rank in range(len(members))]
+            for number in range(count):
+                batch.append(Task(
+                    project=project,
+                    title=f"{sentence(self.rng, 4)} #{number}",
+                    description=sentence(self.rng, self.rng.randint(5, 40)),
+                    status=weighted_choice(TASK_STATUSES, self.rng),
+                    assignee=(self.rng.choices(members, weights)[0]
+                              if self.rng.random() < 0.8 else None),
+                    due_date=(now + timedelta(days=self.rng.randint(-30, 60))
+                              if self.rng.random() < 0.6 else None),
+                ))
+            if len(batch) >= self.batch_size:
+                self.flush_tasks(batch, users_by_organization, comments_per_task)
+                batch = []
+        if batch:
+            self.flush_tasks(batch, users_by_organization, comments_per_task)
+
+    def flush_tasks(self, tasks, users_by_organization, comments_per_task):
+        with transaction.atomic():
+            tasks = Task.objects.bulk_create(tasks)
+            comments = []
+            for task in tasks:
+                members = users_by_organization[task.project.organization_id]
+                # Exponentially distributed: most tasks have a few comments,
+                # some have long threads.
+                count = int(self.rng.expovariate(1 / comments_per_task)) if comments_per_task else 0
+                comments.extend(
+                    TaskComment(task=task, content=sentence(self.rng, self.rng.randint(3, 30)),
+                                author=self.rng.choice(members))
+                    for _ in range(count)
+                )
+            self.bulk_create(TaskComment, comments)
+        self.stdout.write(f"  {len(tasks)} tasks, {len(comments)} comments")
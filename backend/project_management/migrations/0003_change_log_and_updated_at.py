@@ -0,0 +1,51 @@
+# Generated by Django 5.2.5 on 2026-10-17 18:51
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+def backfill_updated_at(apps, schema_editor):
+    for name in ("Project", "Task", "TaskComment"):
+        model = apps.get_model("project_management", name)
+        model.objects.update(updated_at=models.F("created_at"))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('accounts', '0002_customuser_user_org_email_idx'),
+        ('project_management', '0002_project_project_org_created_idx_and_more'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='project',
+            name='updated_at',
+            field=models.DateTimeField(auto_now=True),
+        ),
+        migrations.AddField(
+            model_name='task',
+            name='updated_at',
+            field=models.DateTimeField(auto_now=True),
+        ),
+        migrations.AddField(
+            model_name='taskcomment',
+            name='updated_at',
+            field=models.DateTimeField(auto_now=True),
+        ),
+        migrations.RunPython(backfill_updated_at, migrations.RunPython.noop),
+        migrations.CreateModel(
+            name='Change',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('entity', models.CharField(choices=[('PROJECT', 'Project'), ('TASK', 'Task'), ('COMMENT', 'Comment')], max_length=10)),
+                ('object_id', models.BigIntegerField()),
+                ('operation', models.CharField(choices=[('UPSERT', 'Upsert'), ('DELETE', 'Delete')], default='UPSERT', max_length=10)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('organization', models.ForeignKey(on_delete=django.db.models.deletion.DO_NOTHING, related_name='changes', to='accounts.organization')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['organization', 'id'], name='change_org_id_idx')],
+            },
+        ),
+    ]
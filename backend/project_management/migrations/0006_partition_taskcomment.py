@@ -0,0 +1,96 @@
+from datetime import date, datetime, timezone
+
+from django.db import migrations
+
+TABLE = "project_management_taskcomment"
+COLUMNS = "id, content, created_at, author_id, task_id, updated_at"
+# Monthly partitions created beyond the current month
+MONTHS_AHEAD = 3
+
+
+def add_months(month, count):
+    index = month.year * 12 + month.month - 1 + count
+    return date(index // 12, index % 12 + 1, 1)
+
+
+def create_partition(schema_editor, month):
+    start = datetime.combine(month, datetime.min.time(), timezone.utc)
+    end = datetime.combine(add_months(month, 1), datetime.min.time(), timezone.utc)
+    schema_editor.execute(
+        f"CREATE TABLE {TABLE}_p{month:%Y_%m} PARTITION OF {TABLE} "
+        f"FOR VALUES FROM ('{start.isoformat()}') TO ('{end.isoformat()}')")
+
+
+def rebuild(schema_editor, partitioned):
+    """
+    Copy the comments into a new table, partitioned by month of created_at
+    or not, and recreate the indexes and constraints under their names. A
+    primary key of a partitioned table must include created_at.
+    """
+    execute = schema_editor.execute
+    with schema_editor.connection.cursor() as cursor:
+        cursor.execute(
+            "SELECT conname, pg_get_constraintdef(oid) FROM pg_constraint "
+            "WHERE conrelid = %s::regclass AND contype = 'f'", [TABLE])
+        foreign_keys = cursor.fetchall()
+        cursor.execute(
+            "SELECT indexdef FROM pg_indexes WHERE tablename = %s AND indexname <> %s",
+            [TABLE, f"{TABLE}_pkey"])
+        indexes = [indexdef.replace(" ON ONLY ", " ON ") for indexdef, in cursor.fetchall()]
+        cursor.execute(
+            f"SELECT DISTINCT date_trunc('month', created_at AT TIME ZONE 'UTC')::date FROM {TABLE}")
+        months = {month for month, in cursor.fetchall()}
+
+    execute(f"ALTER TABLE {TABLE} RENAME TO {TABLE}_old")
+    execute(f"""
+        CREATE TABLE {TABLE} (
+            id bigint NOT NULL,
+            content text NOT NULL,
+            created_at timestamp with time zone NOT NULL,
+            author_id bigint NULL,
+            task_id bigint NOT NULL,
+            updated_at timestamp with time zone NOT NULL,
+            search_vector tsvector GENERATED ALWAYS AS (
+                to_tsvector('english'::regconfig, COALESCE(content, ''::text))) STORED
+        ) {"PARTITION BY RANGE (created_at)" if partitioned else ""}
+    """)
+    if partitioned:
+        current = datetime.now(timezone.utc).date().replace(day=1)
+        months.update(add_months(current, count) for count in range(MONTHS_AHEAD + 1))
+        for month in sorted(months):
+            create_partition(schema_editor, month)
+        execute(f"CREATE TABLE {TABLE}_default PARTITION OF {TABLE} DEFAULT")
+
+    execute(f"INSERT INTO {TABLE} ({COLUMNS}) SELECT {COLUMNS} FROM {TABLE}_old")
+    # Drops the old id sequence with it.
+    execute(f"DROP TABLE {TABLE}_old")
+    execute(f"CREATE SEQUENCE {TABLE}_id_seq OWNED BY {TABLE}.id")
+    execute(f"SELECT setval('{TABLE}_id_seq', coalesce(max(id), 0) + 1, false) FROM {TABLE}")
+    execute(f"ALTER TABLE {TABLE} ALTER COLUMN id SET DEFAULT nextval('{TABLE}_id_seq')")
+
+    primary_key = "id, created_at" if partitioned else "id"
+    execute(f"ALTER TABLE {TABLE} ADD CONSTRAINT {TABLE}_pkey PRIMARY KEY ({primary_key})")
+    for name, definition in foreign_keys:
+        execute(f"ALTER TABLE {TABLE} ADD CONSTRAINT {name} {definition}")
+    for indexdef in indexes:
+        execute(indexdef)
+    execute(f"ANALYZE {TABLE}")
+
+
+def partition(apps, schema_editor):
+    rebuild(schema_editor, partitioned=True)
+
+
+def unpartition(apps, schema_editor):
+    rebuild(schema_editor, partitioned=False)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('project_management', '0005_task_assignee_created_idx'),
+    ]
+
+    operations = [
+        migrations.RunPython(partition, unpartition),
+    ]
@@ -0,0 +1,45 @@
+# Generated by Django 5.2.5 on 2026-10-17 19:43
+
+import django.contrib.postgres.fields
+import django.contrib.postgres.indexes
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('project_management', '0006_partition_taskcomment'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='project',
+            name='archived_at',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='project',
+            name='restored_at',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.CreateModel(
+            name='ProjectArchive',
+            fields=[
+                ('project', models.OneToOneField(on_delete=django.db.models.deletion.DO_NOTHING, primary_key=True, related_name='archive', serialize=False, to='project_management.project')),
+                ('data', models.BinaryField()),
+                ('task_ids', django.contrib.postgres.fields.ArrayField(base_field=models.BigIntegerField(), size=None)),
+                ('comment_ids', django.contrib.postgres.fields.ArrayField(base_field=models.BigIntegerField(), size=None)),
+                ('stats', models.JSONField()),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+            ],
+            options={
+                'indexes': [django.contrib.postgres.indexes.GinIndex(fields=['task_ids'], name='archive_task_ids_idx'), django.contrib.postgres.indexes.GinIndex(fields=['comment_ids'], name='archive_comment_ids_idx')],
+            },
+        ),
+        # The data is compressed already, so PostgreSQL need not try again.
+        migrations.RunSQL(
+            "ALTER TABLE project_management_projectarchive ALTER COLUMN data SET STORAGE EXTERNAL",
+            "ALTER TABLE project_management_projectarchive ALTER COLUMN data SET STORAGE EXTENDED",
+        ),
+    ]
@@ -1,7 +1,19 @@
 from django.conf import settings
+from django.contrib.postgres.fields import ArrayField
+from django.contrib.postgres.indexes import GinIndex
+from django.contrib.postgres.search import SearchVector, SearchVectorField
 from django.db import models
 from accounts.models import Organization
 
+# Text search configuration of the search_vector columns
+SEARCH_CONFIG = "english"
+
+
+class SearchableManager(models.Manager):
+    def get_queryset(self):
+        # The search vector is only read inside search queries.
+        return super().get_queryset().defer("search_vector")
+
 
 class Project(models.Model):
     STATUS_CHOICES = [
@@ -19,6 +31,18 @@ class Project(models.Model):
         max_length=20, choices=STATUS_CHOICES, default="ACTIVE")
     due_date = models.DateField(null=True, blank=True)
     created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+    # Set while the project's tasks and comments are in its ProjectArchive
+    archived_at = models.DateTimeField(null=True, blank=True)
+    restored_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=["organization", "created_at", "id"],
+                         name="project_org_created_idx"),
+            models.Index(fields=["organization", "status", "due_date"],
+                         name="project_org_status_due_idx"),
+        ]
 
     def __str__(self):
         return f"{self.name} ({self.organization})"
@@ -42,12 +66,45 @@ class Task(models.Model):
     )
     due_date = models.DateTimeField(null=True, blank=True)
     created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+    # Maintained by PostgreSQL on every insert and update of the row.
+    search_vector = models.GeneratedField(
+        expression=(
+            SearchVector("title", weight="A", config=SEARCH_CONFIG)
+            + SearchVector("description", weight="B", config=SEARCH_CONFIG)
+        ),
+        output_field=SearchVectorField(),
+        db_persist=True,
+    )
+
+    objects = SearchableManager()
+
+    class Meta:
+        indexes = [
+            models.Index(fields=["project", "created_at", "id"],
+                         name="task_project_created_idx"),
+            models.Index(fields=["project", "status"],
+                         name="task_project_status_idx"),
+            # Partial indexes only cover open work, which is what the
+            # overdue and "assigned to me" views scan.
+            models.Index(fields=["project", "due_date"],
+                         condition=~models.Q(status="DONE"),
+                         name="task_open_project_due_idx"),
+            models.Index(fields=["assignee", "due_date"],
+                         condition=~models.Q(status="DONE"),
+                         name="task_open_assignee_due_idx"),
+            models.Index(fields=["assignee", "created_at", "id"],
+                         name="task_assignee_created_idx"),
+            GinIndex(fields=["search_vector"], name="task_search_idx"),
+        ]
 
     def __str__(self):
         return f"{self.title} ({self.project})"
 
 
 class TaskComment(models.Model):
+    # The table is partitioned by month of created_at (see partitions.py),
+    # with a primary key of (id, created_at) in the database.
     task = models.ForeignKey(
         Task, on_delete=models.DO_NOTHING, related_name="comments")
     content = models.TextField()
@@ -55,6 +112,84 @@ class TaskComment(models.Model):
         settings.AUTH_USER_MODEL, on_delete=models.SET_NULL, null=True, blank=True, related_name="comments"
     )
     created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+    search_vector = models.GeneratedField(
+        expression=SearchVector("content", config=SEARCH_CONFIG),
+        output_field=SearchVectorField(),
+        db_persist=True,
+    )
+
+    objects = SearchableManager()
+
+    class Meta:
+        indexes = [
+            models.Index(fields=["task", "created_at", "id"],
+                         name="comment_task_created_idx"),
+            GinIndex(fields=["search_vector"], name="comment_search_idx"),
+        ]
 
     def __str__(self):
         return f"Comment by {self.author} on {self.task}"
+
+
+class ProjectArchive(models.Model):
+    """
+    Tasks and comments of an archived project, moved out of the hot tables
+    as zlib-compressed JSON. The ids are kept to find the archive of a task
+    or comment, and the stats to report them without a restore.
+    """
+    project = models.OneToOneField(
+        Project, on_delete=models.DO_NOTHING, primary_key=True, related_name="archive")
+    data = models.BinaryField()
+    task_ids = ArrayField(models.BigIntegerField())
+    comment_ids = ArrayField(models.BigIntegerField())
+    stats = models.JSONField()
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        indexes = [
+            GinIndex(fields=["task_ids"], name="archive_task_ids_idx"),
+            GinIndex(fields=["comment_ids"], name="archive_comment_ids_idx"),
+        ]
+
+    def __str__(self):
+        return f"Archive of {self.project}"
+
+
+class Change(models.Model):
+    """
+    Entry of an organization's change log. Ids grow monotonically within
+    an organization, so the id of the last entry a client has seen is its
+    cursor for `changesSince`.
+    """
+    PROJECT = "PROJECT"
+    TASK = "TASK"
+    COMMENT = "COMMENT"
+    ENTITY_CHOICES = [
+        (PROJECT, "Project"),
+        (TASK, "Task"),
+        (COMMENT, "Comment"),
+    ]
+    UPSERT = "UPSERT"
+    DELETE = "DELETE"
+    OPERATION_CHOICES = [
+        (UPSERT, "Upsert"),
+        (DELETE, "Delete"),
+    ]
+
+    organization = models.ForeignKey(
+        Organization, on_delete=models.DO_NOTHING, related_name="changes")
+    entity = models.CharField(max_length=10, choices=ENTITY_CHOICES)
+    object_id = models.BigIntegerField()
+    operation = models.CharField(
+        max_length=10, choices=OPERATION_CHOICES, default=UPSERT)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=["organization", "id"],
+                         name="change_org_id_idx"),
+        ]
+
+    def __str__(self):
+        return f"{self.operation} {self.entity} {self.object_id}"
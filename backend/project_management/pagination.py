@@ -0,0 +1,129 @@
+import base64
+from datetime import datetime
+from django.db.models import Q
+from graphene.relay import PageInfo
+
+# Hard cap for the legacy, non-paginated list fields.
+MAX_LIST_SIZE = 500
+
+DEFAULT_PAGE_SIZE = 50
+MAX_PAGE_SIZE = 200
+
+ORDERING = ("created_at", "id")
+
+
+def encode_cursor(instance):
+    raw = f"{instance.created_at.isoformat()}|{instance.pk}"
+    return base64.urlsafe_b64encode(raw.encode()).decode()
+
+
+def decode_cursor(cursor):
+    try:
+        created_at, pk = base64.urlsafe_b64decode(
+            cursor.encode()).decode().split("|")
+        return datetime.fromisoformat(created_at), int(pk)
+    except (ValueError, UnicodeError):
+        raise Exception("Invalid cursor")
+
+
+def encode_offset_cursor(offset):
+    return base64.urlsafe_b64encode(f"offset|{offset}".encode()).decode()
+
+
+def decode_offset_cursor(cursor):
+    try:
+        prefix, offset = base64.urlsafe_b64decode(cursor.encode()).decode().split("|")
+        if prefix != "offset" or int(offset) < 0:
+            raise ValueError(prefix)
+        return int(offset)
+    except (ValueError, UnicodeError):
+        raise Exception("Invalid cursor")
+
+
+def page_size(first):
+    if first is None:
+        return DEFAULT_PAGE_SIZE
+    if first < 1:
+        raise Exception("`first` must be a positive integer")
+    return min(first, MAX_PAGE_SIZE)
+
+
+def after_cursor(after):
+    """
+    Keyset condition selecting the rows that follow the `after` cursor in
+    (created_at, id) order.
+    """
+    created_at, pk = decode_cursor(after)
+    return Q(created_at__gt=created_at) | Q(created_at=created_at, id__gt=pk)
+
+
+def paginate(queryset, connection_type, first=None, after=None):
+    """
+    Return one page of `queryset` as an instance of `connection_type`.
+
+    Rows are ordered by (created_at, id) and pages are selected with a
+    keyset condition on the last seen cursor, so a deep page costs the same
+    as the first one.
+    """
+    first = page_size(first)
+
+    queryset = queryset.order_by(*ORDERING)
+    page = queryset.filter(after_cursor(after)) if after else queryset
+    connection = page_connection(list(page[:first + 1]), connection_type, first, after)
+    # Kept for the lazily computed `totalCount`.
+    connection.iterable = queryset
+    return connection
+
+
+def page_connection(rows, connection_type, first, after=None):
+    """
+    Build the connection of one page from `rows`, the first `first` + 1
+    rows after the `after` cursor; the extra row tells there is a next page.
+    """
+    has_next_page = len(rows) > first
+    rows = rows[:first]
+
+    edges = [
+        connection_type.Edge(node=row, cursor=encode_cursor(row)) for row in rows
+    ]
+    connection = connection_type(
+        edges=edges,
+        page_info=PageInfo(
+            start_cursor=edges[0].cursor if edges else None,
+            end_cursor=edges[-1].cursor if edges else None,
+            has_next_page=has_next_page,
+            has_previous_page=bool(after),
+        ),
+    )
+    return connection
+
+
+def paginate_by_offset(queryset, connection_type, first=None, after=None, load_nodes=list):
+    """
+    Return one page of an already ordered `queryset` for orderings that
+    have no keyset, such as search rank. Cursors hold the row offset.
+
+    `load_nodes` turns the page's rows into the connection's nodes.
+    """
+    first = page_size(first)
+    offset = decode_offset_cursor(after) + 1 if after else 0
+
+    rows = list(queryset[offset:offset + first + 1])
+    has_next_page = len(rows) > first
+    nodes = load_nodes(rows[:first])
+
+    edges = [
+        connection_type.Edge(node=node, cursor=encode_offset_cursor(offset + index))
+        for index, node in enumerate(nodes)
+    ]
+    connection = connection_type(
+        edges=edges,
+        page_info=PageInfo(
+            start_cursor=edges[0].cursor if edges else None,
+            end_cursor=edges[-1].cursor if edges else None,
+            has_next_page=has_next_page,
+            has_previous_page=offset > 0,
+        ),
+    )
+    connection.iterable = queryset
+    return connection
@@ -0,0 +1,85 @@
+from datetime import date, datetime, timezone
+from django.conf import settings
+from django.db import connection, transaction
+from project_management.models import TaskComment
+
+# TaskComment rows are partitioned by month of created_at (UTC), with a
+# default partition for months that have no partition of their own.
+COMMENT_TABLE = TaskComment._meta.db_table
+DEFAULT_PARTITION = f"{COMMENT_TABLE}_default"
+COMMENT_COLUMNS = ", ".join(
+    field.column for field in TaskComment._meta.concrete_fields if not field.generated)
+
+
+def add_months(month, count):
+    index = month.year * 12 + month.month - 1 + count
+    return date(index // 12, index % 12 + 1, 1)
+
+
+def partition_name(month):
+    return f"{COMMENT_TABLE}_p{month:%Y_%m}"
+
+
+def comment_partitions():
+    """
+    Names of the partitions of the comments table, the default one included.
+    """
+    with connection.cursor() as cursor:
+        cursor.execute(
+            "SELECT child.relname FROM pg_inherits "
+            "JOIN pg_class AS child ON child.oid = pg_inherits.inhrelid "
+            "WHERE pg_inherits.inhparent = %s::regclass", [COMMENT_TABLE])
+        return {name for name, in cursor.fetchall()}
+
+
+def create_comment_partition(cursor, month):
+    """
+    Create the partition of one month, moving its rows out of the default
+    partition, where they would otherwise block the new partition.
+    """
+    start = datetime.combine(month, datetime.min.time(), timezone.utc)
+    end = datetime.combine(add_months(month, 1), datetime.min.time(), timezone.utc)
+    cursor.execute(
+        f"CREATE TEMPORARY TABLE moved_comments ON COMMIT DROP AS "
+        f"SELECT {COMMENT_COLUMNS} FROM {COMMENT_TABLE} WHERE false")
+    cursor.execute(f"""
+        WITH moved AS (
+            DELETE FROM {DEFAULT_PARTITION} WHERE created_at >= %s AND created_at < %s
+            RETURNING {COMMENT_COLUMNS}
+        )
+        INSERT INTO moved_comments SELECT * FROM moved
+    """, [start, end])
+    cursor.execute(
+        f"CREATE TABLE {partition_name(month)} PARTITION OF {COMMENT_TABLE} "
+        f"FOR VALUES FROM (%s) TO (%s)", [start, end])
+    cursor.execute(
+        f"INSERT INTO {COMMENT_TABLE} ({COMMENT_COLUMNS}) SELECT * FROM moved_comments")
+    moved = cursor.rowcount
+    cursor.execute("DROP TABLE moved_comments")
+    return moved
+
+
+def ensure_comment_partitions(months_ahead=None):
+    """
+    Create the monthly partitions of the current month, the next
+    `months_ahead` (COMMENT_PARTITION_MONTHS_AHEAD by default) and of any
+    month with rows in the default partition, such as imported history.
+    Returns `{partition name: rows moved out of the default partition}` for
+    the partitions created.
+    """
+    if months_ahead is None:
+        months_ahead = settings.COMMENT_PARTITION_MONTHS_AHEAD
+    current = datetime.now(timezone.utc).date().replace(day=1)
+    created = {}
+    with transaction.atomic(), connection.cursor() as cursor:
+        cursor.execute(
+            f"SELECT DISTINCT date_trunc('month', created_at AT TIME ZONE 'UTC')::date "
+            f"FROM {DEFAULT_PARTITION}")
+        months = {month for month, in cursor.fetchall()}
+        months.update(add_months(current, count) for count in range(months_ahead + 1))
+        existing = comment_partitions()
+        for month in sorted(months):
+            name = partition_name(month)
+            if name not in existing:
+                created[name] = create_comment_partition(cursor, month)
+    return created
@@ -1,9 +1,12 @@
 import graphene
-from project_management.schema.queries import ProjectQuery, TaskQuery
+from project_management.schema.queries import (
+    ProjectQuery, TaskQuery, TaskFeedQuery, SearchQuery, ChangeQuery,
+)
 from project_management.schema.mutations import ProjectMutation, TaskMutation
+from project_management.schema.subscriptions import TaskSubscription
 
 
-class Query(ProjectQuery, TaskQuery, graphene.ObjectType):
+class Query(ProjectQuery, TaskQuery, TaskFeedQuery, SearchQuery, ChangeQuery, graphene.ObjectType):
     pass
 
 
@@ -11,4 +14,8 @@ class Mutation(ProjectMutation, TaskMutation, graphene.ObjectType):
     pass
 
 
-schema = graphene.Schema(query=Query, mutation=Mutation)
+class Subscription(TaskSubscription, graphene.ObjectType):
+    pass
+
+
+schema = graphene.Schema(query=Query, mutation=Mutation, subscription=Subscription)
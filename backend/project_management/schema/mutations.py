@@ -1,11 +1,32 @@
 import graphene
+from django.db import transaction
+from django.utils import timezone
 from graphql_jwt.decorators import login_required
-from project_management.models import Project, Task, TaskComment
+from project_management.models import Change, Project, Task, TaskComment
 from accounts.models import CustomUser
-from project_management.schema.types import ProjectType, TaskType, TaskCommentType
-from project_management.helpers import get_project_for_user
+from project_management.schema.types import ProjectType, TaskType, TaskCommentType, BulkItemErrorType
+from project_management.helpers import get_project_for_user, get_task_for_user, get_comment_for_user
+from project_management.changes import record_changes
+from project_management.events import publish_comment_changed, publish_tasks_changed
+from project_management.loaders import get_loaders
+from project_management.stats import invalidate_project_stats
 from datetime import datetime
 
+# Upper bound on the number of items a single bulk mutation accepts
+MAX_BULK_SIZE = 1000
+TASK_STATUSES = {value for value, _ in Task.TASK_STATUS_CHOICES}
+
+
+def parse_due_date(value):
+    """
+    The due date of a task from a YYYY-MM-DD string: midnight in the
+    current time zone, or None for a blank string. Raises ValueError when
+    the string is not a date.
+    """
+    if not value or not value.strip():
+        return None
+    return timezone.make_aware(datetime.strptime(value, '%Y-%m-%d'))
+
 
 class CreateProject(graphene.Mutation):
     project = graphene.Field(ProjectType)
@@ -33,8 +54,9 @@ class CreateProject(graphene.Mutation):
             description=description or "",
             status=status,
             due_date=due_date_obj,
-            organization=user.organization,
+            organization_id=user.organization_id,
         )
+        record_changes(user.organization_id, Change.PROJECT, [project.pk])
         return CreateProject(project=project)
 
 
@@ -71,6 +93,7 @@ class UpdateProject(graphene.Mutation):
                 setattr(project, key, value)
         
         project.save()
+        record_changes(user.organization_id, Change.PROJECT, [project.pk])
         return UpdateProject(project=project)
 
 
@@ -92,21 +115,17 @@ class CreateTask(graphene.Mutation):
 
         assignee = None
         if assigneeEmail:
-            from accounts.models import CustomUser
             try:
                 assignee = CustomUser.objects.get(
-                    email=assigneeEmail, organization=user.organization
+                    email=assigneeEmail, organization_id=user.organization_id
                 )
             except CustomUser.DoesNotExist:
                 raise Exception("Assignee not found in your organization")
 
-        # Convert string date to DateTime object or None
-        due_date_obj = None
-        if dueDate and dueDate.strip():
-            try:
-                due_date_obj = datetime.strptime(dueDate, '%Y-%m-%d')
-            except ValueError:
-                raise Exception("Invalid date format. Use YYYY-MM-DD")
+        try:
+            due_date_obj = parse_due_date(dueDate)
+        except ValueError:
+            raise Exception("Invalid date format. Use YYYY-MM-DD")
 
         task = Task.objects.create(
             project=project,
@@ -116,6 +135,9 @@ class CreateTask(graphene.Mutation):
             assignee=assignee,
             due_date=due_date_obj,
         )
+        record_changes(user.organization_id, Change.TASK, [task.pk])
+        invalidate_project_stats([project.pk])
+        publish_tasks_changed(user.organization_id, [task])
         return CreateTask(task=task)
 
 
@@ -133,30 +155,23 @@ class UpdateTask(graphene.Mutation):
     @login_required
     def mutate(self, info, id, **kwargs):
         user = info.context.user
-        task = Task.objects.get(pk=id)
-        if task.project.organization != user.organization:
-            raise Exception("Unauthorized")
-        
+        task = get_task_for_user(user, id)
+
         # Handle assigneeEmail
         assigneeEmail = kwargs.pop("assigneeEmail", None)
         if assigneeEmail:
             try:
                 kwargs["assignee"] = CustomUser.objects.get(
-                    email=assigneeEmail, organization=user.organization)
+                    email=assigneeEmail, organization_id=user.organization_id)
             except CustomUser.DoesNotExist:
                 raise Exception("Assignee not found in your organization")
         
         # Handle dueDate conversion
         if 'dueDate' in kwargs:
-            dueDate = kwargs.pop('dueDate')
-            if dueDate and dueDate.strip():
-                try:
-                    due_date_obj = datetime.strptime(dueDate, '%Y-%m-%d')
-                    task.due_date = due_date_obj
-                except ValueError:
-                    raise Exception("Invalid date format. Use YYYY-MM-DD")
-            else:
-                task.due_date = None
+            try:
+                task.due_date = parse_due_date(kwargs.pop('dueDate'))
+            except ValueError:
+                raise Exception("Invalid date format. Use YYYY-MM-DD")
         
         # Handle other fields
         for key, value in kwargs.items():
@@ -164,6 +179,9 @@ class UpdateTask(graphene.Mutation):
                 setattr(task, key, value)
         
         task.save()
+        record_changes(user.organization_id, Change.TASK, [task.pk])
+        invalidate_project_stats([task.project_id])
+        publish_tasks_changed(user.organization_id, [task])
         return UpdateTask(task=task)
 
 
@@ -177,14 +195,14 @@ class AddTaskComment(graphene.Mutation):
     @login_required
     def mutate(self, info, task_id, content):
         user = info.context.user
-        task = Task.objects.get(pk=task_id)
-        if task.project.organization != user.organization:
-            raise Exception("Unauthorized")
+        task = get_task_for_user(user, task_id)
         comment = TaskComment.objects.create(
             task=task,
             content=content,
             author=user,
         )
+        record_changes(user.organization_id, Change.COMMENT, [comment.pk])
+        publish_comment_changed(user.organization_id, comment)
         return AddTaskComment(comment=comment)
 
 
@@ -198,14 +216,201 @@ class UpdateTaskComment(graphene.Mutation):
     @login_required
     def mutate(self, info, id, content):
         user = info.context.user
-        comment = TaskComment.objects.get(pk=id)
-        if comment.task.project.organization != user.organization:
-            raise Exception("Unauthorized")
+        comment = get_comment_for_user(user, id)
         comment.content = content
         comment.save()
+        record_changes(user.organization_id, Change.COMMENT, [comment.pk])
+        publish_comment_changed(user.organization_id, comment)
         return UpdateTaskComment(comment=comment)
 
 
+def check_bulk_size(items):
+    if len(items) > MAX_BULK_SIZE:
+        raise Exception(f"At most {MAX_BULK_SIZE} items per request")
+
+
+def get_org_users_by_email(user, emails):
+    """
+    Resolve assignee emails to users of the caller's organization in one query.
+    """
+    emails = {email for email in emails if email}
+    if not emails:
+        return {}
+    return {
+        assignee.email: assignee
+        for assignee in CustomUser.objects.filter(
+            email__in=emails, organization_id=user.organization_id)
+    }
+
+
+def parse_id(value):
+    return int(value) if str(value).isdigit() else None
+
+
+def get_org_tasks(user, ids):
+    """
+    Fetch the tasks among `ids` that belong to the caller's organization.
+    """
+    return {
+        task.pk: task
+        for task in Task.objects.filter(
+            pk__in={parse_id(task_id) for task_id in ids} - {None},
+            project__organization_id=user.organization_id,
+        )
+    }
+
+
+class BulkTaskInput(graphene.InputObjectType):
+    projectId = graphene.ID(required=True)
+    title = graphene.String(required=True)
+    description = graphene.String()
+    status = graphene.String()
+    assigneeEmail = graphene.String()
+    dueDate = graphene.String()
+
+
+class BulkCreateTasks(graphene.Mutation):
+    tasks = graphene.List(TaskType)
+    errors = graphene.List(BulkItemErrorType)
+
+    class Arguments:
+        tasks = graphene.List(graphene.NonNull(BulkTaskInput), required=True)
+
+    @login_required
+    def mutate(self, info, tasks):
+        user = info.context.user
+        check_bulk_size(tasks)
+
+        project_ids = set(
+            Project.objects.filter(
+                pk__in={parse_id(item.projectId) for item in tasks} - {None},
+                organization_id=user.organization_id,
+            ).values_list("pk", flat=True)
+        )
+        assignees = get_org_users_by_email(user, (item.assigneeEmail for item in tasks))
+
+        errors = []
+        new_tasks = []
+        for index, item in enumerate(tasks):
+            project_id = parse_id(item.projectId)
+            if project_id not in project_ids:
+                errors.append(BulkItemErrorType(index=index, message="Not found or unauthorized"))
+                continue
+            status = item.status or "TODO"
+            if status not in TASK_STATUSES:
+                errors.append(BulkItemErrorType(index=index, message=f"Invalid status '{status}'"))
+                continue
+            assignee = None
+            if item.assigneeEmail:
+                assignee = assignees.get(item.assigneeEmail)
+                if assignee is None:
+                    errors.append(BulkItemErrorType(
+                        index=index, message="Assignee not found in your organization"))
+                    continue
+            try:
+                due_date_obj = parse_due_date(item.dueDate)
+            except ValueError:
+                errors.append(BulkItemErrorType(
+                    index=index, message="Invalid date format. Use YYYY-MM-DD"))
+                continue
+            new_tasks.append(Task(
+                project_id=project_id,
+                title=item.title,
+                description=item.description or "",
+                status=status,
+                assignee=assignee,
+                due_date=due_date_obj,
+            ))
+
+        with transaction.atomic():
+            created = Task.objects.bulk_create(new_tasks)
+            record_changes(user.organization_id, Change.TASK, [task.pk for task in created])
+        invalidate_project_stats({task.project_id for task in created})
+        publish_tasks_changed(user.organization_id, created)
+        get_loaders(info).register_tasks(created)
+        return BulkCreateTasks(tasks=created, errors=errors)
+
+
+class BulkUpdateTaskStatus(graphene.Mutation):
+    tasks = graphene.List(TaskType)
+    errors = graphene.List(BulkItemErrorType)
+
+    class Arguments:
+        ids = graphene.List(graphene.NonNull(graphene.ID), required=True)
+        status = graphene.String(required=True)
+
+    @login_required
+    def mutate(self, info, ids, status):
+        user = info.context.user
+        check_bulk_size(ids)
+        if status not in TASK_STATUSES:
+            raise Exception(f"Invalid status '{status}'")
+
+        found = get_org_tasks(user, ids)
+        # bulk_update() does not apply auto_now.
+        now = timezone.now()
+        errors = []
+        updated = []
+        for index, task_id in enumerate(ids):
+            task = found.get(parse_id(task_id))
+            if task is None:
+                errors.append(BulkItemErrorType(index=index, message="Not found or unauthorized"))
+                continue
+            task.status = status
+            task.updated_at = now
+            updated.append(task)
+
+        with transaction.atomic():
+            Task.objects.bulk_update(updated, ["status", "updated_at"])
+            record_changes(user.organization_id, Change.TASK, [task.pk for task in updated])
+        invalidate_project_stats({task.project_id for task in updated})
+        publish_tasks_changed(user.organization_id, updated)
+        get_loaders(info).register_tasks(updated)
+        return BulkUpdateTaskStatus(tasks=updated, errors=errors)
+
+
+class BulkAssignTasks(graphene.Mutation):
+    tasks = graphene.List(TaskType)
+    errors = graphene.List(BulkItemErrorType)
+
+    class Arguments:
+        ids = graphene.List(graphene.NonNull(graphene.ID), required=True)
+        assigneeEmail = graphene.String()
+
+    @login_required
+    def mutate(self, info, ids, assigneeEmail=None):
+        user = info.context.user
+        check_bulk_size(ids)
+
+        assignee = None
+        if assigneeEmail:
+            assignee = get_org_users_by_email(user, [assigneeEmail]).get(assigneeEmail)
+            if assignee is None:
+                raise Exception("Assignee not found in your organization")
+
+        found = get_org_tasks(user, ids)
+        # bulk_update() does not apply auto_now.
+        now = timezone.now()
+        errors = []
+        updated = []
+        for index, task_id in enumerate(ids):
+            task = found.get(parse_id(task_id))
+            if task is None:
+                errors.append(BulkItemErrorType(index=index, message="Not found or unauthorized"))
+                continue
+            task.assignee = assignee
+            task.updated_at = now
+            updated.append(task)
+
+        with transaction.atomic():
+            Task.objects.bulk_update(updated, ["assignee", "updated_at"])
+            record_changes(user.organization_id, Change.TASK, [task.pk for task in updated])
+        invalidate_project_stats({task.project_id for task in updated})
+        publish_tasks_changed(user.organization_id, updated)
+        get_loaders(info).register_tasks(updated)
+        return BulkAssignTasks(tasks=updated, errors=errors)
+
+
 # Aggregated mutations
 class ProjectMutation(graphene.ObjectType):
     create_project = CreateProject.Field()
@@ -217,3 +422,6 @@ class TaskMutation(graphene.ObjectType):
     update_task = UpdateTask.Field()
     add_task_comment = AddTaskComment.Field()
     update_task_comment = UpdateTaskComment.Field()
+    bulk_create_tasks = BulkCreateTasks.Field()
+    bulk_update_task_status = BulkUpdateTaskStatus.Field()
+    bulk_assign_tasks = BulkAssignTasks.Field()
@@ -1,55 +1,318 @@
 import graphene
+from asgiref.sync import sync_to_async
 from graphql_jwt.decorators import login_required
-from project_management.models import Project, Task, TaskComment
-from project_management.schema.types import ProjectType, TaskType, TaskCommentType, ProjectStatsType
-from project_management.helpers import get_project_for_user, get_task_for_user
+from backend.async_execution import async_capable, in_event_loop
+from backend.response_cache import user_scoped
+from project_management.changes import get_changes
+from project_management.models import Change, Project, Task, TaskComment
+from project_management.schema.types import (
+    ProjectType, TaskType, TaskCommentType, ProjectStatsType, OrganizationStatsType,
+    ProjectConnection, TaskConnection, TaskCommentConnection,
+    ChangesType, DeletedRowType, ENTITY_TYPENAMES, SearchHitConnection,
+    ProjectFilterInput, TaskFilterInput, page_arguments, project_list_arguments,
+    resolve_page, sort_value, task_list_arguments,
+)
+from project_management.filters import (
+    PROJECT_ORDERINGS, TASK_ORDERINGS, project_conditions, task_conditions,
+)
+from project_management.helpers import (
+    get_project_for_user, get_task_for_user, aget_project_for_user, aget_task_for_user,
+)
+from project_management.loaders import get_loaders
+from project_management.pagination import MAX_LIST_SIZE, paginate_by_offset
+from project_management.search import load_hits, parse_query, search_queryset
+from project_management.stats import get_project_stats, rollup_stats
+
+
+def project_list(user, filter=None, sort=None):
+    """
+    The organization's projects matching `filter`, as one capped query.
+    """
+    return (
+        Project.objects.filter(project_conditions(filter), organization_id=user.organization_id)
+        .order_by(*PROJECT_ORDERINGS[sort or "CREATED_AT"])[:MAX_LIST_SIZE]
+    )
+
+
+def task_list(user, project=None, filter=None, sort=None):
+    """
+    The tasks of `project`, or of the whole organization, matching
+    `filter`, as one capped query.
+    """
+    tasks = Task.objects.filter(task_conditions(filter))
+    if project is not None:
+        tasks = tasks.filter(project=project)
+    else:
+        tasks = tasks.filter(project__organization_id=user.organization_id)
+    return tasks.order_by(*TASK_ORDERINGS[sort or "CREATED_AT"])[:MAX_LIST_SIZE]
+
+
+# Async resolvers, used when the schema is executed by the async view
+async def aresolve_projects(info, filter, sort):
+    projects = [project async for project in project_list(info.context.user, filter, sort)]
+    get_loaders(info).register_projects(projects)
+    return projects
+
+
+async def aresolve_project(info, id):
+    project = await aget_project_for_user(info.context.user, id)
+    get_loaders(info).register_projects([project])
+    return project
+
+
+async def aresolve_project_stats(info, project_id):
+    project = await aget_project_for_user(info.context.user, project_id)
+    stats = await sync_to_async(get_project_stats)([project.pk])
+    return stats[project.pk]
+
+
+async def aresolve_tasks(info, project_id, filter, sort):
+    user = info.context.user
+    loaders = get_loaders(info)
+    if project_id is None:
+        tasks = [task async for task in task_list(user, filter=filter, sort=sort)]
+        loaders.register_tasks(tasks)
+        return tasks
+    project = await aget_project_for_user(user, project_id)
+    loaders.register_projects([project])
+    return await loaders.tasks_by_project_matching(filter, sort).aload(project.pk)
+
+
+async def aresolve_task(info, id):
+    task = await aget_task_for_user(info.context.user, id)
+    get_loaders(info).register_tasks([task])
+    return task
+
+
+async def aresolve_task_comments(info, task_id):
+    task = await aget_task_for_user(info.context.user, task_id)
+    loaders = get_loaders(info)
+    loaders.register_tasks([task])
+    return await loaders.comments_by_task.aload(task.pk)
 
 
 class ProjectQuery(graphene.ObjectType):
-    projects = graphene.List(ProjectType)
+    projects = graphene.List(ProjectType, **project_list_arguments())
+    projects_connection = graphene.Field(
+        ProjectConnection, filter=ProjectFilterInput(), **page_arguments())
     project = graphene.Field(ProjectType, id=graphene.ID(required=True))
     project_stats = graphene.Field(
         ProjectStatsType, project_id=graphene.ID(required=True)
     )
+    projects_stats = graphene.List(
+        ProjectStatsType, ids=graphene.List(graphene.NonNull(graphene.ID), required=True)
+    )
+    organization_stats = graphene.Field(OrganizationStatsType)
 
+    @async_capable
     @login_required
-    def resolve_projects(self, info):
+    def resolve_projects(self, info, filter=None, sort=None):
+        sort = sort_value(sort)
+        if in_event_loop():
+            return aresolve_projects(info, filter, sort)
+        projects = list(project_list(info.context.user, filter, sort))
+        get_loaders(info).register_projects(projects)
+        return projects
+
+    @login_required
+    def resolve_projects_connection(self, info, filter=None, first=None, after=None):
         user = info.context.user
-        return Project.objects.filter(organization=user.organization)
+        return resolve_page(
+            info, Project.objects.filter(
+                project_conditions(filter), organization_id=user.organization_id),
+            ProjectConnection, first=first, after=after)
 
+    @async_capable
     @login_required
     def resolve_project(self, info, id):
-        return get_project_for_user(info.context.user, id)
+        if in_event_loop():
+            return aresolve_project(info, id)
+        project = get_project_for_user(info.context.user, id)
+        get_loaders(info).register_projects([project])
+        return project
 
+    @async_capable
     @login_required
     def resolve_project_stats(self, info, project_id):
+        if in_event_loop():
+            return aresolve_project_stats(info, project_id)
         project = get_project_for_user(info.context.user, project_id)
-        total = project.tasks.count()
-        done = project.tasks.filter(status="DONE").count()
-        rate = (done / total * 100) if total > 0 else 0
-        return ProjectStatsType(
-            total_tasks=total,
-            completed_tasks=done,
-            completion_rate=rate
+        return get_project_stats([project.pk])[project.pk]
+
+    @login_required
+    def resolve_projects_stats(self, info, ids):
+        user = info.context.user
+        project_ids = list(
+            Project.objects.filter(pk__in=ids, organization_id=user.organization_id)
+            .values_list("pk", flat=True)
         )
+        stats = get_project_stats(project_ids)
+        return [stats[project_id] for project_id in sorted(project_ids)]
+
+    @login_required
+    def resolve_organization_stats(self, info):
+        user = info.context.user
+        project_ids = list(
+            Project.objects.filter(organization_id=user.organization_id)
+            .values_list("pk", flat=True)
+        )
+        return rollup_stats(list(get_project_stats(project_ids).values()))
 
 
 class TaskQuery(graphene.ObjectType):
-    tasks = graphene.List(TaskType, project_id=graphene.ID(required=True))
+    tasks = graphene.List(
+        TaskType, project_id=graphene.ID(), **task_list_arguments(),
+        description="Tasks of a project, or of every project of the organization "
+                    "when `projectId` is omitted.")
+    tasks_connection = graphene.Field(
+        TaskConnection, project_id=graphene.ID(required=True), filter=TaskFilterInput(),
+        **page_arguments())
     task = graphene.Field(TaskType, id=graphene.ID(required=True))
     task_comments = graphene.List(
         TaskCommentType, task_id=graphene.ID(required=True))
+    task_comments_connection = graphene.Field(
+        TaskCommentConnection, task_id=graphene.ID(required=True), **page_arguments())
+
+    @async_capable
+    @login_required
+    def resolve_tasks(self, info, project_id=None, filter=None, sort=None):
+        sort = sort_value(sort)
+        if in_event_loop():
+            return aresolve_tasks(info, project_id, filter, sort)
+        user = info.context.user
+        loaders = get_loaders(info)
+        if project_id is None:
+            tasks = list(task_list(user, filter=filter, sort=sort))
+            loaders.register_tasks(tasks)
+            return tasks
+        project = get_project_for_user(user, project_id)
+        loaders.register_projects([project])
+        return loaders.tasks_by_project_matching(filter, sort).load(project.pk)
 
     @login_required
-    def resolve_tasks(self, info, project_id):
+    def resolve_tasks_connection(self, info, project_id, filter=None, first=None, after=None):
         project = get_project_for_user(info.context.user, project_id)
-        return Task.objects.filter(project=project)
+        return resolve_page(info, Task.objects.filter(task_conditions(filter), project=project),
+                            TaskConnection, first=first, after=after)
 
+    @async_capable
     @login_required
     def resolve_task(self, info, id):
-        return get_task_for_user(info.context.user, id)
+        if in_event_loop():
+            return aresolve_task(info, id)
+        task = get_task_for_user(info.context.user, id)
+        get_loaders(info).register_tasks([task])
+        return task
 
+    @async_capable
     @login_required
     def resolve_task_comments(self, info, task_id):
+        if in_event_loop():
+            return aresolve_task_comments(info, task_id)
         task = get_task_for_user(info.context.user, task_id)
-        return TaskComment.objects.filter(task=task)
+        loaders = get_loaders(info)
+        loaders.register_tasks([task])
+        return loaders.comments_by_task.load(task.pk)
+
+    @login_required
+    def resolve_task_comments_connection(self, info, task_id, first=None, after=None):
+        task = get_task_for_user(info.context.user, task_id)
+        return resolve_page(info, TaskComment.objects.filter(task=task),
+                            TaskCommentConnection, first=first, after=after)
+
+
+def resolve_task_feed(info, tasks, filter=None, first=None, after=None):
+    """
+    One page of `tasks` across projects, with each task's project fetched
+    in the same query.
+    """
+    connection = resolve_page(
+        info, tasks.filter(task_conditions(filter)).select_related("project"),
+        TaskConnection, first=first, after=after)
+    get_loaders(info).register_projects([edge.node.project for edge in connection.edges])
+    return connection
+
+
+class TaskFeedQuery(graphene.ObjectType):
+    my_tasks = graphene.Field(
+        TaskConnection, filter=TaskFilterInput(), **page_arguments(),
+        description="Tasks assigned to the current user in any project of the organization. "
+                    "Tasks of archived projects are left out.")
+    org_tasks = graphene.Field(
+        TaskConnection, filter=TaskFilterInput(), **page_arguments(),
+        description="Tasks of every project of the organization. Tasks of archived "
+                    "projects are left out.")
+
+    @user_scoped
+    @login_required
+    def resolve_my_tasks(self, info, filter=None, first=None, after=None):
+        user = info.context.user
+        tasks = Task.objects.filter(
+            assignee=user, project__organization_id=user.organization_id)
+        return resolve_task_feed(info, tasks, filter, first=first, after=after)
+
+    @login_required
+    def resolve_org_tasks(self, info, filter=None, first=None, after=None):
+        user = info.context.user
+        tasks = Task.objects.filter(project__organization_id=user.organization_id)
+        return resolve_task_feed(info, tasks, filter, first=first, after=after)
+
+
+class SearchQuery(graphene.ObjectType):
+    search = graphene.Field(
+        SearchHitConnection,
+        query=graphene.String(required=True),
+        project_id=graphene.ID(),
+        status=graphene.String(),
+        **page_arguments(),
+        description="Tasks and comments matching a search. Those of archived projects are "
+                    "not indexed until the project is restored.",
+    )
+
+    @login_required
+    def resolve_search(self, info, query, project_id=None, status=None, first=None, after=None):
+        search_query = parse_query(query)
+        queryset = search_queryset(
+            info.context.user.organization_id, search_query,
+            project_id=project_id, status=status)
+
+        def load_nodes(rows):
+            hits = load_hits(rows, search_query)
+            loaders = get_loaders(info)
+            loaders.register_tasks([hit.task for hit in hits if hit.task is not None])
+            loaders.register_comments([hit.comment for hit in hits if hit.comment is not None])
+            return hits
+
+        return paginate_by_offset(
+            queryset, SearchHitConnection, first=first, after=after, load_nodes=load_nodes)
+
+
+class ChangeQuery(graphene.ObjectType):
+    changes_since = graphene.Field(
+        ChangesType, cursor=graphene.String(),
+        description="Rows changed after the cursor. Archiving and restoring a project are not "
+                    "changes: its tasks and comments keep their ids and content.")
+
+    @login_required
+    def resolve_changes_since(self, info, cursor=None):
+        changes = get_changes(info.context.user.organization_id, cursor)
+        upserted = changes["upserted"]
+        projects = upserted.get(Change.PROJECT, [])
+        tasks = upserted.get(Change.TASK, [])
+        comments = upserted.get(Change.COMMENT, [])
+
+        loaders = get_loaders(info)
+        loaders.register_projects(projects)
+        loaders.register_tasks(tasks)
+        loaders.register_comments(comments)
+        return ChangesType(
+            cursor=changes["cursor"],
+            has_more=changes["has_more"],
+            projects=projects,
+            tasks=tasks,
+            comments=comments,
+            deleted=[
+                DeletedRowType(typename=ENTITY_TYPENAMES[entity], id=object_id)
+                for entity, object_id in changes["deleted"]
+            ],
+        )
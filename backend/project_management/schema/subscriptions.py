@@ -0,0 +1,68 @@
+import graphene
+from asgiref.sync import sync_to_async
+from graphql_jwt.decorators import login_required
+from backend.broker import broker
+from project_management.events import COMMENT_CHANGED, TASK_CHANGED
+from project_management.helpers import aget_project_for_user, aget_task_for_user
+from project_management.models import Task, TaskComment
+from project_management.schema.types import ProjectStatsType, TaskCommentType, TaskType
+from project_management.stats import get_project_stats
+
+
+# Event streams, started once the subscription's arguments are authorized
+async def task_changed_events(organization_id, project_id):
+    async for event in broker.subscribe(organization_id):
+        if event["type"] != TASK_CHANGED or event["project_id"] != project_id:
+            continue
+        tasks = Task.objects.filter(pk__in=event["task_ids"], project_id=project_id)
+        async for task in tasks.order_by("id"):
+            yield task
+
+
+async def comment_added_events(organization_id, task_id):
+    async for event in broker.subscribe(organization_id):
+        if event["type"] != COMMENT_CHANGED or event["task_id"] != task_id:
+            continue
+        comment = await TaskComment.objects.filter(
+            pk=event["comment_id"], task_id=task_id).afirst()
+        if comment is not None:
+            yield comment
+
+
+async def project_stats_events(organization_id, project_id):
+    async for event in broker.subscribe(organization_id):
+        if event["type"] != TASK_CHANGED or project_id not in (None, event["project_id"]):
+            continue
+        stats = await sync_to_async(get_project_stats)([event["project_id"]])
+        yield stats[event["project_id"]]
+
+
+class TaskSubscription(graphene.ObjectType):
+    task_changed = graphene.Field(
+        TaskType, project_id=graphene.ID(required=True),
+        description="Tasks of a project as they are created or updated.")
+    comment_added = graphene.Field(
+        TaskCommentType, task_id=graphene.ID(required=True),
+        description="Comments of a task as they are added or edited.")
+    project_stats_changed = graphene.Field(
+        ProjectStatsType, project_id=graphene.ID(),
+        description="Statistics of a project, or of any project of the "
+                    "organization, each time its tasks change.")
+
+    @login_required
+    async def subscribe_task_changed(root, info, project_id):
+        project = await aget_project_for_user(info.context.user, project_id)
+        return task_changed_events(project.organization_id, project.pk)
+
+    @login_required
+    async def subscribe_comment_added(root, info, task_id):
+        user = info.context.user
+        task = await aget_task_for_user(user, task_id)
+        return comment_added_events(user.organization_id, task.pk)
+
+    @login_required
+    async def subscribe_project_stats_changed(root, info, project_id=None):
+        user = info.context.user
+        if project_id is not None:
+            project_id = (await aget_project_for_user(user, project_id)).pk
+        return project_stats_events(user.organization_id, project_id)
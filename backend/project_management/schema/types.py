@@ -1,42 +1,265 @@
+import inspect
+from functools import partial
 import graphene
+from asgiref.sync import sync_to_async
 from graphene_django import DjangoObjectType
-from project_management.models import Project, Task, TaskComment
+from project_management.models import Change, Project, Task, TaskComment
+from project_management.loaders import get_loaders
+from backend.async_execution import async_capable, in_event_loop
+from project_management.filters import PROJECT_ORDERINGS, TASK_ORDERINGS
+from project_management.pagination import page_connection, page_size, paginate
+
+
+class CountableConnection(graphene.relay.Connection):
+    class Meta:
+        abstract = True
+
+    total_count = graphene.Int()
+
+    @async_capable
+    def resolve_total_count(self, info):
+        # Nested connections count through a loader, others their queryset.
+        load_count = getattr(self, "load_count", None)
+        if load_count is not None:
+            return load_count()
+        if in_event_loop():
+            return sync_to_async(self.iterable.count)()
+        return self.iterable.count()
+
+
+def page_arguments():
+    return {"first": graphene.Int(), "after": graphene.String()}
+
+
+TaskSort = graphene.Enum("TaskSort", [(name, name) for name in TASK_ORDERINGS])
+ProjectSort = graphene.Enum("ProjectSort", [(name, name) for name in PROJECT_ORDERINGS])
+
+
+def sort_value(sort):
+    return sort.value if sort is not None else None
+
+
+class TaskFilterInput(graphene.InputObjectType):
+    status_in = graphene.List(graphene.NonNull(graphene.String))
+    assignee_in = graphene.List(graphene.NonNull(graphene.ID))
+    unassigned = graphene.Boolean()
+    due_after = graphene.DateTime()
+    due_before = graphene.DateTime()
+    overdue = graphene.Boolean(
+        description="Due in the past and not DONE (or the opposite when false).")
+    created_after = graphene.DateTime()
+    created_before = graphene.DateTime()
+
+
+class ProjectFilterInput(graphene.InputObjectType):
+    status_in = graphene.List(graphene.NonNull(graphene.String))
+    due_after = graphene.Date()
+    due_before = graphene.Date()
+    overdue = graphene.Boolean(
+        description="Due before today and not COMPLETED (or the opposite when false).")
+    created_after = graphene.DateTime()
+    created_before = graphene.DateTime()
+
+
+def task_list_arguments():
+    return {"filter": TaskFilterInput(), "sort": TaskSort()}
+
+
+def project_list_arguments():
+    return {"filter": ProjectFilterInput(), "sort": ProjectSort()}
+
+
+def resolve_page(info, queryset, connection_type, first=None, after=None):
+    connection = paginate(queryset, connection_type, first=first, after=after)
+    nodes = [edge.node for edge in connection.edges]
+    loaders = get_loaders(info)
+    register = {
+        Project: loaders.register_projects,
+        Task: loaders.register_tasks,
+        TaskComment: loaders.register_comments,
+    }[queryset.model]
+    register(nodes)
+    return connection
+
+
+def loaded_page(pages, counts, parent_id, connection_type, first=None, after=None):
+    """
+    The connection of one parent's page, from loaders of pages and row
+    counts per parent, so that sibling connections share their queries.
+    """
+    def connection(rows):
+        connection = page_connection(rows, connection_type, page_size(first), after)
+        connection.load_count = partial(counts.load, parent_id)
+        return connection
+
+    rows = pages.load(parent_id)
+    if inspect.isawaitable(rows):
+        async def aconnection():
+            return connection(await rows)
+        return aconnection()
+    return connection(rows)
 
 
 class ProjectType(DjangoObjectType):
     class Meta:
         model = Project
-        fields = ("id", "name", "description", "tasks", "status", "due_date", "created_at")
+        fields = ("id", "name", "description", "tasks", "status", "due_date",
+                  "created_at", "updated_at", "archived_at")
+
+    tasks = graphene.List(
+        lambda: TaskType, **task_list_arguments(),
+        description="Empty while the project is archived: fetch it with `project` to restore it.")
+    tasks_connection = graphene.Field(
+        lambda: TaskConnection, filter=TaskFilterInput(), **page_arguments(),
+        description="Empty while the project is archived, like `tasks`.")
+    archived_at = graphene.DateTime(
+        description="When the project's tasks and comments were moved to archive storage, "
+                    "null while they are in the live tables.")
 
-    tasks = graphene.List(lambda: TaskType)
+    @async_capable
+    def resolve_tasks(self, info, filter=None, sort=None):
+        loader = get_loaders(info).tasks_by_project_matching(filter, sort_value(sort))
+        return loader.load(self.pk)
 
-    def resolve_tasks(self, info):
-        return self.tasks.all()
+    @async_capable
+    def resolve_tasks_connection(self, info, filter=None, first=None, after=None):
+        loaders = get_loaders(info)
+        return loaded_page(
+            loaders.task_page_by_project(filter, first, after),
+            loaders.task_count_by_project(filter),
+            self.pk, TaskConnection, first=first, after=after)
 
 
 class TaskType(DjangoObjectType):
     class Meta:
         model = Task
         fields = ("id", "title", "description", "status", "assignee",
-                  "due_date", "created_at", "comments", "project")
+                  "due_date", "created_at", "updated_at", "comments", "project")
 
     comments = graphene.List(lambda: TaskCommentType)
+    comments_connection = graphene.Field(
+        lambda: TaskCommentConnection, **page_arguments())
     project = graphene.Field(lambda: ProjectType)
 
+    @async_capable
     def resolve_comments(self, info):
-        return self.comments.all()
+        return get_loaders(info).comments_by_task.load(self.pk)
+
+    @async_capable
+    def resolve_comments_connection(self, info, first=None, after=None):
+        loaders = get_loaders(info)
+        return loaded_page(
+            loaders.comment_page_by_task(first, after), loaders.comment_count_by_task(),
+            self.pk, TaskCommentConnection, first=first, after=after)
+
+    @async_capable
+    def resolve_project(self, info):
+        return get_loaders(info).project.load(self.project_id)
+
+    @async_capable
+    def resolve_assignee(self, info):
+        return get_loaders(info).user.load(self.assignee_id)
 
 
 class TaskCommentType(DjangoObjectType):
     class Meta:
         model = TaskComment
         fields = ("id", "content", "author",
-                  "created_at", "task")
+                  "created_at", "updated_at", "task")
 
     task = graphene.Field(lambda: TaskType)
 
+    @async_capable
+    def resolve_task(self, info):
+        return get_loaders(info).task.load(self.task_id)
+
+    @async_capable
+    def resolve_author(self, info):
+        return get_loaders(info).user.load(self.author_id)
+
+
+class ProjectConnection(CountableConnection):
+    class Meta:
+        node = ProjectType
+
+
+class TaskConnection(CountableConnection):
+    class Meta:
+        node = TaskType
+
+
+class TaskCommentConnection(CountableConnection):
+    class Meta:
+        node = TaskCommentType
+
+
+class SearchHitType(graphene.ObjectType):
+    kind = graphene.String(description="TASK or COMMENT.")
+    rank = graphene.Float()
+    headline = graphene.String(
+        description="Matching text as HTML: escaped, with matches wrapped in "
+                    "<mark></mark>.")
+    task = graphene.Field(TaskType, description="The task, or the commented task.")
+    comment = graphene.Field(TaskCommentType)
+
+    @async_capable
+    def resolve_task(self, info):
+        if self.task is not None:
+            return self.task
+        return get_loaders(info).task.load(self.comment.task_id)
+
+
+class SearchHitConnection(CountableConnection):
+    class Meta:
+        node = SearchHitType
+
+
+class DeletedRowType(graphene.ObjectType):
+    typename = graphene.String()
+    id = graphene.ID()
+
+
+class ChangesType(graphene.ObjectType):
+    cursor = graphene.String()
+    has_more = graphene.Boolean()
+    projects = graphene.List(ProjectType)
+    tasks = graphene.List(TaskType)
+    comments = graphene.List(TaskCommentType)
+    deleted = graphene.List(DeletedRowType)
+
+
+# GraphQL type of each change log entity, for clients evicting deleted rows
+ENTITY_TYPENAMES = {
+    Change.PROJECT: ProjectType._meta.name,
+    Change.TASK: TaskType._meta.name,
+    Change.COMMENT: TaskCommentType._meta.name,
+}
+
+
+class BulkItemErrorType(graphene.ObjectType):
+    index = graphene.Int()
+    message = graphene.String()
+
+
+class AssigneeStatsType(graphene.ObjectType):
+    assignee_email = graphene.String()
+    total_tasks = graphene.Int()
+    todo_tasks = graphene.Int()
+    in_progress_tasks = graphene.Int()
+    completed_tasks = graphene.Int()
+    overdue_tasks = graphene.Int()
+
 
 class ProjectStatsType(graphene.ObjectType):
+    project_id = graphene.ID()
     total_tasks = graphene.Int()
+    todo_tasks = graphene.Int()
+    in_progress_tasks = graphene.Int()
     completed_tasks = graphene.Int()
+    overdue_tasks = graphene.Int()
     completion_rate = graphene.Float()
+    by_assignee = graphene.List(AssigneeStatsType)
+
+
+class OrganizationStatsType(ProjectStatsType):
+    project_count = graphene.Int()
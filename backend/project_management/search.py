@@ -0,0 +1,105 @@
+from django.contrib.postgres.search import SearchHeadline, SearchQuery, SearchRank
+from django.db.models import F, TextField, Value
+from django.db.models.functions import Concat, Replace
+from project_management.models import SEARCH_CONFIG, Task, TaskComment
+
+TASK = "TASK"
+COMMENT = "COMMENT"
+
+# Matched words are wrapped in these markers in headlines. The text around
+# them is HTML escaped first (see escaped_html), so headlines are safe HTML.
+HEADLINE_OPTIONS = {
+    "start_sel": "<mark>",
+    "stop_sel": "</mark>",
+    "max_fragments": 2,
+    "fragment_delimiter": " … ",
+}
+
+
+# "&" first, so the entities of the other characters are left alone
+HTML_ESCAPES = (("&", "&amp;"), ("<", "&lt;"), (">", "&gt;"))
+
+
+def escaped_html(expression):
+    """
+    `expression` with the characters that start HTML markup escaped, in SQL.
+    """
+    for character, entity in HTML_ESCAPES:
+        expression = Replace(expression, Value(character), Value(entity))
+    return expression
+
+
+class SearchHit:
+    def __init__(self, kind, rank, task=None, comment=None, headline=None):
+        self.kind = kind
+        self.rank = rank
+        self.task = task
+        self.comment = comment
+        self.headline = headline
+
+
+def parse_query(text):
+    text = (text or "").strip()
+    if not text:
+        raise Exception("Search query must not be empty")
+    return SearchQuery(text, search_type="websearch", config=SEARCH_CONFIG)
+
+
+def search_queryset(organization_id, query, project_id=None, status=None):
+    """
+    `(kind, id, rank)` rows of the tasks and comments matching `query`,
+    best match first.
+
+    Both sides are matched through their GIN indexed search vector and
+    scoped to the organization in the same statement.
+    """
+    tasks = Task.objects.filter(
+        project__organization_id=organization_id, search_vector=query)
+    comments = TaskComment.objects.filter(
+        task__project__organization_id=organization_id, search_vector=query)
+    if project_id is not None:
+        tasks = tasks.filter(project_id=project_id)
+        comments = comments.filter(task__project_id=project_id)
+    if status is not None:
+        tasks = tasks.filter(status=status)
+        comments = comments.filter(task__status=status)
+
+    tasks = tasks.annotate(
+        kind=Value(TASK), rank=SearchRank(F("search_vector"), query),
+    ).values("kind", "id", "rank")
+    comments = comments.annotate(
+        kind=Value(COMMENT), rank=SearchRank(F("search_vector"), query),
+    ).values("kind", "id", "rank")
+    return tasks.union(comments, all=True).order_by("-rank", "kind", "id")
+
+
+def load_hits(rows, query):
+    """
+    Turn a page of search rows into SearchHits, fetching each kind of row
+    with its highlighted headline in one query.
+    """
+    task_ids = [row["id"] for row in rows if row["kind"] == TASK]
+    comment_ids = [row["id"] for row in rows if row["kind"] == COMMENT]
+
+    tasks = Task.objects.filter(pk__in=task_ids).annotate(
+        headline=SearchHeadline(
+            escaped_html(
+                Concat("title", Value("\n"), "description", output_field=TextField())),
+            query,
+            config=SEARCH_CONFIG, **HEADLINE_OPTIONS),
+    ).in_bulk() if task_ids else {}
+    comments = TaskComment.objects.filter(pk__in=comment_ids).annotate(
+        headline=SearchHeadline(
+            escaped_html(F("content")), query, config=SEARCH_CONFIG, **HEADLINE_OPTIONS),
+    ).in_bulk() if comment_ids else {}
+
+    hits = []
+    for row in rows:
+        if row["kind"] == TASK and row["id"] in tasks:
+            task = tasks[row["id"]]
+            hits.append(SearchHit(TASK, row["rank"], task=task, headline=task.headline))
+        elif row["kind"] == COMMENT and row["id"] in comments:
+            comment = comments[row["id"]]
+            hits.append(SearchHit(
+                COMMENT, row["rank"], comment=comment, headline=comment.headline))
+    return hits
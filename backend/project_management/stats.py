@@ -0,0 +1,132 @@
+from collections import defaultdict
+from django.conf import settings
+from django.core.cache import cache
+from django.db.models import Count, Q
+from django.utils import timezone
+from backend.metrics import record_cache_lookups
+from project_management.models import ProjectArchive, Task
+
+COUNTERS = ("total_tasks", "todo_tasks", "in_progress_tasks",
+            "completed_tasks", "overdue_tasks")
+
+
+def _cache_key(project_id):
+    return f"project_management:stats:{project_id}"
+
+
+def _empty_counters():
+    return dict.fromkeys(COUNTERS, 0)
+
+
+def _completion_rate(stats):
+    total = stats["total_tasks"]
+    return (stats["completed_tasks"] / total * 100) if total > 0 else 0
+
+
+def stats_queryset(project_ids):
+    """
+    Per (project, assignee) conditional counts for the given projects.
+    """
+    now = timezone.now()
+    return (
+        Task.objects.filter(project_id__in=project_ids)
+        .values("project_id", "assignee__email")
+        .annotate(
+            total_tasks=Count("id"),
+            todo_tasks=Count("id", filter=Q(status="TODO")),
+            in_progress_tasks=Count("id", filter=Q(status="IN_PROGRESS")),
+            completed_tasks=Count("id", filter=Q(status="DONE")),
+            overdue_tasks=Count(
+                "id", filter=Q(due_date__lt=now) & ~Q(status="DONE")),
+        )
+        .order_by()
+    )
+
+
+def compute_project_stats(project_ids):
+    """
+    Compute task statistics for many projects with one aggregate query.
+
+    Rows are grouped by (project, assignee) using conditional counts, then
+    rolled up per project so the per-assignee breakdown comes for free.
+    """
+    rows = stats_queryset(project_ids)
+
+    stats = {
+        project_id: {"project_id": project_id, "by_assignee": [], **_empty_counters()}
+        for project_id in project_ids
+    }
+    for row in rows:
+        project_stats = stats[row["project_id"]]
+        counters = {name: row[name] for name in COUNTERS}
+        for name, value in counters.items():
+            project_stats[name] += value
+        if row["assignee__email"] is not None:
+            project_stats["by_assignee"].append(
+                {"assignee_email": row["assignee__email"], **counters})
+
+    for project_stats in stats.values():
+        project_stats["by_assignee"].sort(key=lambda item: item["assignee_email"])
+        project_stats["completion_rate"] = _completion_rate(project_stats)
+
+    # Archived projects have no task rows left: report the stats saved with
+    # their archive.
+    without_tasks = [project_id for project_id, project_stats in stats.items()
+                     if not project_stats["total_tasks"]]
+    if without_tasks:
+        stats.update(
+            ProjectArchive.objects.filter(project_id__in=without_tasks)
+            .values_list("project_id", "stats"))
+    return stats
+
+
+def get_project_stats(project_ids):
+    """
+    Return stats for each project id, served from the cache when possible.
+    """
+    keys = {project_id: _cache_key(project_id) for project_id in project_ids}
+    cached = cache.get_many(keys.values())
+    record_cache_lookups("project_stats", hits=len(cached), misses=len(keys) - len(cached))
+
+    stats = {}
+    missing = []
+    for project_id, key in keys.items():
+        if key in cached:
+            stats[project_id] = cached[key]
+        else:
+            missing.append(project_id)
+
+    if missing:
+        computed = compute_project_stats(missing)
+        cache.set_many(
+            {keys[project_id]: value for project_id, value in computed.items()},
+            settings.PROJECT_STATS_CACHE_TIMEOUT,
+        )
+        stats.update(computed)
+    return stats
+
+
+def rollup_stats(stats_list):
+    """
+    Combine per-project stats into organization level totals.
+    """
+    totals = _empty_counters()
+    by_assignee = defaultdict(_empty_counters)
+    for project_stats in stats_list:
+        for name in COUNTERS:
+            totals[name] += project_stats[name]
+        for item in project_stats["by_assignee"]:
+            for name in COUNTERS:
+                by_assignee[item["assignee_email"]][name] += item[name]
+
+    totals["project_count"] = len(stats_list)
+    totals["completion_rate"] = _completion_rate(totals)
+    totals["by_assignee"] = [
+        {"assignee_email": email, **counters}
+        for email, counters in sorted(by_assignee.items())
+    ]
+    return totals
+
+
+def invalidate_project_stats(project_ids):
+    cache.delete_many([_cache_key(project_id) for project_id in project_ids])
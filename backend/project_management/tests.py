@@ -1,3 +1,1061 @@
-from django.test import TestCase
+import csv
+import json
+import os
+import tempfile
+from datetime import date, datetime, timedelta, timezone as dt_timezone
+from io import StringIO
+from unittest import mock
+from django.core.cache import cache
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import CommandError, call_command
+from django.db import connection
+from django.test import RequestFactory, TestCase, TransactionTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from graphql_jwt.shortcuts import get_token
+from accounts.models import CustomUser, Organization
+from backend.schema import schema
+from project_management.archive import archive_project
+from project_management.changes import record_changes
+from project_management.management.commands.run_benchmarks import Command as RunBenchmarksCommand
+from project_management.models import Change, Project, ProjectArchive, Task, TaskComment
+from project_management.partitions import DEFAULT_PARTITION, ensure_comment_partitions, partition_name
 
-# Create your tests here.
+
+class SchemaTestCase(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.organization = Organization.objects.create(
+            name="Acme", slug="acme", contact_email="ops@acme.test")
+        cls.user = CustomUser.objects.create_user(
+            username="owner", email="owner@acme.test", password="secret",
+            organization=cls.organization)
+
+    def execute(self, query, variables=None, user=None):
+        request = RequestFactory().post("/graphql/")
+        request.user = user or self.user
+        result = schema.execute(query, variables=variables, context_value=request)
+        self.assertIsNone(result.errors)
+        return result.data
+
+    def create_tree(self, projects, tasks, comments):
+        for p in range(projects):
+            project = Project.objects.create(
+                organization=self.organization, name=f"Project {p}")
+            for t in range(tasks):
+                task = Task.objects.create(
+                    project=project, title=f"Task {t}", assignee=self.user)
+                TaskComment.objects.bulk_create(
+                    TaskComment(task=task, content=f"Comment {c}", author=self.user)
+                    for c in range(comments)
+                )
+
+
+class NestedBatchingTests(SchemaTestCase):
+    QUERY = """
+        query {
+            projects {
+                name
+                tasks {
+                    title
+                    project { name }
+                    assignee { email organization { slug } }
+                    comments {
+                        content
+                        task { title }
+                        author { email }
+                    }
+                }
+            }
+        }
+    """
+
+    def count_queries(self):
+        with CaptureQueriesContext(connection) as ctx:
+            data = self.execute(self.QUERY)
+        return len(ctx.captured_queries), data
+
+    def test_query_count_is_independent_of_row_count(self):
+        self.create_tree(projects=1, tasks=1, comments=1)
+        small, _ = self.count_queries()
+
+        self.create_tree(projects=4, tasks=5, comments=3)
+        large, data = self.count_queries()
+
+        self.assertEqual(len(data["projects"]), 5)
+        self.assertEqual(
+            sum(len(task["comments"]) for project in data["projects"]
+                for task in project["tasks"]),
+            1 + 4 * 5 * 3,
+        )
+        # projects, tasks, assignees, organizations, comments, authors
+        self.assertEqual(small, large)
+        self.assertLessEqual(large, 6)
+
+    def test_nested_rows_are_grouped_by_parent(self):
+        self.create_tree(projects=2, tasks=2, comments=2)
+        _, data = self.count_queries()
+        for project in data["projects"]:
+            self.assertEqual(len(project["tasks"]), 2)
+            for task in project["tasks"]:
+                self.assertEqual(task["project"]["name"], project["name"])
+                self.assertEqual(
+                    {comment["task"]["title"] for comment in task["comments"]},
+                    {task["title"]},
+                )
+
+
+class CursorPaginationTests(SchemaTestCase):
+    QUERY = """
+        query ($projectId: ID!, $after: String) {
+            tasksConnection(projectId: $projectId, first: 4, after: $after) {
+                totalCount
+                pageInfo { hasNextPage hasPreviousPage endCursor }
+                edges { cursor node { id title } }
+            }
+        }
+    """
+
+    def test_pages_walk_every_row_once(self):
+        self.create_tree(projects=1, tasks=10, comments=0)
+        project = Project.objects.get()
+
+        seen, after = [], None
+        while True:
+            page = self.execute(self.QUERY, {"projectId": project.pk, "after": after})
+            connection = page["tasksConnection"]
+            self.assertEqual(connection["totalCount"], 10)
+            self.assertEqual(connection["pageInfo"]["hasPreviousPage"], after is not None)
+            seen.extend(edge["node"]["id"] for edge in connection["edges"])
+            if not connection["pageInfo"]["hasNextPage"]:
+                break
+            after = connection["pageInfo"]["endCursor"]
+
+        expected = list(Task.objects.order_by("created_at", "id").values_list("id", flat=True))
+        self.assertEqual(seen, [str(pk) for pk in expected])
+
+    def test_nested_connection(self):
+        self.create_tree(projects=1, tasks=1, comments=3)
+        data = self.execute("""
+            query {
+                projectsConnection(first: 1) {
+                    edges { node { tasksConnection { edges { node {
+                        commentsConnection(first: 2) {
+                            totalCount
+                            pageInfo { hasNextPage }
+                            edges { node { content } }
+                        }
+                    } } } } }
+                }
+            }
+        """)
+        project = data["projectsConnection"]["edges"][0]["node"]
+        comments = project["tasksConnection"]["edges"][0]["node"]["commentsConnection"]
+        self.assertEqual(comments["totalCount"], 3)
+        self.assertTrue(comments["pageInfo"]["hasNextPage"])
+        self.assertEqual(len(comments["edges"]), 2)
+
+    def test_nested_pages_are_batched(self):
+        self.create_tree(projects=3, tasks=5, comments=3)
+        query = """
+            query ($after: String) {
+                projects {
+                    id
+                    tasksConnection(first: 2, after: $after) {
+                        totalCount
+                        pageInfo { hasNextPage hasPreviousPage endCursor }
+                        edges { cursor node {
+                            id
+                            commentsConnection(first: 2) {
+                                totalCount
+                                pageInfo { hasNextPage }
+                                edges { node { content } }
+                            }
+                        } }
+                    }
+                }
+            }
+        """
+        root_query = """
+            query ($projectId: ID!, $after: String) {
+                tasksConnection(projectId: $projectId, first: 2, after: $after) {
+                    totalCount
+                    pageInfo { hasNextPage hasPreviousPage endCursor }
+                    edges { cursor node { id } }
+                }
+            }
+        """
+        after = None
+        for _ in range(3):
+            # projects, task pages, task counts, comment pages, comment counts
+            with self.assertNumQueries(5):
+                projects = self.execute(query, {"after": after})["projects"]
+            for project in projects:
+                connection = project["tasksConnection"]
+                expected = self.execute(
+                    root_query, {"projectId": project["id"], "after": after})["tasksConnection"]
+                edges, expected_edges = connection.pop("edges"), expected.pop("edges")
+                self.assertEqual(connection, expected)
+                self.assertEqual(
+                    [(edge["cursor"], edge["node"]["id"]) for edge in edges],
+                    [(edge["cursor"], edge["node"]["id"]) for edge in expected_edges])
+                for edge in edges:
+                    comments = edge["node"]["commentsConnection"]
+                    self.assertEqual(comments["totalCount"], 3)
+                    self.assertTrue(comments["pageInfo"]["hasNextPage"])
+                    self.assertEqual([node["node"]["content"] for node in comments["edges"]],
+                                     ["Comment 0", "Comment 1"])
+            after = projects[0]["tasksConnection"]["pageInfo"]["endCursor"]
+
+    def test_legacy_list_is_capped(self):
+        self.create_tree(projects=1, tasks=3, comments=0)
+        project = Project.objects.get()
+        with mock.patch("project_management.loaders.MAX_LIST_SIZE", 2):
+            data = self.execute(
+                "query ($id: ID!) { tasks(projectId: $id) { id } }", {"id": project.pk})
+        self.assertEqual(len(data["tasks"]), 2)
+
+
+class ProjectStatsTests(SchemaTestCase):
+    QUERY = """
+        query ($id: ID!) {
+            projectStats(projectId: $id) {
+                totalTasks todoTasks inProgressTasks completedTasks overdueTasks
+                completionRate
+                byAssignee { assigneeEmail totalTasks completedTasks }
+            }
+        }
+    """
+
+    def setUp(self):
+        cache.clear()
+        self.project = Project.objects.create(organization=self.organization, name="Stats")
+        past = timezone.now() - timedelta(days=1)
+        Task.objects.create(project=self.project, title="a", status="DONE", assignee=self.user)
+        Task.objects.create(project=self.project, title="b", status="TODO", due_date=past)
+        Task.objects.create(project=self.project, title="c", status="IN_PROGRESS",
+                            assignee=self.user)
+        Task.objects.create(project=self.project, title="d", status="DONE", due_date=past)
+
+    def test_counts_by_status_overdue_and_assignee(self):
+        stats = self.execute(self.QUERY, {"id": self.project.pk})["projectStats"]
+        self.assertEqual(
+            (stats["totalTasks"], stats["todoTasks"], stats["inProgressTasks"],
+             stats["completedTasks"], stats["overdueTasks"]),
+            (4, 1, 1, 2, 1),
+        )
+        self.assertEqual(stats["completionRate"], 50)
+        self.assertEqual(stats["byAssignee"], [
+            {"assigneeEmail": self.user.email, "totalTasks": 2, "completedTasks": 1}])
+
+    def test_cached_until_task_mutation(self):
+        self.execute(self.QUERY, {"id": self.project.pk})
+        with self.assertNumQueries(1):  # tenant check only
+            self.execute(self.QUERY, {"id": self.project.pk})
+
+        self.execute("""
+            mutation ($id: ID!) { createTask(projectId: $id, title: "e") { task { id } } }
+        """, {"id": self.project.pk})
+        stats = self.execute(self.QUERY, {"id": self.project.pk})["projectStats"]
+        self.assertEqual(stats["totalTasks"], 5)
+
+    def test_batched_and_organization_stats(self):
+        other = Project.objects.create(organization=self.organization, name="Other")
+        Task.objects.create(project=other, title="x", status="DONE")
+        data = self.execute("""
+            query ($ids: [ID!]!) {
+                projectsStats(ids: $ids) { projectId totalTasks }
+                organizationStats { projectCount totalTasks completedTasks }
+            }
+        """, {"ids": [self.project.pk, other.pk]})
+        self.assertEqual(
+            [(int(s["projectId"]), s["totalTasks"]) for s in data["projectsStats"]],
+            [(self.project.pk, 4), (other.pk, 1)],
+        )
+        self.assertEqual(data["organizationStats"],
+                         {"projectCount": 2, "totalTasks": 5, "completedTasks": 3})
+
+
+class QueryCountTests(SchemaTestCase):
+    """
+    Pin the number of queries each operation costs so it cannot regress.
+    The user is re-fetched without its organization so tenant checks that
+    go through `user.organization` instead of the id would be counted.
+    """
+    # Every mutation locks the organization and appends to its change log.
+    CHANGE_LOG = 2
+
+    def setUp(self):
+        cache.clear()
+        self.create_tree(projects=2, tasks=3, comments=2)
+        self.project = Project.objects.first()
+        self.task = Task.objects.filter(project=self.project).first()
+        self.comment = TaskComment.objects.filter(task=self.task).first()
+        self.fresh_user = CustomUser.objects.get(pk=self.user.pk)
+
+    def assertOperationQueries(self, expected, query, variables=None):
+        with self.assertNumQueries(expected):
+            self.execute(query, variables, user=self.fresh_user)
+
+    def test_project_queries(self):
+        self.assertOperationQueries(
+            1, "query { projects { id name status } }")
+        self.assertOperationQueries(
+            1, "query ($id: ID!) { project(id: $id) { id name } }", {"id": self.project.pk})
+        self.assertOperationQueries(
+            2, "query ($id: ID!) { projectStats(projectId: $id) { totalTasks } }",
+            {"id": self.project.pk})
+
+    def test_task_queries(self):
+        self.assertOperationQueries(
+            2, "query ($id: ID!) { tasks(projectId: $id) { id title } }", {"id": self.project.pk})
+        self.assertOperationQueries(
+            1, "query ($id: ID!) { task(id: $id) { id title } }", {"id": self.task.pk})
+        self.assertOperationQueries(
+            2, "query ($id: ID!) { taskComments(taskId: $id) { id content } }",
+            {"id": self.task.pk})
+
+    def test_project_mutations(self):
+        self.assertOperationQueries(
+            1 + self.CHANGE_LOG, 'mutation { createProject(name: "New") { project { id } } }')
+        self.assertOperationQueries(
+            2 + self.CHANGE_LOG, 'mutation ($id: ID!) { updateProject(id: $id, name: "Renamed") { project { id } } }',
+            {"id": self.project.pk})
+
+    def test_task_mutations(self):
+        self.assertOperationQueries(
+            3 + self.CHANGE_LOG, """mutation ($id: ID!, $email: String) {
+                createTask(projectId: $id, title: "New", assigneeEmail: $email) { task { id } }
+            }""", {"id": self.project.pk, "email": self.user.email})
+        self.assertOperationQueries(
+            2 + self.CHANGE_LOG, 'mutation ($id: ID!) { updateTask(id: $id, status: "DONE") { task { id } } }',
+            {"id": self.task.pk})
+
+    def test_comment_mutations(self):
+        self.assertOperationQueries(
+            2 + self.CHANGE_LOG, 'mutation ($id: ID!) { addTaskComment(taskId: $id, content: "Hi") { comment { id } } }',
+            {"id": self.task.pk})
+        self.assertOperationQueries(
+            2 + self.CHANGE_LOG, 'mutation ($id: ID!) { updateTaskComment(id: $id, content: "Hey") { comment { id } } }',
+            {"id": self.comment.pk})
+
+    def test_other_organization_is_rejected(self):
+        other = Organization.objects.create(name="Other", slug="other", contact_email="o@o.test")
+        outsider = CustomUser.objects.create_user(
+            username="outsider", email="outsider@other.test", password="secret",
+            organization=other)
+        request = RequestFactory().post("/graphql/")
+        request.user = outsider
+        result = schema.execute(
+            'mutation ($id: ID!) { updateTaskComment(id: $id, content: "x") { comment { id } } }',
+            variables={"id": self.comment.pk}, context_value=request)
+        self.assertEqual(str(result.errors[0].message), "Not found or unauthorized")
+
+
+class BulkTaskMutationTests(SchemaTestCase):
+    CREATE = """
+        mutation ($tasks: [BulkTaskInput!]!) {
+            bulkCreateTasks(tasks: $tasks) {
+                tasks { id title assignee { email } }
+                errors { index message }
+            }
+        }
+    """
+
+    def setUp(self):
+        self.project = Project.objects.create(organization=self.organization, name="Bulk")
+
+    def task_input(self, n, **overrides):
+        return {"projectId": self.project.pk, "title": f"Task {n}",
+                "assigneeEmail": self.user.email, "dueDate": "2030-01-01", **overrides}
+
+    def test_bulk_create_query_count_is_constant(self):
+        with CaptureQueriesContext(connection) as small:
+            self.execute(self.CREATE, {"tasks": [self.task_input(0)]})
+        with CaptureQueriesContext(connection) as large:
+            data = self.execute(self.CREATE, {"tasks": [self.task_input(n) for n in range(50)]})
+        self.assertEqual(len(small), len(large))
+        self.assertEqual(len(data["bulkCreateTasks"]["tasks"]), 50)
+        self.assertEqual(Task.objects.count(), 51)
+        # Midnight in the current time zone, not a naive datetime
+        self.assertEqual(
+            set(Task.objects.exclude(due_date=None).values_list("due_date", flat=True)),
+            {timezone.make_aware(datetime(2030, 1, 1))})
+
+    def test_bulk_create_reports_per_item_errors(self):
+        data = self.execute(self.CREATE, {"tasks": [
+            self.task_input(0),
+            self.task_input(1, projectId=999999),
+            self.task_input(2, assigneeEmail="nobody@acme.test"),
+            self.task_input(3, status="BLOCKED"),
+            self.task_input(4, dueDate="tomorrow"),
+        ]})["bulkCreateTasks"]
+        self.assertEqual([task["title"] for task in data["tasks"]], ["Task 0"])
+        self.assertEqual([error["index"] for error in data["errors"]], [1, 2, 3, 4])
+
+    def test_bulk_status_and_assign(self):
+        tasks = [Task.objects.create(project=self.project, title=str(n)) for n in range(3)]
+        ids = [task.pk for task in tasks] + [999999]
+
+        data = self.execute("""
+            mutation ($ids: [ID!]!) {
+                bulkUpdateTaskStatus(ids: $ids, status: "DONE") { errors { index } }
+            }
+        """, {"ids": ids})
+        self.assertEqual(data["bulkUpdateTaskStatus"]["errors"], [{"index": 3}])
+        self.assertEqual(Task.objects.filter(status="DONE").count(), 3)
+
+        data = self.execute("""
+            mutation ($ids: [ID!]!, $email: String) {
+                bulkAssignTasks(ids: $ids, assigneeEmail: $email) { tasks { assignee { email } } }
+            }
+        """, {"ids": ids[:2], "email": self.user.email})
+        self.assertEqual(len(data["bulkAssignTasks"]["tasks"]), 2)
+        self.assertEqual(Task.objects.filter(assignee=self.user).count(), 2)
+
+
+class ChangeLogTests(SchemaTestCase):
+    CHANGES = """
+        query ($cursor: String) {
+            changesSince(cursor: $cursor) {
+                cursor
+                hasMore
+                projects { name }
+                tasks { title status }
+                comments { content }
+                deleted { typename id }
+            }
+        }
+    """
+
+    def setUp(self):
+        self.project = Project.objects.create(organization=self.organization, name="Board")
+        self.task = Task.objects.create(project=self.project, title="Docs")
+
+    def changes(self, cursor):
+        return self.execute(self.CHANGES, {"cursor": cursor})["changesSince"]
+
+    def test_returns_rows_changed_after_the_cursor(self):
+        cursor = self.changes(None)["cursor"]
+
+        self.execute('mutation ($id: ID!) { updateTask(id: $id, status: "IN_PROGRESS") { task { id } } }',
+                     {"id": self.task.pk})
+        self.execute('mutation ($id: ID!) { updateTask(id: $id, status: "DONE") { task { id } } }',
+                     {"id": self.task.pk})
+        self.execute('mutation ($id: ID!) { addTaskComment(taskId: $id, content: "Hi") { comment { id } } }',
+                     {"id": self.task.pk})
+
+        changes = self.changes(cursor)
+        self.assertEqual(changes["tasks"], [{"title": "Docs", "status": "DONE"}])
+        self.assertEqual(changes["comments"], [{"content": "Hi"}])
+        self.assertEqual(changes["projects"], [])
+        self.assertFalse(changes["hasMore"])
+
+        unchanged = self.changes(changes["cursor"])
+        self.assertEqual(unchanged["cursor"], changes["cursor"])
+        self.assertEqual(unchanged["tasks"], [])
+
+    def test_other_organizations_are_not_visible(self):
+        cursor = self.changes(None)["cursor"]
+        other = Organization.objects.create(name="Other", slug="other", contact_email="o@o.test")
+        outsider = CustomUser.objects.create_user(
+            username="outsider", email="outsider@other.test", password="secret", organization=other)
+        self.execute('mutation { createProject(name: "Secret") { project { id } } }', user=outsider)
+
+        self.assertEqual(self.changes(cursor)["projects"], [])
+
+    def test_deleted_rows(self):
+        cursor = self.changes(None)["cursor"]
+        task_id = self.task.pk
+        record_changes(self.organization.pk, Change.PROJECT, [self.project.pk], Change.DELETE)
+        record_changes(self.organization.pk, Change.TASK, [task_id])
+        self.task.delete()
+
+        self.assertEqual(self.changes(cursor)["deleted"], [
+            {"typename": "ProjectType", "id": str(self.project.pk)},
+            {"typename": "TaskType", "id": str(task_id)},
+        ])
+
+    def test_long_logs_are_read_in_pages(self):
+        cursor = self.changes(None)["cursor"]
+        tasks = Task.objects.bulk_create(
+            Task(project=self.project, title=f"Task {i}") for i in range(5))
+        record_changes(self.organization.pk, Change.TASK, [task.pk for task in tasks])
+
+        titles = []
+        with mock.patch("project_management.changes.MAX_CHANGES", 2):
+            for _ in range(3):
+                changes = self.changes(cursor)
+                titles += [task["title"] for task in changes["tasks"]]
+                cursor = changes["cursor"]
+        self.assertEqual(titles, [f"Task {i}" for i in range(5)])
+        self.assertFalse(changes["hasMore"])
+
+    def test_bulk_updates_touch_updated_at(self):
+        before = self.task.updated_at
+        self.execute('mutation ($ids: [ID!]!) { bulkUpdateTaskStatus(ids: $ids, status: "DONE") { tasks { id } } }',
+                     {"ids": [self.task.pk]})
+        self.task.refresh_from_db()
+        self.assertGreater(self.task.updated_at, before)
+
+
+class FilterTests(SchemaTestCase):
+    def setUp(self):
+        now = timezone.now()
+        self.other_user = CustomUser.objects.create_user(
+            username="other", email="other@acme.test", password="secret",
+            organization=self.organization)
+        self.board = Project.objects.create(organization=self.organization, name="Board")
+        self.late = Project.objects.create(
+            organization=self.organization, name="Archive", status="ON_HOLD",
+            due_date=timezone.localdate() - timedelta(days=1))
+        self.overdue = Task.objects.create(
+            project=self.board, title="Overdue", assignee=self.user,
+            due_date=now - timedelta(days=2))
+        Task.objects.create(
+            project=self.late, title="Overdue but done", assignee=self.user,
+            due_date=now - timedelta(days=1), status="DONE")
+        Task.objects.create(
+            project=self.late, title="Late", assignee=self.user,
+            due_date=now - timedelta(days=5))
+        Task.objects.create(
+            project=self.board, title="Someone else's", assignee=self.other_user,
+            due_date=now - timedelta(days=1))
+        Task.objects.create(
+            project=self.board, title="Upcoming", assignee=self.user,
+            due_date=now + timedelta(days=1), status="IN_PROGRESS")
+
+    def test_my_overdue_tasks_across_the_organization_in_one_query(self):
+        query = """
+            query ($filter: TaskFilterInput) {
+                tasks(filter: $filter, sort: DUE_DATE) { title }
+            }
+        """
+        variables = {"filter": {"assigneeIn": [self.user.pk], "overdue": True}}
+        with self.assertNumQueries(1):
+            data = self.execute(query, variables)
+        self.assertEqual([task["title"] for task in data["tasks"]], ["Late", "Overdue"])
+
+    def test_filters_and_sorts_project_tasks(self):
+        query = """
+            query ($projectId: ID, $filter: TaskFilterInput) {
+                tasks(projectId: $projectId, filter: $filter, sort: TITLE) { title }
+            }
+        """
+        data = self.execute(query, {
+            "projectId": self.board.pk, "filter": {"statusIn": ["TODO", "IN_PROGRESS"]}})
+        self.assertEqual([task["title"] for task in data["tasks"]],
+                         ["Overdue", "Someone else's", "Upcoming"])
+        data = self.execute(query, {
+            "projectId": self.board.pk,
+            "filter": {"dueAfter": timezone.now().isoformat(), "overdue": False}})
+        self.assertEqual([task["title"] for task in data["tasks"]], ["Upcoming"])
+
+    def test_nested_task_filters_are_batched(self):
+        query = """
+            query {
+                projects(sort: NAME) {
+                    name
+                    tasks(filter: {overdue: true}, sort: CREATED_AT_DESC) { title }
+                    allTasks: tasks { title }
+                }
+            }
+        """
+        with self.assertNumQueries(3):  # projects, filtered tasks, all tasks
+            data = self.execute(query)
+        self.assertEqual(data["projects"], [
+            {"name": "Archive", "tasks": [{"title": "Late"}],
+             "allTasks": [{"title": "Overdue but done"}, {"title": "Late"}]},
+            {"name": "Board", "tasks": [{"title": "Someone else's"}, {"title": "Overdue"}],
+             "allTasks": [{"title": "Overdue"}, {"title": "Someone else's"}, {"title": "Upcoming"}]},
+        ])
+
+    def test_project_filters(self):
+        query = """
+            query ($filter: ProjectFilterInput) {
+                projects(filter: $filter) { name }
+                projectsConnection(filter: $filter) { totalCount }
+            }
+        """
+        data = self.execute(query, {"filter": {"overdue": True}})
+        self.assertEqual(data, {"projects": [{"name": "Archive"}],
+                                "projectsConnection": {"totalCount": 1}})
+        data = self.execute(query, {"filter": {"statusIn": ["ACTIVE"]}})
+        self.assertEqual(data["projects"], [{"name": "Board"}])
+
+    def test_rejects_unknown_status(self):
+        request = RequestFactory().post("/graphql/")
+        request.user = self.user
+        result = schema.execute(
+            'query { tasks(filter: {statusIn: ["LATE"]}) { title } }', context_value=request)
+        self.assertEqual(result.errors[0].message, "Invalid status: LATE")
+
+
+class TaskFeedTests(SchemaTestCase):
+    QUERY = """
+        query ($after: String, $filter: TaskFilterInput) {
+            myTasks(first: 3, after: $after, filter: $filter) {
+                totalCount
+                pageInfo { hasNextPage endCursor }
+                edges { node { title project { name } } }
+            }
+        }
+    """
+
+    def setUp(self):
+        other = CustomUser.objects.create_user(
+            username="other", email="other@acme.test", password="secret",
+            organization=self.organization)
+        for number in range(3):
+            project = Project.objects.create(organization=self.organization, name=f"Project {number}")
+            Task.objects.create(project=project, title=f"Mine {number}", assignee=self.user)
+            Task.objects.create(project=project, title=f"Done {number}", assignee=self.user,
+                                status="DONE")
+            Task.objects.create(project=project, title=f"Theirs {number}", assignee=other)
+
+    def test_my_tasks_across_projects(self):
+        with self.assertNumQueries(2):  # the page with its projects, totalCount
+            page = self.execute(self.QUERY)["myTasks"]
+        self.assertEqual(
+            [edge["node"] for edge in page["edges"]],
+            [{"title": "Mine 0", "project": {"name": "Project 0"}},
+             {"title": "Done 0", "project": {"name": "Project 0"}},
+             {"title": "Mine 1", "project": {"name": "Project 1"}}])
+        self.assertTrue(page["pageInfo"]["hasNextPage"])
+
+        page = self.execute(self.QUERY, {
+            "after": page["pageInfo"]["endCursor"], "filter": {"statusIn": ["TODO"]}})["myTasks"]
+        self.assertEqual([edge["node"]["title"] for edge in page["edges"]], ["Mine 2"])
+        self.assertEqual(page["totalCount"], 3)
+
+    def test_org_tasks(self):
+        data = self.execute("""
+            query { orgTasks(first: 50, filter: {statusIn: ["DONE"]}) { totalCount } }
+        """)
+        self.assertEqual(data["orgTasks"]["totalCount"], 3)
+
+        other_org = Organization.objects.create(name="Other", slug="other", contact_email="o@o.test")
+        outsider = CustomUser.objects.create_user(
+            username="outsider", email="outsider@other.test", password="secret",
+            organization=other_org)
+        data = self.execute("query { orgTasks { totalCount } myTasks { totalCount } }", user=outsider)
+        self.assertEqual(data, {"orgTasks": {"totalCount": 0}, "myTasks": {"totalCount": 0}})
+
+
+class SearchTests(SchemaTestCase):
+    SEARCH = """
+        query ($query: String!, $projectId: ID, $status: String, $first: Int, $after: String) {
+            search(query: $query, projectId: $projectId, status: $status, first: $first, after: $after) {
+                totalCount
+                pageInfo { hasNextPage endCursor }
+                edges { node { kind headline task { title } comment { content } } }
+            }
+        }
+    """
+
+    def setUp(self):
+        self.project = Project.objects.create(organization=self.organization, name="Board")
+        self.invoice = Task.objects.create(
+            project=self.project, title="Send invoices", description="Monthly billing run")
+        self.other = Task.objects.create(
+            project=self.project, title="Fix login", description="Invoice page crashes",
+            status="DONE")
+        TaskComment.objects.create(
+            task=self.other, content="The invoicing service times out", author=self.user)
+
+        other_org = Organization.objects.create(name="Other", slug="other", contact_email="o@o.test")
+        other_project = Project.objects.create(organization=other_org, name="Secret")
+        Task.objects.create(project=other_project, title="Invoice fraud")
+
+    def search(self, **variables):
+        return self.execute(self.SEARCH, variables)["search"]
+
+    def test_ranks_tasks_and_comments_of_the_organization(self):
+        result = self.search(query="invoice")
+        nodes = [edge["node"] for edge in result["edges"]]
+        self.assertEqual(result["totalCount"], 3)
+        # Title matches weigh more than description and comment matches.
+        self.assertEqual(nodes[0]["task"]["title"], "Send invoices")
+        self.assertTrue(nodes[0]["headline"].startswith("Send <mark>invoices</mark>"))
+        comment = next(node for node in nodes if node["kind"] == "COMMENT")
+        self.assertEqual(comment["task"]["title"], "Fix login")
+        self.assertIn("<mark>invoicing</mark>", comment["headline"])
+
+    def test_headlines_escape_the_text(self):
+        Task.objects.create(
+            project=self.project, title="<script>alert(1)</script> receipts",
+            description="Tom & Jerry")
+        TaskComment.objects.create(
+            task=self.other, content="<img src=x onerror=alert(1)> receipts",
+            author=self.user)
+        headlines = [
+            edge["node"]["headline"] for edge in self.search(query="receipts")["edges"]]
+        self.assertEqual(len(headlines), 2)
+        for headline in headlines:
+            self.assertIn("&gt; <mark>receipts</mark>", headline)
+            # The markers are the only markup left.
+            text = headline.replace("<mark>", "").replace("</mark>", "")
+            self.assertNotIn("<", text)
+            self.assertNotIn(">", text)
+        self.assertIn("&lt;/script&gt;", headlines[0] + headlines[1])
+        self.assertIn("Tom &amp; Jerry", headlines[0] + headlines[1])
+
+    def test_filters(self):
+        self.assertEqual(self.search(query="invoice", status="DONE")["totalCount"], 2)
+        self.assertEqual(self.search(query="billing -monthly")["totalCount"], 0)
+        other_project = Project.objects.create(organization=self.organization, name="Empty")
+        self.assertEqual(self.search(query="invoice", projectId=other_project.pk)["totalCount"], 0)
+
+    def test_pagination(self):
+        first = self.search(query="invoice", first=2)
+        self.assertEqual(len(first["edges"]), 2)
+        self.assertTrue(first["pageInfo"]["hasNextPage"])
+        rest = self.search(query="invoice", first=2, after=first["pageInfo"]["endCursor"])
+        self.assertEqual(len(rest["edges"]), 1)
+        self.assertFalse(rest["pageInfo"]["hasNextPage"])
+
+    def test_search_vector_follows_updates(self):
+        self.invoice.title = "Send receipts"
+        self.invoice.description = ""
+        self.invoice.save()
+        self.assertEqual(self.search(query="receipt")["totalCount"], 1)
+
+    def test_query_count(self):
+        # Count, ranked page, then tasks and comments with their headlines
+        with self.assertNumQueries(4):
+            self.search(query="invoice")
+
+
+class ExportTests(SchemaTestCase):
+    def setUp(self):
+        self.create_tree(projects=2, tasks=3, comments=2)
+        other = Organization.objects.create(name="Globex", slug="globex", contact_email="g@g.test")
+        Task.objects.create(project=Project.objects.create(organization=other, name="Other"),
+                            title="Hidden")
+        self.headers = {"HTTP_AUTHORIZATION": f"Bearer {get_token(self.user)}"}
+
+    def test_tasks_stream_as_csv_with_assignee_emails(self):
+        with override_settings(EXPORT_CHUNK_SIZE=4):
+            response = self.client.get("/export/tasks/", **self.headers)
+            self.assertTrue(response.streaming)
+            rows = list(csv.reader(b"".join(response.streaming_content).decode().splitlines()))
+        self.assertEqual(response["Content-Disposition"], 'attachment; filename="acme-tasks.csv"')
+        self.assertEqual(rows[0][:6], ["id", "project_id", "title", "description", "status",
+                                       "assignee_email"])
+        self.assertEqual(len(rows), 7)
+        self.assertEqual({row[5] for row in rows[1:]}, {"owner@acme.test"})
+        self.assertNotIn("Hidden", {row[2] for row in rows})
+
+    def test_comments_stream_as_ndjson(self):
+        response = self.client.get("/export/comments/?format=ndjson", **self.headers)
+        lines = [json.loads(line) for line in b"".join(response.streaming_content).splitlines()]
+        self.assertEqual(len(lines), 12)
+        self.assertEqual(lines[0]["author_email"], "owner@acme.test")
+        self.assertEqual(set(lines[0]), {"id", "task_id", "project_id", "author_email", "content",
+                                         "created_at", "updated_at"})
+
+    async def test_asgi_requests_stream_from_an_async_iterator(self):
+        response = await self.async_client.get(
+            "/export/projects/?format=ndjson",
+            headers={"Authorization": self.headers["HTTP_AUTHORIZATION"]})
+        self.assertTrue(response.is_async)
+        content = b"".join([chunk async for chunk in response.streaming_content])
+        self.assertEqual(len(content.splitlines()), 2)
+
+    def test_archived_rows_follow_the_others(self):
+        project = Project.objects.filter(organization=self.organization).first()
+        expected = self.client.get("/export/comments/?format=ndjson", **self.headers)
+        expected = sorted(b"".join(expected.streaming_content).splitlines())
+        Project.objects.filter(pk=project.pk).update(status="COMPLETED")
+        archive_project(project.pk)
+
+        for resource, count in (("tasks", 3), ("comments", 6)):
+            response = self.client.get(f"/export/{resource}/", **self.headers)
+            rows = list(csv.DictReader(b"".join(response.streaming_content).decode().splitlines()))
+            self.assertEqual([row["project_id"] for row in rows[-count:]], [str(project.pk)] * count)
+        self.assertEqual(rows[-1]["author_email"], "owner@acme.test")
+        response = self.client.get("/export/comments/?format=ndjson", **self.headers)
+        self.assertEqual(sorted(b"".join(response.streaming_content).splitlines()), expected)
+
+    def test_requests_are_validated(self):
+        self.assertEqual(self.client.get("/export/tasks/").status_code, 401)
+        self.assertEqual(self.client.get("/export/users/", **self.headers).status_code, 404)
+        self.assertEqual(
+            self.client.get("/export/tasks/?format=xml", **self.headers).status_code, 400)
+
+
+class ImportTests(SchemaTestCase):
+    TASKS = (
+        "ref,project_id,title,status,assignee_email,due_date\n"
+        "a,{project},Imported A,IN_PROGRESS,OWNER@acme.test,2030-01-31\n"
+        "b,{project},Imported B,,,\n"
+        "c,{project},Bad status,LATER,,\n"
+        "d,{project},Stranger,,nobody@acme.test,\n"
+        "a,{project},Same ref,,,\n"
+        "e,{other},Other organization,,,\n"
+    )
+
+    def setUp(self):
+        self.project = Project.objects.create(organization=self.organization, name="Target")
+        self.task = Task.objects.create(project=self.project, title="Existing")
+        other = Organization.objects.create(name="Globex", slug="globex", contact_email="g@g.test")
+        self.other_project = Project.objects.create(organization=other, name="Other")
+
+    def write(self, directory, name, content):
+        path = os.path.join(directory, name)
+        with open(path, "w") as f:
+            f.write(content)
+        return path
+
+    def comments(self):
+        return "\n".join([
+            json.dumps({"task_ref": "a", "content": "On A", "author_email": "owner@acme.test"}),
+            json.dumps({"task_id": self.task.pk, "content": "On existing"}),
+            json.dumps({"task_ref": "c", "content": "On a rejected task"}),
+            "not json",
+        ]) + "\n"
+
+    def test_command_imports_valid_rows_and_reports_the_others(self):
+        with tempfile.TemporaryDirectory() as directory:
+            tasks = self.write(directory, "tasks.csv", self.TASKS.format(
+                project=self.project.pk, other=self.other_project.pk))
+            comments = self.write(directory, "comments.ndjson", self.comments())
+            errors = os.path.join(directory, "errors.csv")
+            call_command("import_data", organization="acme", tasks=tasks, comments=comments,
+                         errors=errors, chunk_size=2, stdout=StringIO())
+            with open(errors) as f:
+                rejected = {(row["source"], int(row["line"])) for row in csv.DictReader(f)}
+
+        self.assertEqual(rejected, {("tasks", 4), ("tasks", 5), ("tasks", 6), ("tasks", 7),
+                                    ("comments", 3), ("comments", 4)})
+        a = Task.objects.get(title="Imported A")
+        self.assertEqual((a.project, a.assignee, a.status), (self.project, self.user, "IN_PROGRESS"))
+        self.assertEqual(a.due_date.date().isoformat(), "2030-01-31")
+        self.assertEqual(Task.objects.get(title="Imported B").status, "TODO")
+        self.assertEqual(a.comments.get().author, self.user)
+        self.assertEqual(self.task.comments.get().content, "On existing")
+        self.assertEqual(
+            set(Change.objects.values_list("entity", "object_id")),
+            {(Change.TASK, a.pk), (Change.TASK, Task.objects.get(title="Imported B").pk),
+             *((Change.COMMENT, pk) for pk in TaskComment.objects.values_list("pk", flat=True))})
+
+    def test_strict_import_rejects_everything(self):
+        with tempfile.TemporaryDirectory() as directory:
+            tasks = self.write(directory, "tasks.csv", self.TASKS.format(
+                project=self.project.pk, other=self.other_project.pk))
+            with self.assertRaisesMessage(CommandError, "Nothing was imported"):
+                call_command("import_data", organization="acme", tasks=tasks, strict=True,
+                             errors=os.path.join(directory, "errors.csv"), stdout=StringIO())
+        self.assertEqual(Task.objects.count(), 1)
+
+    def test_upload_endpoint(self):
+        headers = {"HTTP_AUTHORIZATION": f"Bearer {get_token(self.user)}"}
+        tasks = SimpleUploadedFile("tasks.csv", self.TASKS.format(
+            project=self.project.pk, other=self.other_project.pk).encode())
+        comments = SimpleUploadedFile("comments.ndjson", self.comments().encode())
+        response = self.client.post("/import/", {"tasks": tasks, "comments": comments}, **headers)
+        self.assertEqual(response.status_code, 200)
+        summary = response.json()
+        self.assertEqual(summary["imported"], {"tasks": 2, "comments": 2})
+        self.assertEqual(summary["errorCount"], 6)
+
+        self.assertEqual(self.client.post("/import/", {}, **headers).status_code, 400)
+
+        # Every row rejected
+        tasks = SimpleUploadedFile("tasks.csv", b"ref,project_id,title\na,0,Nowhere\n")
+        response = self.client.post("/import/", {"tasks": tasks}, **headers)
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(response.json()["errorCount"], 1)
+        self.assertEqual(self.client.post("/import/", {"tasks": tasks}).status_code, 401)
+
+
+class ArchiveTests(SchemaTestCase):
+    def setUp(self):
+        self.completed = Project.objects.create(
+            organization=self.organization, name="Done", status="COMPLETED")
+        self.active = Project.objects.create(organization=self.organization, name="Active")
+        for project in (self.completed, self.active):
+            for t in range(2):
+                task = Task.objects.create(
+                    project=project, title=f"{project.name} {t}", assignee=self.user,
+                    status="DONE", due_date=timezone.now())
+                for c in range(t + 1):
+                    TaskComment.objects.create(task=task, content=f"Comment {c}", author=self.user)
+        Project.objects.update(updated_at=timezone.now() - timedelta(days=365))
+        self.task = self.completed.tasks.first()
+
+    def rows(self):
+        return (
+            list(Task.objects.filter(project=self.completed).order_by("id").values()),
+            list(TaskComment.objects.filter(task__project=self.completed).order_by("id").values()),
+        )
+
+    def archive(self):
+        call_command("archive_projects", stdout=StringIO())
+        self.completed.refresh_from_db()
+
+    def test_only_old_completed_projects_are_archived(self):
+        before = self.rows()
+        self.archive()
+        self.assertIsNotNone(self.completed.archived_at)
+        self.assertEqual(Task.objects.filter(project=self.completed).count(), 0)
+        self.assertEqual(TaskComment.objects.count(), 3)
+        archive = ProjectArchive.objects.get()
+        self.assertEqual(sorted(archive.task_ids), [task["id"] for task in before[0]])
+        self.assertEqual(sorted(archive.comment_ids), [comment["id"] for comment in before[1]])
+
+        stats = self.execute("query ($ids: [ID!]!) { projectsStats(ids: $ids) { totalTasks } }",
+                             {"ids": [self.completed.pk, self.active.pk]})
+        self.assertEqual(stats["projectsStats"], [{"totalTasks": 2}, {"totalTasks": 2}])
+
+    def test_access_restores_the_rows_unchanged(self):
+        before = self.rows()
+        self.archive()
+        data = self.execute(
+            "query ($id: ID!) { project(id: $id) { archivedAt tasks { comments { content } } } }",
+            {"id": self.completed.pk})
+        self.assertIsNone(data["project"]["archivedAt"])
+        self.assertEqual(len(data["project"]["tasks"]), 2)
+        self.assertEqual(self.rows(), before)
+        self.assertFalse(ProjectArchive.objects.exists())
+
+        # Restored projects stay in the hot tables for another period.
+        self.archive()
+        self.assertIsNone(self.completed.archived_at)
+
+    def test_tasks_of_archived_projects_restore_them(self):
+        self.archive()
+        data = self.execute("query ($id: ID!) { task(id: $id) { title } }", {"id": self.task.pk})
+        self.assertEqual(data["task"]["title"], self.task.title)
+
+    def test_lists_leave_archived_projects_archived(self):
+        self.archive()
+        with self.assertNumQueries(2):  # projects, tasks
+            data = self.execute("query { projects { name archivedAt tasks { title } } }")
+        self.assertEqual(
+            [(project["name"], bool(project["archivedAt"]), len(project["tasks"]))
+             for project in data["projects"]],
+            [("Done", True, 0), ("Active", False, 2)])
+        self.execute("query { projectsConnection { edges { node { tasksConnection { totalCount } } } } }")
+        self.completed.refresh_from_db()
+        self.assertIsNotNone(self.completed.archived_at)
+
+
+class CommentPartitionTests(SchemaTestCase):
+    def partition_of(self, comment):
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f"SELECT tableoid::regclass::text FROM {TaskComment._meta.db_table} WHERE id = %s",
+                [comment.pk])
+            return cursor.fetchone()[0]
+
+    def test_comments_move_to_their_month_partition(self):
+        project = Project.objects.create(organization=self.organization, name="P")
+        task = Task.objects.create(project=project, title="T")
+        comment = TaskComment.objects.create(task=task, content="Now")
+        self.assertEqual(self.partition_of(comment), partition_name(comment.created_at.date().replace(day=1)))
+
+        old = TaskComment.objects.create(task=task, content="Imported history")
+        TaskComment.objects.filter(pk=old.pk).update(
+            created_at=datetime(2020, 1, 15, tzinfo=dt_timezone.utc))
+        self.assertEqual(self.partition_of(old), DEFAULT_PARTITION)
+
+        created = ensure_comment_partitions(months_ahead=1)
+        self.assertEqual(created, {partition_name(date(2020, 1, 1)): 1})
+        self.assertEqual(self.partition_of(old), partition_name(date(2020, 1, 1)))
+        self.assertEqual(TaskComment.objects.get(pk=old.pk).content, "Imported history")
+        self.assertEqual(ensure_comment_partitions(months_ahead=1), {})
+
+
+class BenchmarkCommandTests(TestCase):
+    def test_seed_and_benchmark_every_operation(self):
+        call_command("seed_benchmark_data", organizations=2, users=4, projects=3, tasks=30,
+                     comments=90, stdout=StringIO())
+        self.assertEqual(Organization.objects.filter(slug__startswith="bench-").count(), 2)
+        self.assertEqual(Task.objects.count(), 30)
+        with self.assertRaises(CommandError):
+            call_command("seed_benchmark_data", stdout=StringIO())
+
+        with tempfile.TemporaryDirectory() as directory:
+            baseline = os.path.join(directory, "baseline.json")
+            call_command("run_benchmarks", runs=1, warmup=1, save=baseline, stdout=StringIO())
+            with open(baseline) as f:
+                operations = json.load(f)["operations"]
+            self.assertEqual(operations["projectList"]["queries"], 1)
+            self.assertIn("bulkAssignTasks", operations)
+
+            operations["projectList"]["queries"] = 0
+            with open(baseline, "w") as f:
+                json.dump({"operations": operations}, f)
+            with self.assertRaisesMessage(CommandError, "regression"):
+                call_command("run_benchmarks", runs=1, warmup=0, compare=baseline,
+                             operation=["projectList"], stdout=StringIO())
+
+            # Latencies of too few runs are not compared.
+            operations["projectList"].update(queries=1, p95_ms=0.001, iqr_ms=0)
+            with open(baseline, "w") as f:
+                json.dump({"meta": {"runs": 3}, "operations": operations}, f)
+            out = StringIO()
+            call_command("run_benchmarks", runs=3, warmup=0, compare=baseline, min_delta_ms=0,
+                         operation=["projectList"], stdout=out)
+            self.assertIn("Latencies not compared", out.getvalue())
+
+    def test_compare_ignores_latency_changes_within_the_spread(self):
+        command = RunBenchmarksCommand(stdout=StringIO())
+        with tempfile.TemporaryDirectory() as directory:
+            baseline = os.path.join(directory, "baseline.json")
+            with open(baseline, "w") as f:
+                json.dump({"meta": {"runs": 20}, "operations": {
+                    "projectList": {"queries": 1, "p95_ms": 10, "iqr_ms": 1, "peak_kib": 100},
+                }}, f)
+
+            def compare(p95_ms, iqr_ms):
+                results = {"projectList": {"queries": 1, "p95_ms": p95_ms, "iqr_ms": iqr_ms,
+                                           "peak_kib": 100}}
+                command.compare(results, runs=20, path=baseline, tolerance=0.1, min_delta_ms=1,
+                                min_runs=20)
+
+            compare(p95_ms=15, iqr_ms=3)
+            with self.assertRaisesMessage(CommandError, "1 regression"):
+                compare(p95_ms=15, iqr_ms=1)
+
+    def test_reset_deletes_archived_projects(self):
+        call_command("seed_benchmark_data", organizations=1, users=2, projects=2, tasks=4,
+                     comments=4, stdout=StringIO())
+        project = Project.objects.filter(organization__slug__startswith="bench-").first()
+        Project.objects.filter(pk=project.pk).update(status="COMPLETED")
+        self.assertIsNotNone(archive_project(project.pk))
+
+        call_command("seed_benchmark_data", organizations=1, users=2, projects=2, tasks=4,
+                     comments=4, reset=True, stdout=StringIO())
+        self.assertFalse(Project.objects.filter(pk=project.pk).exists())
+        self.assertEqual(Project.objects.count(), 2)
+
+
+class ExplainQueriesCommandTests(SchemaTestCase):
+    def test_every_query_is_explained(self):
+        self.create_tree(projects=1, tasks=2, comments=2)
+        out = StringIO()
+        call_command("explain_queries", "--no-color", stdout=out)
+        lines = out.getvalue().splitlines()
+        self.assertEqual([line.split()[0] for line in lines], [
+            "projects", "project", "tasks", "task", "taskComments", "projectStats",
+            "overdueTasks", "myOverdueTasks", "assigneeLookup",
+        ])
+        self.assertNotIn("EXPLAIN failed", out.getvalue())
+
+
+class ConnectionBenchmarkTests(TransactionTestCase):
+    def test_worker_serves_requests_through_the_handlers(self):
+        organization = Organization.objects.create(name="Acme", slug="acme")
+        CustomUser.objects.create_user(
+            username="alice", email="alice@example.com", password="x", organization=organization)
+        Project.objects.create(organization=organization, name="Alpha")
+
+        for handler in ("wsgi", "asgi"):
+            out = StringIO()
+            call_command("benchmark_connections", worker=True, email="alice@example.com",
+                         requests=4, concurrency=2, handler=handler, stdout=out)
+            result = json.loads(out.getvalue())
+            self.assertEqual(result["errors"], 0)
+            self.assertGreater(result["requests_per_second"], 0)
@@ -1,3 +1,87 @@
-from django.shortcuts import render
+from django.contrib.auth import authenticate
+from django.core.handlers.asgi import ASGIRequest
+from django.http import Http404, HttpResponseBadRequest, HttpResponseForbidden, JsonResponse, StreamingHttpResponse
+from django.views.decorators.csrf import csrf_exempt
+from django.views.decorators.http import require_GET, require_POST
+from graphql_jwt.exceptions import JSONWebTokenError
+from project_management.export import FORMATS, RESOURCES, export_chunks, export_chunks_async
+from project_management.importer import FORMATS as IMPORT_FORMATS, Import, detect_format, read_rows
 
-# Create your views here.
+
+def get_request_user(request):
+    """
+    The session user, or the user of the request's JWT; None if neither.
+    """
+    if request.user.is_authenticated:
+        return request.user
+    try:
+        return authenticate(request=request)
+    except JSONWebTokenError:
+        return None
+
+
+@require_GET
+def export_view(request, resource):
+    """
+    Stream all of the organization's projects, tasks or comments as CSV
+    (the default) or NDJSON (`?format=ndjson`).
+    """
+    if resource not in RESOURCES:
+        raise Http404(f"Unknown export '{resource}'")
+    format = request.GET.get("format", "csv")
+    if format not in FORMATS:
+        return HttpResponseBadRequest(f"Unknown format '{format}', use one of: {', '.join(FORMATS)}")
+
+    user = get_request_user(request)
+    if user is None:
+        return JsonResponse({"error": "Authentication required"}, status=401)
+    if user.organization_id is None:
+        return HttpResponseForbidden()
+
+    chunks = export_chunks(resource, user.organization_id, format)
+    # Django buffers sync iterators served under ASGI.
+    if isinstance(request, ASGIRequest):
+        chunks = export_chunks_async(chunks)
+    response = StreamingHttpResponse(chunks, content_type=FORMATS[format])
+    response["Content-Disposition"] = (
+        f'attachment; filename="{user.organization.slug}-{resource}.{format}"')
+    return response
+
+
+@csrf_exempt
+@require_POST
+def import_view(request):
+    """
+    Import the `tasks` and/or `comments` files of a multipart upload (CSV
+    or NDJSON, told apart by extension or the `format` field) into the
+    user's organization. Set `strict` to import nothing when a row is
+    rejected. Only JWT authentication is accepted, as the view is exempt
+    from CSRF checks.
+    """
+    try:
+        user = authenticate(request=request)
+    except JSONWebTokenError:
+        user = None
+    if user is None:
+        return JsonResponse({"error": "Authentication required"}, status=401)
+    if user.organization_id is None:
+        return HttpResponseForbidden()
+
+    files = {}
+    for source in ("tasks", "comments"):
+        upload = request.FILES.get(source)
+        if upload is None:
+            continue
+        format = request.POST.get("format") or detect_format(upload.name)
+        if format not in IMPORT_FORMATS:
+            return JsonResponse(
+                {"error": f"Unknown format of '{upload.name}', use one of: {', '.join(IMPORT_FORMATS)}"},
+                status=400)
+        files[source] = read_rows(upload.file, format)
+    if not files:
+        return JsonResponse({"error": "Upload a tasks or comments file"}, status=400)
+
+    importer = Import(user.organization)
+    imported = importer.run(files.get("tasks"), files.get("comments"),
+                            strict=request.POST.get("strict") in ("1", "true"))
+    return JsonResponse(importer.summary(), status=200 if imported else 400)
@@ -5,6 +5,7 @@ import {
   HttpLink,
 } from "@apollo/client";
 import { ErrorLink } from "@apollo/client/link/error";
+import { PersistedQueryLink } from "@apollo/client/link/persisted-queries";
 import { Observable } from "@apollo/client/utilities";
 import {
   CombinedGraphQLErrors,
@@ -135,6 +136,20 @@ const authLink = new ApolloLink((operation, forward) => {
   return forward(operation);
 });
 
+// Automatic persisted queries: send the query hash, and the full text only
+// when the server has not seen it yet
+async function sha256(query: string): Promise<string> {
+  const digest = await crypto.subtle.digest(
+    "SHA-256",
+    new TextEncoder().encode(query)
+  );
+  return Array.from(new Uint8Array(digest))
+    .map((byte) => byte.toString(16).padStart(2, "0"))
+    .join("");
+}
+
+const persistedQueryLink = new PersistedQueryLink({ sha256 });
+
 // Public client (no auth)
 export const publicClient = new ApolloClient({
   link: httpLink,
@@ -143,6 +158,6 @@ export const publicClient = new ApolloClient({
 
 // Authenticated client (auth + error handling)
 export const authClient = new ApolloClient({
-  link: ApolloLink.from([errorLink, authLink, httpLink]),
+  link: ApolloLink.from([errorLink, authLink, persistedQueryLink, httpLink]),
   cache: new InMemoryCache(),
 });